@@ -24,23 +24,305 @@ Usage:
 import tkinter as tk
 import tkinter.messagebox as messagebox
 from tkinter import Label
+from tkinter import filedialog
+from tkinter import ttk
 from PIL import Image, ImageTk
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta, timezone
 import webbrowser
 import os
 import re
+import secrets
 import sys
 import sqlite3
 import sys
 import bcrypt
 import smtplib
+import threading
+import time
+import hmac
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import heapq
+import itertools
+import logging
+import logging.handlers
+import math
+import argparse
+import csv
+import gzip
+import json
+import mmap
+import struct
+import subprocess
+import tempfile
+import cProfile
+import pstats
+import queue
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import pyotp
+import numpy as np
+
+# TOML settings: tomllib ships with Python 3.11+, older versions need the tomli package
+try:
+    import tomllib
+except ImportError:
+    import tomli as tomllib
+
+# Optional: nicer per-action profiles (speedscope/HTML) when installed
+try:
+    import pyinstrument
+    import pyinstrument.renderers
+except ImportError:
+    pyinstrument = None
+
+# Optional: zstd-compressed backups
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Optional: PostgreSQL storage backend (FOODCONNECT_DB_BACKEND=postgres)
+try:
+    import psycopg2
+    import psycopg2.pool
+except ImportError:
+    psycopg2 = None
+
+# Checks if the script is running in a "frozen" state
+if getattr(sys, 'frozen', False):
+    CURRENT_DIR = os.path.dirname(sys.executable)
+else:
+    CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Folder of the OS user running the app, for files other people on the computer must not share
+if sys.platform == "win32":
+    USER_CONFIG_DIR = os.path.join(os.environ.get("APPDATA") or os.path.expanduser("~"), "FoodConnect")
+else:
+    USER_CONFIG_DIR = os.path.join(os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config"), "foodconnect")
+
+# One configurable value: its TOML key, default, environment override and allowed range
+class Setting:
+    def __init__(self, key, default, doc, env=None, minimum=None, maximum=None, choices=None, app_path=False, secret=False):
+        self.key = key
+        self.default = default
+        self.doc = doc
+        self.env = env or "FOODCONNECT_" + key.replace(".", "_").upper()
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = choices
+        self.app_path = app_path  # Relative paths are resolved against the app folder
+        self.secret = secret  # Never written to the example file, whatever the default
+
+    # Convert a TOML value or environment string to the setting's type, checking its range
+    def parse(self, value):
+        kind = type(self.default)
+        if isinstance(value, str) and kind is not str:
+            text = value.strip().lower()
+            if kind is bool:
+                if text not in ("1", "0", "true", "false", "yes", "no", "on", "off", ""):
+                    raise ValueError(f"expected true/false, got {value!r}")
+                value = text in ("1", "true", "yes", "on")
+            else:
+                value = kind(text)  # Raises ValueError for non-numbers
+        elif kind is float and type(value) is int:
+            value = float(value)
+        if type(value) is not kind:
+            raise ValueError(f"expected {kind.__name__}, got {type(value).__name__}")
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError(f"must be at least {self.minimum}")
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError(f"must be at most {self.maximum}")
+        if self.choices is not None and value not in self.choices:
+            raise ValueError(f"must be one of {', '.join(map(repr, self.choices))}")
+        if self.app_path and value and not os.path.isabs(value):
+            value = os.path.join(CURRENT_DIR, value)
+        return value
+
+# Everything a site may tune without editing code (see settings.example.toml)
+SETTINGS = [
+    # Files
+    Setting("paths.database", "products.db", "SQLite database file (relative to the working directory)", env="FOODCONNECT_DB_PATH"),
+    Setting("paths.archive_database", "archive.db", "Archive database, kept next to the products database"),
+    Setting("paths.catalog", "catalog.db", "Local product catalog used for barcode lookups", app_path=True),
+    Setting("paths.catalog_snapshot", "catalog.snapshot", "Memory-mapped copy built from the catalog", app_path=True),
+    Setting("paths.recipes", "recipes.db", "Local recipe collection searched by the recipes panel", app_path=True),
+    Setting("paths.backups", "backups", "Folder for database backups", app_path=True),
+    Setting("paths.metrics_log", "logs/metrics.log", "Timing and slow query log", app_path=True),
+    Setting("paths.eula", "EULA.html", "End User License Agreement shown before login", app_path=True),
+    Setting("paths.privacy_policy", "Privacy_Policy.html", "Privacy Policy shown before login", app_path=True),
+    Setting("paths.terms", "Terms_Conditions.html", "Terms and Conditions shown before login", app_path=True),
+    Setting("paths.verification", "agreement.html", "Agreement verification page", app_path=True),
+    Setting("paths.session_file", "", "Saved login of \"Keep me signed in\" (empty: a file in the OS user's own config folder)"),
+
+    # Outgoing email (2FA codes, feedback requests)
+    Setting("smtp.host", "smtp.gmail.com", "SMTP server"),
+    Setting("smtp.port", 587, "SMTP port (STARTTLS)", minimum=1, maximum=65535),
+    Setting("smtp.sender", "", "Address emails are sent from and the SMTP login; no email is sent without it"),
+    Setting("smtp.password", "", "SMTP password; no email is sent without it. Better kept in the environment than in a shared file", secret=True),
+    Setting("smtp.timeout_s", 15.0, "Seconds to wait for the SMTP server", minimum=1),
+
+    # Two-factor authentication
+    Setting("two_fa.enabled", True, "Ask for a code emailed to the user after the password; logins skip it while the [smtp] settings are empty"),
+    Setting("two_fa.interval_s", 30, "Seconds each TOTP code step lasts", minimum=10),
+    Setting("two_fa.tolerance", 2, "Steps either side of now still accepted (covers slow email delivery)", minimum=0, maximum=10),
+    Setting("two_fa.rate_window_s", 300, "Seconds the send/attempt counters are kept", minimum=1),
+    Setting("two_fa.max_sends", 3, "Codes that may be emailed per user per window", minimum=1),
+    Setting("two_fa.max_attempts", 5, "Wrong codes allowed per user per window", minimum=1),
+
+    # Login sessions
+    Setting("login.session_hours", 24, "How long a login lasts before username, password and 2FA are asked again", minimum=1),
+    Setting("login.max_attempts", 5, "Wrong passwords allowed per username per window", minimum=1),
+    Setting("login.rate_window_s", 300, "Seconds the failed login counters are kept", minimum=1),
+    Setting("login.user_cache_size", 1024, "User records kept in memory, keyed by username", minimum=1),
+
+    # Stock checks and forecasts
+    Setting("stock.low_qty", 3, "Products at or below this quantity are low in stock", minimum=0),
+    Setting("stock.expiring_soon_days", 10, "Products expiring within this many days are flagged", minimum=0),
+    Setting("forecast.window_days", 30, "Days of consumption history used for rates", minimum=1),
+    Setting("forecast.half_life_days", 7, "Older days count half as much every this many days", minimum=1),
+    Setting("forecast.low_days", 3, "Products predicted to run out within this many days are flagged", minimum=0),
+
+    # Window layout and responsiveness
+    Setting("ui.button_height", 3, "Height of the menu buttons, in text lines", minimum=1, maximum=20),
+    Setting("ui.button_width", 14, "Width of the menu buttons, in characters", minimum=4, maximum=80),
+    Setting("ui.grid_page_size", 200, "Rows fetched per page as a product grid is scrolled", minimum=10, maximum=10000),
+    Setting("ui.search_debounce_ms", 300, "Typing pause before the search panel searches; 0 searches only on the button", minimum=0, maximum=5000),
+    Setting("ui.monitor_interval_ms", 100, "How often the stall watchdog ticks", minimum=10, maximum=10000),
+    Setting("ui.stall_ms", 200, "Tick lateness reported as a stall", minimum=10),
+    Setting("ui.dashboard_rollover_ms", 60 * 60 * 1000, "How often to check whether the expiry week buckets need rolling", minimum=60_000),
+
+    # Fuzzy product name search
+    Setting("fuzzy.threshold", 0.25, "Least trigram similarity (0-1) for a product to match a search", minimum=0.05, maximum=1.0),
+    Setting("fuzzy.results", 100, "Most products a fuzzy search returns", minimum=1),
+    Setting("fuzzy.duplicate_threshold", 0.5, "Least trigram similarity (0-1) for two products to be suggested as duplicates", minimum=0.1, maximum=1.0),
+    Setting("fuzzy.sync_chunk", 20000, "Product changes applied to the trigram index per writer job when catching up", minimum=100),
+
+    # Recipe matching
+    Setting("recipes.results", 50, "Recipes listed by the recipes panel", minimum=1, maximum=1000),
+    Setting("recipes.urgency_weight", 0.5, "How much using up soon-expiring products counts against ingredient coverage", minimum=0),
+
+    # Background notifications
+    Setting("notify.interval_ms", 60 * 60 * 1000, "How often stock and expiry alerts are collected for every user", minimum=60_000),
+    Setting("notify.email", False, "Email each user a digest of their new alerts (needs the [smtp] settings)"),
+    Setting("notify.max_attempts", 3, "Times a digest email is tried before its alerts are left for the bell only", minimum=1),
+
+    # Database
+    Setting("database.backend", "sqlite", "Storage backend", env="FOODCONNECT_DB_BACKEND", choices=("sqlite", "postgres")),
+    Setting("database.url", "", "libpq DSN/URL; empty uses the PG* environment variables", env="FOODCONNECT_DATABASE_URL"),
+    Setting("database.pool_min", 1, "PostgreSQL connections opened up front", env="FOODCONNECT_PG_POOL_MIN", minimum=0),
+    Setting("database.pool_max", 8, "Upper bound on concurrent PostgreSQL connections", env="FOODCONNECT_PG_POOL_MAX", minimum=1),
+    Setting("database.cache_kb", 8192, "SQLite page cache per connection, in KiB", minimum=64),
+    Setting("database.busy_timeout_s", 10.0, "How long a connection waits for a lock before raising \"database is locked\"", minimum=0),
+    Setting("database.write_group_max", 256, "Most queued write jobs committed together in one transaction", minimum=1),
+
+    # Backups
+    Setting("backup.keep", 7, "Newest backups kept; older ones are deleted after each backup", minimum=1),
+    Setting("backup.pages_per_step", 1024, "Database pages copied per backup step", minimum=1),
+    Setting("backup.step_pause_s", 0.002, "Pause between backup steps so the copy never starves the writer of I/O", minimum=0),
+
+    # Expired product purge
+    Setting("purge.expired_days", 30, "Products expired longer than this are purged", minimum=1),
+    Setting("purge.consumed_days", 14, "Products at quantity 0 with no stock change for this long are purged", minimum=1),
+    Setting("purge.chunk_size", 500, "Products deleted per transaction, so the write lock is held briefly", minimum=1),
+    Setting("purge.archive", True, "Move purged products to the archive database instead of dropping them"),
+    Setting("purge.interval_ms", 6 * 60 * 60 * 1000, "How often the purge job runs while the app is open", minimum=60_000),
+
+    # Diagnostics
+    Setting("diagnostics.log_bytes", 1_000_000, "Size at which metrics.log is rotated", minimum=10_000),
+    Setting("diagnostics.log_backups", 3, "Rotated metrics logs to keep", minimum=0),
+    Setting("diagnostics.slow_query_ms", 50.0, "Queries slower than this are logged with their plan", env="FOODCONNECT_SLOW_QUERY_MS", minimum=0),
+    Setting("diagnostics.trace_sql", False, "Log every statement sqlite3 runs", env="FOODCONNECT_TRACE_SQL"),
+]
+
+# Load settings once: defaults, then the TOML file, then environment variables
+@functools.lru_cache(maxsize=None)
+def load_settings(path=None):
+    """
+    Reads and validates the app's settings.
+
+    Values come from the defaults in SETTINGS, overridden by the TOML file (`settings.toml` next 
+    to app.py, or the file named by FOODCONNECT_SETTINGS), overridden in turn by environment 
+    variables (see `Setting.env`). Every value is checked before the app starts, and all 
+    problems are reported together. The result is cached, so the file is read only once.
+
+    Args:
+        path (str, optional): TOML file to read instead of the default location.
+
+    Returns:
+        dict: Setting values keyed by their dotted TOML key (e.g. "ui.grid_page_size").
+
+    Raises:
+        ValueError: If the file cannot be parsed, names an unknown setting or a value is invalid.
+    """
+    path = path or os.environ.get("FOODCONNECT_SETTINGS") or os.path.join(CURRENT_DIR, "settings.toml")
+    table = {}
+    if os.path.exists(path):
+        with open(path, "rb") as file:
+            try:
+                table = tomllib.load(file)
+            except tomllib.TOMLDecodeError as e:
+                raise ValueError(f"Cannot read settings from {path}: {e}") from None
+
+    # Flatten [section] tables to dotted keys
+    values = {}
+    for section, entries in table.items():
+        if isinstance(entries, dict):
+            for key, value in entries.items():
+                values[f"{section}.{key}"] = value
+        else:
+            values[section] = entries
+
+    known = {setting.key: setting for setting in SETTINGS}
+    errors = [f"{key}: unknown setting" for key in values if key not in known]
+    result = {}
+    for setting in SETTINGS:
+        value, source = setting.default, "default"
+        if setting.key in values:
+            value, source = values[setting.key], path
+        if setting.env in os.environ:
+            value, source = os.environ[setting.env], setting.env
+        try:
+            result[setting.key] = setting.parse(value)
+        except ValueError as e:
+            errors.append(f"{setting.key} (from {source}): {e}")
+
+    if errors:
+        raise ValueError("Invalid settings:\n  " + "\n  ".join(errors))
+    return result
+
+# Write settings.example.toml with every setting at its default value
+def write_example_settings(path):
+    lines = ["# FoodConnect settings. Copy to settings.toml and uncomment what you want to change.",
+             "# Every setting can also be set with the environment variable shown.",
+             "# Relative paths are relative to the folder app.py is in, unless noted otherwise.", ""]
+    section = None
+    for setting in SETTINGS:
+        name, key = setting.key.split(".")
+        if name != section:
+            if section is not None:
+                lines.append("")
+            lines.append(f"[{name}]")
+            section = name
+        default = "" if setting.secret else setting.default
+        value = str(default).lower() if isinstance(default, bool) else json.dumps(default)
+        lines.append(f"# {setting.doc} ({setting.env})")
+        lines.append(f"# {key} = {value}")
+    with open(path, "w") as file:
+        file.write("\n".join(lines) + "\n")
+
+# True if logins are confirmed with an emailed code: 2FA is on and there is an SMTP account to send it
+def two_fa_required(values):
+    return values["two_fa.enabled"] and bool(values["smtp.sender"] and values["smtp.password"])
+
+settings = load_settings()
 
 # Constants
-HEIGHT = 3
-WIDTH = 20
+HEIGHT = settings["ui.button_height"]
+WIDTH = settings["ui.button_width"]
 
 # Colors
 LIGHT_BG = "alice blue"  # Light mode color for root, frames, etc.
@@ -50,27 +332,92 @@ FRAME_DARK_COLOR = "gray15"     # Dark mode color for frames
 TEXT_LIGHT_COLOR = "black"  # Text color for light theme
 TEXT_DARK_COLOR = "dodger blue"  # Text color for dark theme
 
-# Checks if the script is running in a "frozen" state
-if getattr(sys, 'frozen', False):
-    CURRENT_DIR = os.path.dirname(sys.executable)
-else:
-    CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-
 # Button Text
-BUTTON_TEXTS = ["ADD", "UPDATE", "DELETE", "SEARCH"]
+BUTTON_TEXTS = ["ADD", "UPDATE", "DELETE", "SEARCH", "LIST", "RECIPES", "DASHBOARD"]
 
 # Ensure you have a list of food groups
 food_groups = ["Dairy", "Fruits", "Vegetables", "Grains", "Protein", "Other"]
 
-# User Agreement Path
-EULA_AGREEMENT = os.path.join(CURRENT_DIR, "EULA.html")
-PRIVACY_POLICY = os.path.join(CURRENT_DIR, "Privacy_Policy.html")
-TERMS_CONDITIONS = os.path.join(CURRENT_DIR, "Terms_Conditions.html")
-VERIFICATION = os.path.join(CURRENT_DIR, "agreement.html")
+# Database files
+DB_NAME = settings["paths.database"]
+ARCHIVE_DB_NAME = settings["paths.archive_database"]  # Cold storage for purged products, kept next to the products database
 
-# 2FA key
-key = "FoodConnectAuthenticationKey"
-totp = pyotp.TOTP(key)
+# User Agreement Path
+EULA_AGREEMENT = settings["paths.eula"]
+PRIVACY_POLICY = settings["paths.privacy_policy"]
+TERMS_CONDITIONS = settings["paths.terms"]
+VERIFICATION = settings["paths.verification"]
+
+# Local product catalog (barcode lookups)
+CATALOG_DB = settings["paths.catalog"]
+CATALOG_SNAPSHOT = settings["paths.catalog_snapshot"]  # Memory-mapped copy built from catalog.db
+BACKUP_DIR = settings["paths.backups"]  # Snapshots of products.db
+
+# Recipes
+RECIPES_DB = settings["paths.recipes"]                      # Recipe collection, kept out of products.db like the catalog
+RECIPE_RESULTS = settings["recipes.results"]                # Recipes listed by the recipes panel
+RECIPE_URGENCY_WEIGHT = settings["recipes.urgency_weight"]  # Weight of soon-expiring products in the recipe score
+
+# Outgoing email
+SMTP_HOST = settings["smtp.host"]
+SMTP_PORT = settings["smtp.port"]
+SMTP_SENDER = settings["smtp.sender"]
+SMTP_PASSWORD = settings["smtp.password"]
+SMTP_TIMEOUT_S = settings["smtp.timeout_s"]
+EMAIL_CONFIGURED = bool(SMTP_SENDER and SMTP_PASSWORD)  # No built-in account: both come from settings.toml or the environment
+
+# 2FA settings
+TWO_FA_ENABLED = settings["two_fa.enabled"]
+TWO_FA_REQUIRED = two_fa_required(settings)
+TWO_FA_INTERVAL = settings["two_fa.interval_s"]        # Seconds each TOTP code step lasts
+TWO_FA_TOLERANCE = settings["two_fa.tolerance"]        # Steps either side of "now" still accepted (covers slow email delivery)
+TWO_FA_RATE_WINDOW = settings["two_fa.rate_window_s"]  # Seconds the send/attempt counters are kept
+TWO_FA_MAX_SENDS = settings["two_fa.max_sends"]        # Codes that may be emailed per user per window
+TWO_FA_MAX_ATTEMPTS = settings["two_fa.max_attempts"]  # Wrong codes allowed per user per window
+
+# Login sessions
+SESSION_FILE = settings["paths.session_file"] or os.path.join(USER_CONFIG_DIR, "session")  # Saved login of this OS user
+SESSION_HOURS = settings["login.session_hours"]             # How long a login lasts
+LOGIN_MAX_ATTEMPTS = settings["login.max_attempts"]         # Wrong passwords allowed per username per window
+LOGIN_RATE_WINDOW = settings["login.rate_window_s"]         # Seconds the failed login counters are kept
+USER_CACHE_SIZE = settings["login.user_cache_size"]         # User records kept in memory
+
+# Stock thresholds
+LOW_STOCK_QTY = settings["stock.low_qty"]                     # Products at or below this quantity are low in stock
+EXPIRING_SOON_DAYS = settings["stock.expiring_soon_days"]     # Products expiring within this many days are flagged
+
+# Forecasting
+FORECAST_WINDOW_DAYS = settings["forecast.window_days"]        # Days of consumption history used for rates
+FORECAST_HALF_LIFE_DAYS = settings["forecast.half_life_days"]  # Older days count half as much every this many days
+FORECAST_LOW_DAYS = settings["forecast.low_days"]              # Products predicted to run out within this many days are flagged
+
+# Backups
+BACKUP_KEEP = settings["backup.keep"]                      # Newest backups kept; older ones are deleted after each backup
+BACKUP_PAGES_PER_STEP = settings["backup.pages_per_step"]  # Database pages copied per backup step (4 MB with the default page size)
+BACKUP_STEP_PAUSE_S = settings["backup.step_pause_s"]      # Pause between steps so the copy never starves the writer thread of I/O
+
+# Dashboard
+DASHBOARD_ROLLOVER_MS = settings["ui.dashboard_rollover_ms"]   # How often to check whether the expiry week buckets need rolling forward
+
+# Product grid and search
+GRID_PAGE_SIZE = settings["ui.grid_page_size"]           # Rows fetched per page as the grid is scrolled
+SEARCH_DEBOUNCE_MS = settings["ui.search_debounce_ms"]   # Typing pause before the search panel searches (0 = button only)
+FUZZY_THRESHOLD = settings["fuzzy.threshold"]                        # Least similarity for a fuzzy match
+FUZZY_RESULTS = settings["fuzzy.results"]                            # Most products a fuzzy search returns
+FUZZY_DUPLICATE_THRESHOLD = settings["fuzzy.duplicate_threshold"]    # Least similarity for a duplicate suggestion
+FUZZY_SYNC_CHUNK = settings["fuzzy.sync_chunk"]                      # Queued changes indexed per writer job when catching up
+
+# Notifications
+NOTIFY_INTERVAL_MS = settings["notify.interval_ms"]       # How often alerts are collected for every user
+NOTIFY_EMAIL = settings["notify.email"]                   # Email each user a digest of their new alerts
+NOTIFY_MAX_ATTEMPTS = settings["notify.max_attempts"]     # Tries per digest email before giving up on it
+
+# Expired product purge
+PURGE_EXPIRED_DAYS = settings["purge.expired_days"]      # Products expired longer than this are purged
+PURGE_CONSUMED_DAYS = settings["purge.consumed_days"]    # Products at quantity 0 with no stock change for this long are purged
+PURGE_CHUNK_SIZE = settings["purge.chunk_size"]          # Products deleted per transaction, so the write lock is held briefly
+PURGE_ARCHIVE = settings["purge.archive"]                # Move purged products to the archive database instead of dropping them
+PURGE_INTERVAL_MS = settings["purge.interval_ms"]        # How often the purge job runs while the app is open
 
 # Userid to identify user currently active
 global logged_in_user_id
@@ -79,290 +426,2432 @@ logged_in_user_id = None
 # hopefully fixes a problem
 root = None
 
-# Connect to the database (if it doesn't exist, it will be created)
-def connect_db(db_name='products.db'):
-    conn = sqlite3.connect(db_name)
-    return conn
+# Diagnostics settings
+METRICS_LOG = settings["paths.metrics_log"]
+METRICS_LOG_BYTES = settings["diagnostics.log_bytes"]       # Size at which metrics.log is rotated
+METRICS_LOG_BACKUPS = settings["diagnostics.log_backups"]   # Rotated metrics logs to keep
+SLOW_QUERY_MS = settings["diagnostics.slow_query_ms"]       # Queries slower than this are logged with their plan
+TRACE_SQL = settings["diagnostics.trace_sql"]               # Log every statement sqlite3 runs
+WATCHDOG_INTERVAL_MS = settings["ui.monitor_interval_ms"]   # How often the stall watchdog ticks
+WATCHDOG_STALL_MS = settings["ui.stall_ms"]                 # Tick lateness reported as a stall
+
+# SQLite write path
+DB_BUSY_TIMEOUT_S = settings["database.busy_timeout_s"]     # How long a connection waits for a lock before raising "database is locked"
+DB_CACHE_KB = settings["database.cache_kb"]                 # Page cache per SQLite connection
+WRITE_GROUP_MAX = settings["database.write_group_max"]      # Most queued write jobs committed together in one transaction
+
+# Storage backend: "sqlite" (default, products.db) or "postgres"
+DB_BACKEND = settings["database.backend"]
+DATABASE_URL = settings["database.url"]       # libpq DSN/URL; empty uses the PG* environment variables
+PG_POOL_MIN = settings["database.pool_min"]   # Connections opened up front
+PG_POOL_MAX = settings["database.pool_max"]   # Upper bound on concurrent connections
+
+# Most recent timing spans, shown in the diagnostics window
+recent_spans = collections.deque(maxlen=500)
+metrics_logger = None
+
+# Get the rotating metrics logger, creating logs/metrics.log on first use
+def get_metrics_logger():
+    global metrics_logger
+    if metrics_logger is None:
+        logger = logging.getLogger("foodconnect.metrics")
+        logger.setLevel(logging.DEBUG if TRACE_SQL else logging.INFO)
+        logger.propagate = False
+        try:
+            os.makedirs(os.path.dirname(METRICS_LOG), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(METRICS_LOG, maxBytes=METRICS_LOG_BYTES,
+                                                           backupCount=METRICS_LOG_BACKUPS)
+        except OSError:
+            handler = logging.NullHandler()  # Read-only install directory; keep the in-app view only
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        logger.addHandler(handler)
+        metrics_logger = logger
+    return metrics_logger
+
+# Record a finished span in memory and in the metrics log (every SQL statement only when tracing)
+def record_span(kind, name, elapsed_ms, detail=""):
+    recent_spans.append((time.time(), kind, name, elapsed_ms, detail))
+    level = logging.DEBUG if kind == "sql" else logging.INFO
+    get_metrics_logger().log(level, "%s name=%s ms=%.2f%s", kind, name, elapsed_ms, f" {detail}" if detail else "")
+
+# Time a block of code
+@contextlib.contextmanager
+def span(name, kind="span"):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(kind, name, (time.perf_counter() - start) * 1000)
+
+# Decorator that times every call of a function
+def timed(name, kind="span"):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Log a slow statement together with SQLite's query plan
+def log_slow_query(conn, sql, params, elapsed_ms):
+    plan = ""
+    if sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")):
+        try:
+            rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()
+            plan = " | ".join(row[-1] for row in rows)
+        except sqlite3.Error:
+            pass
+    get_metrics_logger().warning("slow_query ms=%.2f sql=%s plan=%s", elapsed_ms, " ".join(sql.split()), plan)
+
+# Cursor that times execute and fetch calls
+class InstrumentedCursor(sqlite3.Cursor):
+    def _run(self, method, sql, params):
+        start = time.perf_counter()
+        try:
+            return method(self, sql, params)
+        finally:
+            self._sql, self._params = sql, params
+            self._elapsed = (time.perf_counter() - start) * 1000
+            self._finish_if_write()
+
+    def _finish_if_write(self):
+        # SELECTs finish once their rows run out (however they are read); everything else after execute
+        if not self._sql.lstrip().upper().startswith(("SELECT", "WITH", "PRAGMA")):
+            self._finish()
+
+    def _finish(self):
+        sql = getattr(self, "_sql", None)
+        if sql is None:
+            return
+        self._sql = None
+        record_span("sql", " ".join(sql.split())[:80], self._elapsed)
+        if self._elapsed >= SLOW_QUERY_MS:
+            log_slow_query(self.connection, sql, self._params, self._elapsed)
+
+    # Time one fetch; `done(rows)` says whether the statement has no rows left
+    def _fetch(self, method, done, *args):
+        if getattr(self, "_sql", None) is None:
+            return method(self, *args)
+        start = time.perf_counter()
+        rows = method(self, *args)
+        self._elapsed += (time.perf_counter() - start) * 1000
+        if done(rows):
+            self._finish()
+        return rows
 
-# Function to create a 'products' table if it doesn't already exist
-def create_products(conn):
-    with conn:
-        #conn.execute('''DROP TABLE IF EXISTS products''')
-        conn.execute('''CREATE TABLE IF NOT EXISTS products (
-                            name TEXT,
-                            quantity INTEGER,
-                            "group" INTEGER,
-                            expiration DATE,
-                            "add" DATE,
-                            user_id TEXT,
-                            vegetarian BOOLEAN,
-                            vegan BOOLEAN,
-                            gluten BOOLEAN,
-                            lactose BOOLEAN,
-                            eggs BOOLEAN,
-                            nuts BOOLEAN,
-                            halal BOOLEAN,
-                            kosher BOOLEAN,
-                            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE)''')
+    def execute(self, sql, params=()):
+        self._finish()
+        return self._run(sqlite3.Cursor.execute, sql, params)
 
-# Function to create a 'users' table if it doesn't already exist        
-def create_users(conn):
-    with conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT NOT NULL,
-                username TEXT NOT NULL,
-                password_hash TEXT NOT NULL,
-                first_login BOOLEAN DEFAULT 1
-            );
-        """)
+    def executemany(self, sql, seq_of_params):
+        self._finish()
+        return self._run(sqlite3.Cursor.executemany, sql, seq_of_params)
 
-# Class for handling products in the database
-class Product:
-    def __init__(self, name, quantity, group, expiration, add, user, info=None):
-        self.name = name
-        self.quantity = quantity
-        self.group = group
-        self.expiration = expiration
-        self.add = add
-        self.user = user
-        self.info = info if info else {
-            "Vegetarian": 0,
-            "Vegan": 0,
-            "Gluten": 0,
-            "Lactose": 0,
-            "Eggs": 0,
-            "Nuts": 0,
-            "Halal": 0,
-            "Kosher": 0
-        }
+    def fetchone(self):
+        return self._fetch(sqlite3.Cursor.fetchone, lambda row: row is None)
 
-    # Add a new product to the database
-    def add_product(self, conn):
-        with conn:
-            conn.execute('''INSERT INTO products 
-                            (name, quantity, "group", expiration, "add", user, vegetarian, vegan, gluten, lactose, eggs, nuts, halal, kosher)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', 
-                         (self.name, self.quantity, self.group, self.expiration, self.add, self.user, 
-                          self.info["Vegetarian"], self.info["Vegan"], self.info["Gluten"], self.info["Lactose"],
-                          self.info["Eggs"], self.info["Nuts"], self.info["Halal"], self.info["Kosher"]))
+    def fetchmany(self, size=None):
+        size = size if size is not None else self.arraysize
+        return self._fetch(sqlite3.Cursor.fetchmany, lambda rows: len(rows) < size, size)
 
-    # Load a product from the database by name and expiration
-    @staticmethod
-    def load_product(conn, name, expiration):
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM products WHERE name = ? AND expiration = ?", (name, expiration))
-        row = cur.fetchone()
-        if row:
-            info = {
-                "Vegetarian": row[6],
-                "Vegan": row[7],
-                "Gluten": row[8],
-                "Lactose": row[9],
-                "Eggs": row[10],
-                "Nuts": row[11],
-                "Halal": row[12],
-                "Kosher": row[13]
-            }
-            return Product(row[0], row[1], row[2], row[3], row[4], row[5], info)
-        else:
-            return None
+    def fetchall(self):
+        return self._fetch(sqlite3.Cursor.fetchall, lambda rows: True)
 
-    # Update a product in the database
-    def update_product(self, conn):
-        with conn:
-            conn.execute('''UPDATE products SET 
-                            quantity = ?, "group" = ?, "add" = ?, user = ?, vegetarian = ?, vegan = ?, gluten = ?, lactose = ?, eggs = ?, nuts = ?, halal = ?, kosher = ?
-                            WHERE name = ? AND expiration = ?''',
-                         (self.quantity, self.group, self.add, self.user, 
-                          self.info["Vegetarian"], self.info["Vegan"], self.info["Gluten"], self.info["Lactose"],
-                          self.info["Eggs"], self.info["Nuts"], self.info["Halal"], self.info["Kosher"],
-                          self.name, self.expiration))
+    # `for row in cursor` reads through here, so iterated SELECTs are timed to their last row too
+    def __next__(self):
+        if getattr(self, "_sql", None) is None:
+            return sqlite3.Cursor.__next__(self)
+        start = time.perf_counter()
+        try:
+            return sqlite3.Cursor.__next__(self)
+        except StopIteration:
+            self._elapsed += (time.perf_counter() - start) * 1000
+            self._finish()
+            raise
+        finally:
+            if getattr(self, "_sql", None) is not None:
+                self._elapsed += (time.perf_counter() - start) * 1000
 
-    # Delete a product from the database
-    @staticmethod
-    def delete_product(conn, name, expiration):
-        with conn:
-            conn.execute("DELETE FROM products WHERE name = ? AND expiration = ?", (name, expiration))
+    # A cursor that is closed or dropped before its rows run out still records its span
+    def close(self):
+        self._finish()
+        super().close()
 
-    # Search for products in the database by name (partial search)
-    @staticmethod
-    def search_product(conn, search_term):
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM products WHERE name LIKE ?", ('%' + search_term + '%',))
-        rows = cur.fetchall()
-        return rows
-    
-# Send 2FA code to the user's email
-def send_2fa_email(email, code):
-    sender_email = "foodconnect3@gmail.com"
-    sender_password = "sokx umec amfv fdhe"
-    smtp_server = "smtp.gmail.com"
-    smtp_port = 587
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
 
-    subject = "Your FoodConnect 2FA Code"
-    body = f"Your 2FA code is: {code}. It is valid for 30 seconds."
+# Connection whose cursors (including conn.execute shortcuts) are instrumented
+class InstrumentedConnection(sqlite3.Connection):
+    backend = "sqlite"
 
-    msg = MIMEMultipart()
-    msg["From"] = sender_email
-    msg["To"] = email
-    msg["Subject"] = subject
-    
-    msg.attach(MIMEText(body, "plain"))
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
 
-    try:
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, email, msg.as_string())
-    except Exception:
-        return 
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
 
-# 2FA verification screen
-def two_factor_window(user_email):
-    code = totp.now()
-    send_2fa_email(user_email, code)
-
-    def verify_code():
-        entered_code = code_entry.get()
-        if entered_code == code:
-            messagebox.showinfo("Success", "2FA verification successful!")
-            two_fa_root.destroy()
-            main()  # Proceed to the main application
-        else:
-            messagebox.showerror("Error", "Invalid 2FA code.")
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
 
-    two_fa_root = tk.Tk()
-    two_fa_root.title("2FA Verification")
-    two_fa_root.geometry("300x200")
+# Watches the Tk event loop and logs when callbacks run late
+class StallWatchdog:
+    """
+    Schedules a tick every `interval_ms` with `after` and measures how late it fires.
 
-    tk.Label(two_fa_root, text="Enter the 2FA code sent to your email:").pack(pady=10)
-    code_entry = tk.Entry(two_fa_root)
-    code_entry.pack(pady=5)
+    Lateness means the event loop was busy running something else (a slow query, bcrypt, SMTP, 
+    building a panel). Ticks later than `stall_ms` are recorded as "stall" spans, tagged with the 
+    most recent span that finished so the culprit is easy to spot in the log.
+    """
+    def __init__(self, root, interval_ms=WATCHDOG_INTERVAL_MS, stall_ms=WATCHDOG_STALL_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.stall_ms = stall_ms
+        self.expected = None
+        self.worst_ms = 0.0
+
+    def start(self):
+        self.expected = time.perf_counter() + self.interval_ms / 1000
+        self.root.after(self.interval_ms, self.tick)
+
+    def tick(self):
+        now = time.perf_counter()
+        late_ms = (now - self.expected) * 1000
+        if late_ms >= self.stall_ms:
+            culprit = recent_spans[-1][2] if recent_spans else "unknown"
+            record_span("stall", culprit, late_ms)
+            self.worst_ms = max(self.worst_ms, late_ms)
+        self.expected = now + self.interval_ms / 1000
+        self.root.after(self.interval_ms, self.tick)
+
+# Diagnostics window
+def diagnostics_window(parent):
+    """
+    Opens a window summarising the recent timing spans, event-loop stalls and slow SQL.
 
-    verify_button = tk.Button(two_fa_root, text="Verify", command=verify_code)
-    verify_button.pack(pady=10)
+    Spans are grouped by kind and name with their count, mean and worst time, followed by 
+    the most recent stalls. The full history is in `logs/metrics.log`.
 
-    two_fa_root.mainloop()
+    Args:
+        parent (Tkinter Tk): The main application window.
 
-# Simple login screen
-def login_window():
-    login_root = tk.Tk()
-    login_root.title("FoodConnect")
-    login_root.geometry('700x600')
+    Returns:
+        None
+    """
+    window = tk.Toplevel(parent)
+    window.title("Diagnostics")
+    window.geometry("700x500")
+
+    text = tk.Text(window, height=25, width=90)
+    text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+    def refresh():
+        text.delete('1.0', tk.END)
+        spans = list(recent_spans)
+
+        totals = {}
+        for _, kind, name, elapsed_ms, _ in spans:
+            count, total, worst = totals.get((kind, name), (0, 0.0, 0.0))
+            totals[(kind, name)] = (count + 1, total + elapsed_ms, max(worst, elapsed_ms))
+
+        text.insert(tk.END, f"{'Kind':<8}{'Name':<50}{'Count':>6}{'Mean ms':>10}{'Max ms':>10}\n")
+        for (kind, name), (count, total, worst) in sorted(totals.items(), key=lambda item: -item[1][2]):
+            text.insert(tk.END, f"{kind:<8}{name[:48]:<50}{count:>6}{total / count:>10.1f}{worst:>10.1f}\n")
+
+        stalls = [s for s in spans if s[1] == "stall"][-10:]
+        text.insert(tk.END, "\nRecent stalls:\n")
+        for timestamp, _, name, elapsed_ms, _ in reversed(stalls):
+            text.insert(tk.END, f"  {time.strftime('%H:%M:%S', time.localtime(timestamp))}  {elapsed_ms:8.1f} ms after {name}\n")
+        if not stalls:
+            text.insert(tk.END, "  None\n")
+        text.insert(tk.END, f"\nFull log: {METRICS_LOG}\n")
+
+    tk.Button(window, text="Refresh", command=refresh).pack(pady=5)
+    refresh()
+
+# Per-action profiling (enabled with --profile)
+PROFILE_DIR = None
+
+# Turn cProfile statistics into collapsed stacks ("a;b;c 123") for flamegraph.pl / speedscope
+def collapse_stats(profile):
+    """
+    Approximates call stacks from a cProfile run in the collapsed-stack format used by flamegraph tools.
 
-    # Ensure that closing the window exits the program
-    def on_close():
-        sys.exit()  # Exit the entire application if login window is closed
+    cProfile only records caller -> callee edges, so the time of a function called from several 
+    places is split between its callers in proportion to the time each edge accounts for.
 
-    def on_register(): 
-        login_root.iconify()
-        sign_up()
+    Args:
+        profile (cProfile.Profile): A finished profile.
 
-    login_root.protocol("WM_DELETE_WINDOW", on_close)  # Handle window close event
+    Returns:
+        list: Lines of the form "outer;inner;leaf <microseconds>".
+    """
+    stats = pstats.Stats(profile).stats
+    callees = collections.defaultdict(list)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees[caller].append((func, edge[3]))
+
+    def label(func):
+        filename, line, name = func
+        return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",")
+
+    lines = collections.Counter()
+
+    def walk(func, cumulative, path):
+        total_ct = stats[func][3] or 1e-9
+        ratio = min(1.0, cumulative / total_ct)
+        self_time = stats[func][2] * ratio
+        if self_time > 0:
+            lines[";".join(path)] += self_time
+        if len(path) > 100:
+            return
+        for callee, edge_ct in callees.get(func, []):
+            if callee in stats and label(callee) not in path:
+                walk(callee, edge_ct * ratio, path + [label(callee)])
+
+    for func, (_, _, _, ct, callers) in stats.items():
+        if not callers:
+            walk(func, ct, [label(func)])
+
+    return [f"{stack} {int(seconds * 1_000_000)}" for stack, seconds in lines.items() if seconds * 1_000_000 >= 1]
+
+# Write the profile of one action to PROFILE_DIR
+def save_profile(name, profiler):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{name}")
+    if pyinstrument is not None:
+        with open(base + ".speedscope.json", "w") as file:
+            file.write(profiler.output(renderer=pyinstrument.renderers.SpeedscopeRenderer()))
+        with open(base + ".html", "w") as file:
+            file.write(profiler.output_html())
+    else:
+        profiler.dump_stats(base + ".prof")
+        with open(base + ".collapsed", "w") as file:
+            file.write("\n".join(collapse_stats(profiler)) + "\n")
 
-    conn = connect_db()  # Connect to the database
-    create_users(conn)   # Ensure users table exists
+# Wrap a user action so each call is profiled when --profile is on
+def profiled(name, func):
+    """
+    Returns `func` unchanged normally, or a wrapper that profiles every call when the app was 
+    started with `--profile`.
 
-    # Show application logo
-    image = Image.open('FC_LOGO.png')
-    image = ImageTk.PhotoImage(image)
+    Each call writes `<timestamp>-<name>.prof` (pstats) and `.collapsed` (flamegraph stacks) to 
+    PROFILE_DIR, or speedscope JSON and HTML when pyinstrument is installed.
 
-    image_label = tk.Label(login_root, image=image)
-    image_label.pack()
+    Args:
+        name (str): Action name used in the output file names.
+        func (callable): The button command or handler to wrap.
 
-    # Labels and entries for both login and sign-up
-    tk.Label(login_root, text="Username:").pack(pady=5)
-    username_entry = tk.Entry(login_root)
-    username_entry.pack(pady=5)
+    Returns:
+        callable: The function to use as the widget command.
+    """
+    if PROFILE_DIR is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if pyinstrument is not None:
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if pyinstrument is not None:
+                profiler.stop()
+            else:
+                profiler.disable()
+            try:
+                save_profile(name, profiler)
+            except OSError as e:
+                get_metrics_logger().warning("profile name=%s not saved: %s", name, e)
+    return wrapper
+
+# Rewrite the SQLite-style SQL used throughout the app for psycopg2
+@functools.lru_cache(maxsize=512)
+def translate_sql(sql):
+    """
+    Converts a statement written for sqlite3 into one psycopg2 accepts.
 
-    tk.Label(login_root, text="Password:").pack(pady=5)
-    password_entry = tk.Entry(login_root, show='*')
-    password_entry.pack(pady=5)
+    Outside of string literals and quoted identifiers, `?` placeholders become `%s` and `LIKE` 
+    becomes `ILIKE` (SQLite's LIKE ignores case, PostgreSQL's does not). Literal `%` signs are 
+    doubled everywhere so psycopg2 does not read them as placeholders.
 
-    # A status label to display login or sign-up messages
-    status_label = tk.Label(login_root, text="")
-    status_label.pack(pady=5)
+    Args:
+        sql (str): The statement as written for SQLite.
 
-    def send_feedback_email(user_email):
-        # Configure your email settings
-        sender_email = "foodconnect3@gmail.com"
-        sender_password = "sokx umec amfv fdhe"  
-        smtp_server = "smtp.gmail.com"
-        smtp_port = 587
-        
-        # Prepare the email
-        subject = "How's your experience with FoodConnect?"
-        body = """
-        Hello,
-        We noticed that you've just signed into FoodConnect for the first time. 
-        We would love to know how your experience has been so far and if there's anything we can improve.
-        Please reply to this email.
+    Returns:
+        str: The statement for PostgreSQL.
+    """
+    parts = re.split(r"""('(?:[^']|'')*'|"[^"]*")""", sql)
+    for i, part in enumerate(parts):
+        part = part.replace("%", "%%")
+        if i % 2 == 0:  # Outside quotes
+            part = re.sub(r"\bLIKE\b", "ILIKE", part.replace("?", "%s"), flags=re.IGNORECASE)
+        parts[i] = part
+    return "".join(parts)
+
+# Cursor returned by PostgresConnection (rows are fetched eagerly so the connection can go back to the pool)
+class PostgresCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = collections.deque()
+        self.rowcount = -1
+        self.lastrowid = None
+        self.description = None
+        self.arraysize = 1
+
+    def execute(self, sql, params=()):
+        self.connection._run(self, sql, [params], many=False)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self.connection._run(self, sql, list(seq_of_params), many=True)
+        return self
+
+    def fetchone(self):
+        return self.rows.popleft() if self.rows else None
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        return [self.rows.popleft() for _ in range(min(size, len(self.rows)))]
+
+    def fetchall(self):
+        rows, self.rows = list(self.rows), collections.deque()
+        return rows
 
-        Thanks for using FoodConnect!
-        
-        Best regards,
-        FoodConnect Team """
+    def __iter__(self):
+        while self.rows:
+            yield self.rows.popleft()
 
-        msg = MIMEMultipart()
-        msg["From"] = sender_email
-        msg["To"] = user_email
-        msg["Subject"] = subject
+    def close(self):
+        self.rows.clear()
 
-        msg.attach(MIMEText(body, "plain"))
+# sqlite3.Connection look-alike on top of a psycopg2 connection pool
+class PostgresConnection:
+    """
+    Gives the rest of the app the small part of the sqlite3 connection API it uses 
+    (`execute`, `executemany`, `cursor`, `commit`, `with conn:` transactions, `lastrowid`) 
+    on top of a shared `ThreadedConnectionPool`.
+
+    A pooled connection is borrowed per statement, or for the whole block inside `with conn:`, 
+    so connections that are never closed do not pin pool slots. Statements outside a `with` 
+    block commit on their own. Inserts into tables with a generated key get `RETURNING` added 
+    to fill `lastrowid`. Database errors are re-raised as the matching sqlite3 exception types 
+    so existing error handling keeps working.
+    """
+    backend = "postgres"
+    RETURNING_KEYS = {"products": "id", "users": "user_id"}
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.held = None
+        self.depth = 0
+
+    def cursor(self):
+        return PostgresCursor(self)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def _run(self, cursor, sql, seq_of_params, many):
+        pg_sql = translate_sql(sql)
+        insert = re.match(r"\s*INSERT\s+INTO\s+(\w+)", sql, re.IGNORECASE)
+        key = self.RETURNING_KEYS.get(insert.group(1).lower()) if insert and not many else None
+        if key and "RETURNING" in sql.upper():
+            key = None
+        if key:
+            pg_sql += f" RETURNING {key}"
+
+        raw = self.held or self.pool.getconn()
+        start = time.perf_counter()
+        try:
+            with raw.cursor() as pg:
+                if many:
+                    pg.executemany(pg_sql, seq_of_params)
+                else:
+                    pg.execute(pg_sql, seq_of_params[0])  # Always pass params so psycopg2 un-doubles the % signs
+                cursor.rowcount = pg.rowcount
+                cursor.description = pg.description
+                rows = pg.fetchall() if pg.description else []
+            if self.held is None:
+                raw.commit()
+        except psycopg2.Error as e:
+            if self.held is None:
+                raw.rollback()
+            raise (sqlite3.IntegrityError if isinstance(e, psycopg2.IntegrityError) else sqlite3.OperationalError)(str(e)) from e
+        finally:
+            if self.held is None:
+                self.pool.putconn(raw)
+            record_span("sql", " ".join(sql.split())[:80], (time.perf_counter() - start) * 1000)
+
+        if key:
+            cursor.lastrowid = rows[0][0] if rows else None
+            rows = []
+        # bytea comes back as memoryview; sqlite3 returns bytes (bcrypt needs bytes)
+        cursor.rows = collections.deque(tuple(bytes(v) if isinstance(v, memoryview) else v for v in row) for row in rows)
+
+    def commit(self):
+        pass  # Statements outside `with conn:` are already committed
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass  # Nothing is held between statements
+
+    def __enter__(self):
+        if self.held is None:
+            self.held = self.pool.getconn()
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.depth -= 1
+        if self.depth == 0:
+            raw, self.held = self.held, None
+            try:
+                if exc_type is None:
+                    raw.commit()
+                else:
+                    raw.rollback()
+            finally:
+                self.pool.putconn(raw)
+        return False
+
+# Shared PostgreSQL connection pool, created on first use
+postgres_pool = None
+postgres_pool_lock = threading.Lock()
+
+def get_postgres_pool():
+    global postgres_pool
+    with postgres_pool_lock:
+        if postgres_pool is None:
+            if psycopg2 is None:
+                raise RuntimeError("FOODCONNECT_DB_BACKEND=postgres needs psycopg2 (pip install psycopg2-binary)")
+            postgres_pool = psycopg2.pool.ThreadedConnectionPool(PG_POOL_MIN, PG_POOL_MAX, DATABASE_URL)
+        return postgres_pool
+
+# True if the connection talks to PostgreSQL (SQLite-only features are skipped there)
+def is_postgres(conn):
+    return getattr(conn, "backend", "sqlite") == "postgres"
 
+# Connect to the database (if it doesn't exist, it will be created)
+def connect_db(db_name=DB_NAME, factory=InstrumentedConnection):
+    if DB_BACKEND == "postgres":
+        return PostgresConnection(get_postgres_pool())
+    if DB_BACKEND != "sqlite":
+        raise ValueError(f"Unknown FOODCONNECT_DB_BACKEND {DB_BACKEND!r} (use 'sqlite' or 'postgres')")
+
+    conn = sqlite3.connect(db_name, timeout=DB_BUSY_TIMEOUT_S, factory=factory)
+    # Only takes effect on a new, empty database; older ones are converted by compact_database()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    if db_name != ":memory:":
+        # WAL lets readers (the GUI, background jobs) keep reading while the writer thread commits
         try:
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()  
-                server.login(sender_email, sender_password)
-                text = msg.as_string()
-                server.sendmail(sender_email, user_email, text)
-        except Exception:
-            return
+            conn.execute("PRAGMA journal_mode = WAL").fetchall()
+        except sqlite3.OperationalError:
+            pass  # Another connection holds a lock; the next connection will switch it
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_KB}")
+    if TRACE_SQL:
+        conn.set_trace_callback(lambda sql: get_metrics_logger().debug("sql %s", " ".join(sql.split())))
+    return conn
 
-    # Function to handle login
-    def login():
-        username = username_entry.get()
-        password = password_entry.get()
+# Connection owned by DatabaseWriter: inside a group, commits are left to the writer
+class WriterConnection(InstrumentedConnection):
+    in_group = False
 
-        conn = connect_db()
-        cur = conn.cursor()
-        cur.execute("SELECT password_hash, user_id, email, first_login FROM users WHERE username = ?", (username,))
-        row = cur.fetchone()
+    def commit(self):
+        if not self.in_group:
+            super().commit()
 
-        if row and bcrypt.checkpw(password.encode(), row[0]):
-            global logged_in_user_id
-            logged_in_user_id = row[1]  # Store the logged-in user's ID
-            
-            if row[3]:  # Check if first_login is True (1)
-                send_feedback_email(row[2])  # Send feedback email
-                cur.execute("UPDATE users SET first_login = 0 WHERE user_id = ?", (logged_in_user_id,))
-                conn.commit()
-
-            status_label.config(text="Login successful!", fg="green")
-            login_root.after(1000, login_root.destroy)  # Close login window after success
-            user_email = row[2]
-            two_factor_window(user_email)
-            main()  # Launch the main app after successful login
-        else:
-            status_label.config(text="Invalid username or password", fg="red")
+    def rollback(self):
+        if not self.in_group:
+            super().rollback()
 
+    def __enter__(self):
+        return self if self.in_group else super().__enter__()
 
-    # Function to handle sign-up
-    def sign_up():
+    def __exit__(self, exc_type, exc, tb):
+        return False if self.in_group else super().__exit__(exc_type, exc, tb)
 
-        def on_close_register():
-            result = messagebox.askquestion('Exit',"Are you sure you wish to cancel?")
-            if result == 'yes':
-                registration.destroy()
-                login_root.deiconify()
+# Single thread that performs every write to products.db
+class DatabaseWriter:
+    """
+    Serialises all of the app's writes onto one thread and one connection.
+
+    Jobs are functions called as `func(conn, *args)`; `submit()` queues one and returns a 
+    `concurrent.futures.Future` for its result. The thread drains everything queued (up to 
+    WRITE_GROUP_MAX jobs) into a single transaction, each job inside its own savepoint, so a 
+    failing job is rolled back and reported through its future without affecting the others, 
+    and a burst of writes costs one commit instead of one per write. Futures complete only after 
+    the commit, so a result means the data is durable.
+
+    Existing write functions work unchanged as jobs: on the writer's connection `with conn:` 
+    and `conn.commit()` are no-ops while a group is open. Jobs submitted with 
+    `transaction=False` (VACUUM and friends) run on their own, outside any transaction.
+
+    With one writer there is never more than one write transaction in the process, so the GUI, 
+    the purge job and batch edits no longer fail with "database is locked"; readers are not 
+    blocked thanks to WAL mode (see `connect_db()`).
+
+    If the connection cannot be opened, or a failed group cannot even be rolled back, every job 
+    in hand fails with that error and the next batch starts over on a new connection. The 
+    thread never dies with futures left waiting.
+    """
+    def __init__(self, db_name=DB_NAME):
+        self.db_name = db_name
+        self.jobs = queue.Queue()
+        self.commits = 0  # Transactions committed so far
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name="db-writer", daemon=True)
+        self.thread.start()
+
+    # Queue `func(conn, *args)` and return a Future for its result
+    def submit(self, func, *args, transaction=True):
+        if self.closed:
+            raise RuntimeError("the database writer is closed")
+        future = concurrent.futures.Future()
+        self.jobs.put((func, args, transaction, future))
+        return future
+
+    # Finish the queued jobs, then close the connection and end the thread
+    def close(self):
+        self.closed = True
+        self.jobs.put(None)
+        self.thread.join()
+
+    # Queue a single statement; the Future's result is its rowcount
+    def execute(self, sql, params=()):
+        return self.submit(lambda conn: conn.execute(sql, params).rowcount)
+
+    # Open the writer's connection
+    def connect(self):
+        conn = connect_db(self.db_name, factory=WriterConnection)
+        conn.isolation_level = None  # BEGIN/COMMIT are issued explicitly
+        try:
+            attach_archive(conn)
+        except sqlite3.Error as e:
+            get_metrics_logger().warning("writer could not attach the archive: %s", e)
+        return conn
+
+    def run(self):
+        conn = None
+        closing = False
+        while not closing:
+            batch = [self.jobs.get()]
+            while len(batch) < WRITE_GROUP_MAX and batch[-1] is not None:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:  # close() was called; this is the last batch
+                closing = True
+                batch.pop()
+                if not batch:
+                    break
+
+            try:
+                if conn is None:
+                    conn = self.connect()
+
+                # Keep queue order: jobs that must run outside a transaction split the group
+                group = []
+                for job in batch:
+                    if job[2]:
+                        group.append(job)
+                    else:
+                        self.commit_group(conn, group)
+                        group = []
+                        self.run_alone(conn, job)
+                self.commit_group(conn, group)
+            except Exception as e:
+                # No connection, or one left in an unknown state: fail what is left of the batch 
+                # and reconnect for the next one
+                get_metrics_logger().error("writer error, reconnecting: %s", e)
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except sqlite3.Error:
+                        pass
+                conn = None
+
+        if conn is not None:
+            conn.close()
+
+    # Run a group of jobs in one transaction, one savepoint each
+    def commit_group(self, conn, group):
+        group = [job for job in group if job[3].set_running_or_notify_cancel()]
+        if not group:
+            return
 
-        def on_submit():
-            email_pattern = r'^[a-z0-9]+[\._]?[a-z0-9]+[@]\w+[.]\w+$'
-            email = email_entry.get()
-            username = username_entry.get()
-            password = password_entry.get()
+        outcomes = []
+        with span(f"group_commit jobs={len(group)}", "writer"):
+            try:
+                conn.in_group = True
+                conn.execute("BEGIN IMMEDIATE")
+                for func, args, _, future in group:
+                    conn.execute("SAVEPOINT job")
+                    try:
+                        outcomes.append((future, func(conn, *args), None))
+                        conn.execute("RELEASE job")
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO job")
+                        conn.execute("RELEASE job")
+                        outcomes.append((future, None, e))
+                conn.in_group = False
+                conn.execute("COMMIT")
+            except Exception as e:
+                conn.in_group = False
+                for _, _, _, future in group:
+                    future.set_exception(e)
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")  # If this fails as well, run() replaces the connection
+                return
+
+        self.commits += 1
+        for future, result, error in outcomes:
+            future.commit_no, future.group_size = self.commits, len(group)
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    # Run one job outside a transaction
+    def run_alone(self, conn, job):
+        func, args, _, future = job
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = func(conn, *args)
+        except Exception as e:
+            future.set_exception(e)
+            return
+        self.commits += 1
+        future.commit_no, future.group_size = self.commits, 1
+        future.set_result(result)
+
+# The app's writer thread, started on first use (SQLite only)
+db_writer = None
+db_writer_lock = threading.Lock()
+
+def get_writer():
+    global db_writer
+    if DB_BACKEND != "sqlite":
+        return None  # PostgreSQL handles concurrent writers itself
+    with db_writer_lock:
+        if db_writer is None:
+            db_writer = DatabaseWriter()
+        return db_writer
+
+# Run `func(conn, *args)` as a write and wait for the result
+def run_write(func, *args, conn=None):
+    """
+    Performs a write through the writer thread and returns its result (or raises its error).
+    This waits for every job queued before it, so the GUI thread uses `run_write_async()` instead.
+
+    When the caller passes its own `conn` (tests, benchmarks, other database files) or there is 
+    no writer (PostgreSQL), `func` runs directly on that connection instead.
+
+    Args:
+        func (callable): Called as `func(conn, *args)`.
+        *args: Arguments for `func`.
+        conn (sqlite3.Connection, optional): Connection the caller manages itself.
+
+    Returns:
+        The value returned by `func`.
+    """
+    writer = get_writer() if conn is None else None
+    if writer is None:
+        return func(conn or connect_db(), *args)
+    return writer.submit(func, *args).result()
+
+# Call `on_done(result, error)` on the Tk event loop once a Future finishes
+def when_done(widget, future, on_done=None):
+    """
+    Waits for a Future without blocking the GUI, the way `run_in_background()` waits for its thread.
+
+    The event loop polls the Future with `widget.after` and calls `on_done(result, error)` on the 
+    GUI thread once it is done. Without `on_done`, a failure is only logged.
+
+    Args:
+        widget (Tkinter Widget): Any live widget belonging to the running event loop.
+        future (concurrent.futures.Future): E.g. from `DatabaseWriter.submit()`.
+        on_done (callable, optional): Called as `on_done(result, error)`.
+
+    Returns:
+        concurrent.futures.Future: The same Future.
+    """
+    def poll():
+        if not future.done():
+            widget.after(20, poll)
+            return
+        error = future.exception()
+        if on_done:
+            on_done(None if error is not None else future.result(), error)
+        elif error is not None:
+            get_metrics_logger().warning("background write failed: %s", error)
+
+    poll()
+    return future
+
+# Queue `func(conn, *args)` as a write without waiting for it; `on_done(result, error)` runs on the Tk thread
+def run_write_async(widget, func, *args, on_done=None):
+    """
+    Performs a write like `run_write()`, but returns at once so the window stays responsive while 
+    the write waits behind other writer jobs (a purge chunk, the trigram catch-up, a VACUUM).
+
+    Without a writer (PostgreSQL), `func` runs on a worker thread on its own connection.
+
+    Args:
+        widget (Tkinter Widget): Any live widget belonging to the running event loop.
+        func (callable): Called as `func(conn, *args)`.
+        *args: Arguments for `func`.
+        on_done (callable, optional): Called as `on_done(result, error)` after the commit.
+
+    Returns:
+        concurrent.futures.Future: The write's result.
+    """
+    writer = get_writer()
+    if writer is not None:
+        return when_done(widget, writer.submit(func, *args), on_done)
+
+    future = concurrent.futures.Future()
+
+    def work():
+        try:
+            future.set_result(func(connect_db(), *args))
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=work, daemon=True).start()
+    return when_done(widget, future, on_done)
+
+# SQL expression turning a MM/DD/YY date column into a sortable YYYY-MM-DD string
+def iso_date_sql(column):
+    return f"('20' || substr({column}, 7, 2) || '-' || substr({column}, 1, 2) || '-' || substr({column}, 4, 2))"
+
+# SQL condition that holds when a MM/DD/YY date column is well formed (iso_date_sql() garbles anything else)
+def valid_date_sql(conn, column):
+    if is_postgres(conn):
+        return f"({column} ~ '^[0-9][0-9]/[0-9][0-9]/[0-9][0-9]$')"
+    return f"({column} GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9]')"
+
+# SQL expression giving the days from now until a MM/DD/YY date column (NULL when it doesn't parse)
+def days_until_sql(conn, column):
+    if is_postgres(conn):
+        return f"CAST(EXTRACT(EPOCH FROM mmddyy_date({column}) - localtimestamp) / 86400 AS DOUBLE PRECISION)"
+    return f"(julianday({iso_date_sql(column)}) - julianday('now', 'localtime'))"
+
+# Columns the product grid can sort by, as SQL expressions (dates sort by their ISO form)
+GRID_SORT_KEYS = {
+    "name": "name",
+    "qty": "quantity",
+    "group": '"group"',
+    "exp": iso_date_sql("expiration"),
+    "add": iso_date_sql('"add"'),
+}
+
+# One index per sort key so ORDER BY ... LIMIT reads rows in order instead of sorting the table
+GRID_INDEXES = [f'''CREATE INDEX IF NOT EXISTS idx_products_user_{column} ON products (user_id, {key})'''
+                for column, key in GRID_SORT_KEYS.items()]
+
+# Logins that are still valid; only a hash of each token is stored (see `create_session()`)
+SESSIONS_TABLE = '''CREATE TABLE IF NOT EXISTS sessions (
+                        token_hash TEXT PRIMARY KEY,
+                        user_id INTEGER NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+                        created_at TEXT NOT NULL,
+                        expires_at TEXT NOT NULL) WITHOUT ROWID'''
+SESSIONS_INDEX = '''CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)'''
+USERNAME_INDEX = '''CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users (username)'''
+
+# Alerts already raised for each product, so every alert is delivered once (see `notification_pass()`)
+NOTIFICATIONS_TABLE = '''CREATE TABLE IF NOT EXISTS notifications (
+                             user_id INTEGER NOT NULL,
+                             kind TEXT NOT NULL,
+                             product_id INTEGER NOT NULL,
+                             detail TEXT NOT NULL,
+                             name TEXT,
+                             created_at TEXT NOT NULL,
+                             emailed_at TEXT,
+                             email_attempts INTEGER NOT NULL DEFAULT 0,
+                             last_error TEXT,
+                             seen_at TEXT,
+                             PRIMARY KEY (user_id, kind, product_id, detail)) WITHOUT ROWID'''
+NOTIFICATIONS_INDEX = '''CREATE INDEX IF NOT EXISTS idx_notifications_unsent ON notifications (user_id) WHERE emailed_at IS NULL'''
+
+# PostgreSQL schema: same tables and column order as SQLite (dates stay MM/DD/YY text), with PL/pgSQL triggers in place of SQLite's
+POSTGRES_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS users (
+           user_id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+           email TEXT NOT NULL,
+           username TEXT NOT NULL,
+           password_hash BYTEA NOT NULL,
+           first_login INTEGER DEFAULT 1,
+           totp_secret TEXT)''',
+    USERNAME_INDEX,
+    SESSIONS_TABLE.replace(" WITHOUT ROWID", ""),
+    SESSIONS_INDEX,
+    '''CREATE TABLE IF NOT EXISTS products (
+           name TEXT,
+           quantity INTEGER,
+           "group" INTEGER,
+           expiration TEXT,
+           "add" TEXT,
+           user_id BIGINT REFERENCES users (user_id) ON DELETE CASCADE,
+           vegetarian INTEGER,
+           vegan INTEGER,
+           gluten INTEGER,
+           lactose INTEGER,
+           eggs INTEGER,
+           nuts INTEGER,
+           halal INTEGER,
+           kosher INTEGER,
+           id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY)''',
+    '''CREATE INDEX IF NOT EXISTS idx_products_user ON products (user_id, name, expiration)''',
+    *GRID_INDEXES,
+    '''CREATE TABLE IF NOT EXISTS stock_daily (
+           user_id BIGINT, name TEXT, day TEXT,
+           added INTEGER NOT NULL DEFAULT 0, consumed INTEGER NOT NULL DEFAULT 0,
+           discarded INTEGER NOT NULL DEFAULT 0, expired INTEGER NOT NULL DEFAULT 0,
+           PRIMARY KEY (user_id, name, day))''',
+    '''CREATE TABLE IF NOT EXISTS stock_daily_group (
+           user_id BIGINT, "group" INTEGER, day TEXT,
+           added INTEGER NOT NULL DEFAULT 0, consumed INTEGER NOT NULL DEFAULT 0,
+           discarded INTEGER NOT NULL DEFAULT 0, expired INTEGER NOT NULL DEFAULT 0,
+           PRIMARY KEY (user_id, "group", day))''',
+    NOTIFICATIONS_TABLE.replace(" WITHOUT ROWID", ""),
+    NOTIFICATIONS_INDEX,
+    # Per-user change counters for products (see `data_version()`): bumped once per user by every
+    # transaction that writes to that user's products
+    '''DROP TRIGGER IF EXISTS products_data_version ON products''',
+    '''DROP FUNCTION IF EXISTS bump_data_version()''',
+    '''DROP TABLE IF EXISTS data_version''',
+    '''CREATE TABLE IF NOT EXISTS data_versions (
+           user_id BIGINT PRIMARY KEY,
+           version BIGINT NOT NULL,
+           txid BIGINT)''',
+    '''CREATE OR REPLACE FUNCTION bump_data_versions() RETURNS trigger AS $$
+       BEGIN
+           IF TG_OP IN ('UPDATE', 'DELETE') THEN
+               INSERT INTO data_versions AS v (user_id, version, txid) VALUES (coalesce(OLD.user_id, 0), 1, txid_current())
+               ON CONFLICT (user_id) DO UPDATE SET version = v.version + 1, txid = txid_current()
+               WHERE v.txid IS DISTINCT FROM txid_current();
+           END IF;
+           IF TG_OP IN ('INSERT', 'UPDATE') THEN
+               INSERT INTO data_versions AS v (user_id, version, txid) VALUES (coalesce(NEW.user_id, 0), 1, txid_current())
+               ON CONFLICT (user_id) DO UPDATE SET version = v.version + 1, txid = txid_current()
+               WHERE v.txid IS DISTINCT FROM txid_current();
+           END IF;
+           RETURN NULL;
+       END $$ LANGUAGE plpgsql''',
+    '''DROP TRIGGER IF EXISTS products_data_versions ON products''',
+    '''CREATE TRIGGER products_data_versions AFTER INSERT OR UPDATE OR DELETE ON products
+       FOR EACH ROW EXECUTE FUNCTION bump_data_versions()''',
+    # MM/DD/YY text as a date, NULL when it doesn't parse (to_date() and make_date() raise instead)
+    '''CREATE OR REPLACE FUNCTION mmddyy_date(value TEXT) RETURNS DATE AS $$
+       BEGIN
+           IF value IS NULL OR value !~ '^[0-9][0-9]/[0-9][0-9]/[0-9][0-9]$' THEN
+               RETURN NULL;
+           END IF;
+           RETURN make_date(2000 + substr(value, 7, 2)::int, substr(value, 1, 2)::int, substr(value, 4, 2)::int);
+       EXCEPTION WHEN others THEN
+           RETURN NULL;
+       END $$ LANGUAGE plpgsql IMMUTABLE''',
+    # Stock history (see `create_stock_history()`)
+    '''CREATE TABLE IF NOT EXISTS stock_events (
+           id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+           user_id BIGINT,
+           product_id BIGINT,
+           name TEXT,
+           "group" INTEGER,
+           kind TEXT NOT NULL CHECK (kind IN ('add', 'consume', 'discard', 'expire')),
+           quantity INTEGER NOT NULL,
+           day TEXT NOT NULL DEFAULT to_char(current_date, 'YYYY-MM-DD'),
+           created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)''',
+    '''CREATE INDEX IF NOT EXISTS idx_stock_events_user_day ON stock_events (user_id, day)''',
+    '''CREATE INDEX IF NOT EXISTS idx_stock_events_product_day ON stock_events (product_id, day)''',
+    '''CREATE OR REPLACE FUNCTION stock_events_rollup() RETURNS trigger AS $$
+       BEGIN
+           INSERT INTO stock_daily AS d (user_id, name, day, added, consumed, discarded, expired)
+           VALUES (NEW.user_id, lower(trim(NEW.name)), NEW.day,
+                   CASE NEW.kind WHEN 'add' THEN NEW.quantity ELSE 0 END,
+                   CASE NEW.kind WHEN 'consume' THEN NEW.quantity ELSE 0 END,
+                   CASE NEW.kind WHEN 'discard' THEN NEW.quantity ELSE 0 END,
+                   CASE NEW.kind WHEN 'expire' THEN NEW.quantity ELSE 0 END)
+           ON CONFLICT (user_id, name, day) DO UPDATE SET
+               added = d.added + excluded.added, consumed = d.consumed + excluded.consumed,
+               discarded = d.discarded + excluded.discarded, expired = d.expired + excluded.expired;
+           INSERT INTO stock_daily_group AS d (user_id, "group", day, added, consumed, discarded, expired)
+           VALUES (NEW.user_id, NEW."group", NEW.day,
+                   CASE NEW.kind WHEN 'add' THEN NEW.quantity ELSE 0 END,
+                   CASE NEW.kind WHEN 'consume' THEN NEW.quantity ELSE 0 END,
+                   CASE NEW.kind WHEN 'discard' THEN NEW.quantity ELSE 0 END,
+                   CASE NEW.kind WHEN 'expire' THEN NEW.quantity ELSE 0 END)
+           ON CONFLICT (user_id, "group", day) DO UPDATE SET
+               added = d.added + excluded.added, consumed = d.consumed + excluded.consumed,
+               discarded = d.discarded + excluded.discarded, expired = d.expired + excluded.expired;
+           RETURN NULL;
+       END $$ LANGUAGE plpgsql''',
+    '''DROP TRIGGER IF EXISTS stock_events_rollup ON stock_events''',
+    '''CREATE TRIGGER stock_events_rollup AFTER INSERT ON stock_events
+       FOR EACH ROW EXECUTE FUNCTION stock_events_rollup()''',
+    '''CREATE OR REPLACE FUNCTION products_stock_event() RETURNS trigger AS $$
+       BEGIN
+           IF TG_OP = 'INSERT' AND NEW.quantity > 0 THEN
+               INSERT INTO stock_events (user_id, product_id, name, "group", kind, quantity)
+               VALUES (NEW.user_id, NEW.id, NEW.name, NEW."group", 'add', NEW.quantity);
+           ELSIF TG_OP = 'UPDATE' AND NEW.quantity <> OLD.quantity THEN
+               INSERT INTO stock_events (user_id, product_id, name, "group", kind, quantity)
+               VALUES (NEW.user_id, NEW.id, NEW.name, NEW."group",
+                       CASE WHEN NEW.quantity > OLD.quantity THEN 'add' ELSE 'consume' END,
+                       abs(NEW.quantity - OLD.quantity));
+           ELSIF TG_OP = 'DELETE' AND OLD.quantity > 0 THEN
+               INSERT INTO stock_events (user_id, product_id, name, "group", kind, quantity)
+               VALUES (OLD.user_id, OLD.id, OLD.name, OLD."group",
+                       CASE WHEN mmddyy_date(OLD.expiration) < current_date THEN 'expire' ELSE 'discard' END,
+                       OLD.quantity);
+           END IF;
+           RETURN NULL;
+       END $$ LANGUAGE plpgsql''',
+    '''DROP TRIGGER IF EXISTS products_stock ON products''',
+    '''CREATE TRIGGER products_stock AFTER INSERT OR UPDATE OF quantity OR DELETE ON products
+       FOR EACH ROW EXECUTE FUNCTION products_stock_event()''',
+    # Dashboard counts (see `create_product_summary()`)
+    '''CREATE TABLE IF NOT EXISTS product_summary (
+           user_id BIGINT NOT NULL,
+           "group" INTEGER NOT NULL,
+           bucket TEXT NOT NULL,
+           items INTEGER NOT NULL DEFAULT 0,
+           quantity INTEGER NOT NULL DEFAULT 0,
+           PRIMARY KEY (user_id, "group", bucket))''',
+    '''CREATE TABLE IF NOT EXISTS product_summary_state (
+           id INTEGER PRIMARY KEY CHECK (id = 1),
+           week TEXT NOT NULL)''',
+    '''CREATE OR REPLACE FUNCTION expiry_bucket(expiration TEXT) RETURNS TEXT AS $$
+       DECLARE
+           week TEXT := to_char(date_trunc('week', mmddyy_date(expiration)), 'YYYY-MM-DD');
+       BEGIN
+           IF week IS NULL THEN
+               RETURN 'none';
+           ELSIF week < (SELECT s.week FROM product_summary_state s) THEN
+               RETURN 'expired';
+           END IF;
+           RETURN week;
+       END $$ LANGUAGE plpgsql STABLE''',
+    '''CREATE OR REPLACE FUNCTION adjust_product_summary(row_user BIGINT, row_group INTEGER, row_expiration TEXT,
+                                                      row_quantity INTEGER, sign INTEGER) RETURNS void AS $$
+       BEGIN
+           INSERT INTO product_summary AS s (user_id, "group", bucket, items, quantity)
+           VALUES (coalesce(row_user, 0), coalesce(row_group, 0), expiry_bucket(row_expiration),
+                   sign, sign * coalesce(row_quantity, 0))
+           ON CONFLICT (user_id, "group", bucket) DO UPDATE SET
+               items = s.items + excluded.items, quantity = s.quantity + excluded.quantity;
+       END $$ LANGUAGE plpgsql''',
+    '''CREATE OR REPLACE FUNCTION products_summary() RETURNS trigger AS $$
+       BEGIN
+           IF TG_OP IN ('UPDATE', 'DELETE') THEN
+               PERFORM adjust_product_summary(OLD.user_id, OLD."group", OLD.expiration, OLD.quantity, -1);
+           END IF;
+           IF TG_OP IN ('INSERT', 'UPDATE') THEN
+               PERFORM adjust_product_summary(NEW.user_id, NEW."group", NEW.expiration, NEW.quantity, 1);
+           END IF;
+           RETURN NULL;
+       END $$ LANGUAGE plpgsql''',
+    '''DROP TRIGGER IF EXISTS products_summary ON products''',
+    '''CREATE TRIGGER products_summary AFTER INSERT OR UPDATE OF quantity, expiration, "group", user_id OR DELETE ON products
+       FOR EACH ROW EXECUTE FUNCTION products_summary()''',
+    # Purged products (see `purge_products()`); SQLite keeps them in a separate database file instead
+    '''CREATE TABLE IF NOT EXISTS products_archive (
+           name TEXT,
+           quantity INTEGER,
+           "group" INTEGER,
+           expiration TEXT,
+           "add" TEXT,
+           user_id BIGINT,
+           vegetarian INTEGER,
+           vegan INTEGER,
+           gluten INTEGER,
+           lactose INTEGER,
+           eggs INTEGER,
+           nuts INTEGER,
+           halal INTEGER,
+           kosher INTEGER,
+           id BIGINT PRIMARY KEY,
+           archived_at TEXT)''',
+    '''CREATE INDEX IF NOT EXISTS idx_products_archive_user ON products_archive (user_id, name)''',
+]
+
+# Create the PostgreSQL tables
+def create_postgres_schema(conn):
+    with conn:
+        created = conn.execute("SELECT to_regclass('product_summary') IS NULL").fetchone()[0]
+        for statement in POSTGRES_SCHEMA:
+            conn.execute(statement)
+        conn.execute("INSERT INTO product_summary_state (id, week) VALUES (1, ?) ON CONFLICT (id) DO NOTHING", (week_start(),))
+
+        # Fill the dashboard counts from the existing products the first time
+        if created:
+            conn.execute('''INSERT INTO product_summary (user_id, "group", bucket, items, quantity)
+                            SELECT coalesce(user_id, 0), coalesce("group", 0), expiry_bucket(expiration),
+                                   COUNT(*), SUM(coalesce(quantity, 0))
+                            FROM products
+                            GROUP BY 1, 2, 3''')
+
+# Columns of the products table, in the order `SELECT *` returns them (id comes last)
+PRODUCT_COLUMNS = '''name, quantity, "group", expiration, "add", user_id, vegetarian, vegan, gluten, lactose, eggs, nuts, halal, kosher'''
+
+PRODUCTS_TABLE = '''CREATE TABLE IF NOT EXISTS products (
+                            name TEXT,
+                            quantity INTEGER,
+                            "group" INTEGER,
+                            expiration DATE,
+                            "add" DATE,
+                            user_id TEXT,
+                            vegetarian BOOLEAN,
+                            vegan BOOLEAN,
+                            gluten BOOLEAN,
+                            lactose BOOLEAN,
+                            eggs BOOLEAN,
+                            nuts BOOLEAN,
+                            halal BOOLEAN,
+                            kosher BOOLEAN,
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE)'''
+
+# Function to create a 'products' table if it doesn't already exist
+def create_products(conn):
+    if is_postgres(conn):
+        create_postgres_schema(conn)
+        return
+
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(products)")]
+    if columns and "id" not in columns:
+        # Databases from before products had an id are rebuilt with one (existing rows keep their order)
+        conn.commit()
+        conn.executescript(f'''BEGIN;
+                               ALTER TABLE products RENAME TO products_old;
+                               {PRODUCTS_TABLE};
+                               INSERT INTO products ({PRODUCT_COLUMNS}) SELECT {PRODUCT_COLUMNS} FROM products_old;
+                               DROP TABLE products_old;
+                               COMMIT;''')
+
+    with conn:
+        conn.execute(PRODUCTS_TABLE)
+        conn.execute('''CREATE INDEX IF NOT EXISTS idx_products_user ON products (user_id, name, expiration)''')
+        for statement in GRID_INDEXES:
+            conn.execute(statement)
+
+    create_data_version(conn)
+    create_stock_history(conn)
+    create_product_summary(conn)
+    create_product_trigrams(conn)
+    with conn:
+        conn.execute(NOTIFICATIONS_TABLE)
+        conn.execute(NOTIFICATIONS_INDEX)
+    attach_archive(conn)
+
+# Per-user change counters for products (see `data_version()`)
+def create_data_version(conn):
+    def bump(row):
+        return f'''INSERT INTO data_versions (user_id, version) VALUES (coalesce({row}.user_id, ''), 1)
+                   ON CONFLICT (user_id) DO UPDATE SET version = version + 1;'''
+
+    with conn:
+        # Databases from before the counters were per user have a single one for everybody
+        for event in ("insert", "update", "delete"):
+            conn.execute(f"DROP TRIGGER IF EXISTS products_data_version_{event}")
+        conn.execute("DROP TABLE IF EXISTS data_version")
+
+        conn.execute('''CREATE TABLE IF NOT EXISTS data_versions (
+                            user_id TEXT PRIMARY KEY,
+                            version INTEGER NOT NULL) WITHOUT ROWID''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS products_data_versions_insert AFTER INSERT ON products
+                         BEGIN
+                             {bump("NEW")}
+                         END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS products_data_versions_update AFTER UPDATE ON products
+                         BEGIN
+                             {bump("OLD")}
+                             INSERT INTO data_versions (user_id, version)
+                             SELECT coalesce(NEW.user_id, ''), 1 WHERE NEW.user_id IS NOT OLD.user_id
+                             ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+                         END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS products_data_versions_delete AFTER DELETE ON products
+                         BEGIN
+                             {bump("OLD")}
+                         END''')
+
+# Table holding archived products: in the attached archive database on SQLite, in the main database on PostgreSQL
+def archive_table(conn):
+    return "products_archive" if is_postgres(conn) else "archive.products_archive"
+
+# Attach the archive database to a connection as schema "archive"
+def attach_archive(conn, path=None):
+    """
+    Attaches the cold-storage archive database and makes sure its table exists.
+
+    Purged products live in `archive.products_archive`, a separate SQLite file, so the hot 
+    `products` table (and every scan of it) stays small while old rows remain searchable. 
+    Attaching is per connection and this function is a no-op once the archive is attached. 
+    Rows archived by older versions into a `products_archive` table inside the main database 
+    are moved over the first time.
+
+    Args:
+        conn (sqlite3.Connection): SQLite connection object (no transaction may be open).
+        path (str, optional): Archive database file. Defaults to ARCHIVE_DB_NAME next to the 
+            main database file.
+
+    Returns:
+        None
+    """
+    databases = {row[1]: row[2] for row in conn.execute("PRAGMA database_list")}
+    if "archive" in databases:
+        return
+
+    if path is None:
+        path = os.path.join(os.path.dirname(databases.get("main") or "") or CURRENT_DIR, ARCHIVE_DB_NAME)
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+
+    with conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS archive.products_archive (
+                            name TEXT,
+                            quantity INTEGER,
+                            "group" INTEGER,
+                            expiration DATE,
+                            "add" DATE,
+                            user_id TEXT,
+                            vegetarian BOOLEAN,
+                            vegan BOOLEAN,
+                            gluten BOOLEAN,
+                            lactose BOOLEAN,
+                            eggs BOOLEAN,
+                            nuts BOOLEAN,
+                            halal BOOLEAN,
+                            kosher BOOLEAN,
+                            id INTEGER PRIMARY KEY,
+                            archived_at TEXT)''')
+        conn.execute('''CREATE INDEX IF NOT EXISTS archive.idx_products_archive_user ON products_archive (user_id, name)''')
+
+        if conn.execute("SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = 'products_archive'").fetchone():
+            conn.execute("INSERT OR REPLACE INTO archive.products_archive SELECT * FROM main.products_archive")
+            conn.execute("DROP TABLE main.products_archive")
+
+# Function to create the stock history tables, their rollups and the triggers that feed them
+def create_stock_history(conn):
+    """
+    Creates the append-only `stock_events` log and its daily rollup tables.
+
+    Triggers on `products` write an event for every quantity change, so no code path (or other 
+    process) can skip the history:
+    - insert: "add" with the starting quantity
+    - quantity raised/lowered: "add"/"consume" with the difference
+    - delete: "expire" if the product was past its expiration date, otherwise "discard"
+
+    A trigger on `stock_events` keeps `stock_daily` (per user, product name and day) and 
+    `stock_daily_group` (per user, food group and day) up to date in the same transaction, so 
+    analytics read the small rollups instead of replaying events.
+
+    Args:
+        conn (sqlite3.Connection): SQLite connection object.
+
+    Returns:
+        None
+    """
+    kind_columns = """CASE NEW.kind WHEN 'add' THEN NEW.quantity ELSE 0 END,
+                      CASE NEW.kind WHEN 'consume' THEN NEW.quantity ELSE 0 END,
+                      CASE NEW.kind WHEN 'discard' THEN NEW.quantity ELSE 0 END,
+                      CASE NEW.kind WHEN 'expire' THEN NEW.quantity ELSE 0 END"""
+    accumulate = """added = added + excluded.added, consumed = consumed + excluded.consumed,
+                    discarded = discarded + excluded.discarded, expired = expired + excluded.expired"""
+
+    with conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS stock_events (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            user_id TEXT,
+                            product_id INTEGER,
+                            name TEXT,
+                            "group" INTEGER,
+                            kind TEXT NOT NULL CHECK (kind IN ('add', 'consume', 'discard', 'expire')),
+                            quantity INTEGER NOT NULL,
+                            day DATE NOT NULL DEFAULT (date('now', 'localtime')),
+                            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)''')
+        conn.execute('''CREATE INDEX IF NOT EXISTS idx_stock_events_user_day ON stock_events (user_id, day)''')
+        conn.execute('''CREATE INDEX IF NOT EXISTS idx_stock_events_product_day ON stock_events (product_id, day)''')
+
+        for table, key in (("stock_daily", "name TEXT"), ("stock_daily_group", '"group" INTEGER')):
+            key_name = key.split()[0]
+            conn.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+                                user_id TEXT,
+                                {key},
+                                day DATE,
+                                added INTEGER NOT NULL DEFAULT 0,
+                                consumed INTEGER NOT NULL DEFAULT 0,
+                                discarded INTEGER NOT NULL DEFAULT 0,
+                                expired INTEGER NOT NULL DEFAULT 0,
+                                PRIMARY KEY (user_id, {key_name}, day)) WITHOUT ROWID''')
+
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS stock_events_rollup AFTER INSERT ON stock_events
+                         BEGIN
+                             INSERT INTO stock_daily (user_id, name, day, added, consumed, discarded, expired)
+                             VALUES (NEW.user_id, lower(trim(NEW.name)), NEW.day, {kind_columns})
+                             ON CONFLICT (user_id, name, day) DO UPDATE SET {accumulate};
+                             INSERT INTO stock_daily_group (user_id, "group", day, added, consumed, discarded, expired)
+                             VALUES (NEW.user_id, NEW."group", NEW.day, {kind_columns})
+                             ON CONFLICT (user_id, "group", day) DO UPDATE SET {accumulate};
+                         END''')
+
+        event_columns = 'user_id, product_id, name, "group", kind, quantity'
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS products_stock_add AFTER INSERT ON products
+                         WHEN NEW.quantity > 0
+                         BEGIN
+                             INSERT INTO stock_events ({event_columns})
+                             VALUES (NEW.user_id, NEW.id, NEW.name, NEW."group", 'add', NEW.quantity);
+                         END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS products_stock_change AFTER UPDATE OF quantity ON products
+                         WHEN NEW.quantity <> OLD.quantity
+                         BEGIN
+                             INSERT INTO stock_events ({event_columns})
+                             VALUES (NEW.user_id, NEW.id, NEW.name, NEW."group",
+                                     CASE WHEN NEW.quantity > OLD.quantity THEN 'add' ELSE 'consume' END,
+                                     abs(NEW.quantity - OLD.quantity));
+                         END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS products_stock_remove AFTER DELETE ON products
+                         WHEN OLD.quantity > 0
+                         BEGIN
+                             INSERT INTO stock_events ({event_columns})
+                             VALUES (OLD.user_id, OLD.id, OLD.name, OLD."group",
+                                     CASE WHEN {iso_date_sql("OLD.expiration")} < date('now', 'localtime') THEN 'expire' ELSE 'discard' END,
+                                     OLD.quantity);
+                         END''')
+
+# Monday of the current week as YYYY-MM-DD
+def week_start(day=None):
+    day = day or date.today()
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+# SQL expression giving the dashboard bucket of a MM/DD/YY expiration: its week's Monday, 'expired' or 'none'
+def expiry_bucket_sql(column):
+    week = f"date({iso_date_sql(column)}, 'weekday 0', '-6 days')"
+    return f'''(CASE WHEN {week} IS NULL THEN 'none'
+                      WHEN {week} < (SELECT week FROM product_summary_state) THEN 'expired'
+                      ELSE {week} END)'''
+
+# Trigrams of a name, padded per word like pg_trgm ("Mlk" -> "  m", " ml", "mlk", "lk ")
+def name_trigrams(name):
+    grams = set()
+    for word in re.findall(r"[a-z0-9]+", (name or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+# Similarity of two trigram sets: shared trigrams over all trigrams (0 to 1)
+def trigram_similarity(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+# Function to create the trigram index over product names and the triggers that keep it current
+def create_product_trigrams(conn):
+    """
+    Creates `product_trigrams`, an inverted index from name trigrams to products.
+
+    Each row is (user_id, trigram, product_id, trigram_count), clustered by user and trigram, so 
+    a fuzzy search reads only the index ranges of the search term's trigrams for one user (see 
+    `fuzzy_search()`). Trigrams are computed in Python, which triggers cannot call, so the 
+    triggers only queue changed products in `product_trigram_queue` (with the old name, to 
+    remove its trigrams) and `sync_product_trigrams()` applies the queue in writer jobs off the 
+    GUI thread (see `fuzzy_search_job()`). 
+    When the table is first created, all existing products are queued; `main()` indexes them in 
+    the background with `catch_up_product_trigrams()`.
+
+    Args:
+        conn (sqlite3.Connection): SQLite connection object.
+
+    Returns:
+        None
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_trigrams'").fetchone()
+    with conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS product_trigrams (
+                            user_id TEXT,
+                            trigram TEXT NOT NULL,
+                            product_id INTEGER NOT NULL,
+                            trigram_count INTEGER NOT NULL,
+                            PRIMARY KEY (user_id, trigram, product_id)) WITHOUT ROWID''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS product_trigram_queue (
+                            seq INTEGER PRIMARY KEY,
+                            product_id INTEGER NOT NULL,
+                            user_id TEXT,
+                            old_name TEXT)''')
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS products_trigrams_add AFTER INSERT ON products BEGIN
+                            INSERT INTO product_trigram_queue (product_id) VALUES (new.id);
+                        END''')
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS products_trigrams_change AFTER UPDATE OF name, user_id ON products
+                        WHEN old.name IS NOT new.name OR old.user_id IS NOT new.user_id BEGIN
+                            INSERT INTO product_trigram_queue (product_id, user_id, old_name) VALUES (new.id, old.user_id, old.name);
+                        END''')
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS products_trigrams_remove AFTER DELETE ON products BEGIN
+                            INSERT INTO product_trigram_queue (product_id, user_id, old_name) VALUES (old.id, old.user_id, old.name);
+                        END''')
+        if not exists:
+            # Index the existing products on the next sync (started in the background by main())
+            conn.execute("INSERT INTO product_trigram_queue (product_id) SELECT id FROM products ORDER BY id")
+
+# Apply queued product changes to the trigram index (a writer job); returns how many were applied
+def sync_product_trigrams(conn, limit=-1):
+    queued = conn.execute("SELECT seq, product_id, user_id, old_name FROM product_trigram_queue ORDER BY seq LIMIT ?",
+                          (limit,)).fetchall()
+    if not queued:
+        return 0
+
+    removed = [(user_id, gram, product_id) for _, product_id, user_id, old_name in queued if old_name is not None
+               for gram in name_trigrams(old_name)]
+    # Bucket the new entries by (user, trigram); with ids visited in order, reading the buckets in 
+    # key order yields rows in primary key order, so a large batch (the first backfill) appends 
+    # to the B-tree instead of splitting pages all over it
+    ids = sorted({product_id for _, product_id, _, _ in queued})
+    buckets = collections.defaultdict(list)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        for product_id, user_id, name in conn.execute(
+                f"SELECT id, user_id, name FROM products WHERE id IN ({', '.join('?' * len(chunk))}) ORDER BY id", chunk):
+            grams = name_trigrams(name)
+            for gram in grams:
+                buckets[(user_id, gram)].append((product_id, len(grams)))
+    added = ((user_id, gram, product_id, count)
+             for user_id, gram in sorted(buckets, key=lambda key: ("" if key[0] is None else str(key[0]), key[1]))
+             for product_id, count in buckets[(user_id, gram)])
+
+    with conn:
+        conn.executemany("DELETE FROM product_trigrams WHERE user_id IS ? AND trigram = ? AND product_id = ?", removed)
+        conn.executemany("INSERT OR REPLACE INTO product_trigrams VALUES (?, ?, ?, ?)", added)
+        conn.execute("DELETE FROM product_trigram_queue WHERE seq <= ?", (queued[-1][0],))
+    return len(queued)
+
+# Function to create the dashboard summary table and the triggers that maintain it
+def create_product_summary(conn):
+    """
+    Creates `product_summary`: item count and total quantity per user, food group and expiry bucket.
+
+    A bucket is the Monday of the week a product expires (YYYY-MM-DD), "expired" for every week 
+    before the current one, or "none" for dates that don't parse. Triggers on `products` adjust 
+    the counts in the same transaction as each insert, update and delete, so the dashboard reads 
+    a few dozen rows instead of aggregating the inventory. `product_summary_state` remembers the 
+    current week; `roll_dashboard_buckets()` folds weeks that have passed into "expired".
+
+    The table is filled from the existing products the first time it is created.
+
+    Args:
+        conn (sqlite3.Connection): SQLite connection object.
+
+    Returns:
+        None
+    """
+    created = not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_summary'").fetchone()
+    key = '''coalesce({row}.user_id, ''), coalesce({row}."group", 0), {bucket}'''
+    accumulate = "items = items + excluded.items, quantity = quantity + excluded.quantity"
+
+    def adjust(row, sign):
+        return f'''INSERT INTO product_summary (user_id, "group", bucket, items, quantity)
+                   VALUES ({key.format(row=row, bucket=expiry_bucket_sql(row + ".expiration"))},
+                           {sign}1, {sign}coalesce({row}.quantity, 0))
+                   ON CONFLICT (user_id, "group", bucket) DO UPDATE SET {accumulate};'''
+
+    with conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS product_summary (
+                            user_id TEXT NOT NULL,
+                            "group" INTEGER NOT NULL,
+                            bucket TEXT NOT NULL,
+                            items INTEGER NOT NULL DEFAULT 0,
+                            quantity INTEGER NOT NULL DEFAULT 0,
+                            PRIMARY KEY (user_id, "group", bucket)) WITHOUT ROWID''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS product_summary_state (
+                            id INTEGER PRIMARY KEY CHECK (id = 1),
+                            week TEXT NOT NULL)''')
+        conn.execute("INSERT OR IGNORE INTO product_summary_state (id, week) VALUES (1, ?)", (week_start(),))
+
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS products_summary_add AFTER INSERT ON products
+                         BEGIN
+                             {adjust("NEW", "")}
+                         END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS products_summary_change
+                         AFTER UPDATE OF quantity, expiration, "group", user_id ON products
+                         BEGIN
+                             {adjust("OLD", "-")}
+                             {adjust("NEW", "")}
+                         END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS products_summary_remove AFTER DELETE ON products
+                         BEGIN
+                             {adjust("OLD", "-")}
+                         END''')
+
+        if created:
+            conn.execute(f'''INSERT INTO product_summary (user_id, "group", bucket, items, quantity)
+                             SELECT {key.format(row="products", bucket=expiry_bucket_sql("expiration"))} AS bucket_key,
+                                    COUNT(*), SUM(coalesce(quantity, 0))
+                             FROM products
+                             GROUP BY 1, 2, 3''')
+
+# Fold expiry buckets of weeks that have passed into "expired"
+def roll_dashboard_buckets(conn):
+    """
+    Moves the dashboard's expiry buckets forward to the current week.
+
+    Only `product_summary` rows are touched (a handful per user), never `products`, so this is 
+    cheap enough to run at startup and hourly. It does nothing when the week has not changed 
+    since the last run. Reads don't depend on it: `dashboard_summary()` counts buckets of past 
+    weeks as expired either way, rolling just keeps the table small.
+
+    Args:
+        conn (sqlite3.Connection): SQLite connection object.
+
+    Returns:
+        bool: True if buckets were rolled forward.
+    """
+    week = week_start()
+    if conn.execute("SELECT week FROM product_summary_state").fetchone()[0] >= week:
+        return False
+
+    with conn:
+        conn.execute('''INSERT INTO product_summary (user_id, "group", bucket, items, quantity)
+                        SELECT user_id, "group", 'expired', SUM(items), SUM(quantity) FROM product_summary
+                        WHERE bucket < ? AND bucket NOT IN ('expired', 'none')
+                        GROUP BY user_id, "group"
+                        ON CONFLICT (user_id, "group", bucket) DO UPDATE SET
+                            items = product_summary.items + excluded.items,
+                            quantity = product_summary.quantity + excluded.quantity''', (week,))
+        conn.execute("DELETE FROM product_summary WHERE bucket < ? AND bucket NOT IN ('expired', 'none')", (week,))
+        conn.execute("DELETE FROM product_summary WHERE items = 0")
+        conn.execute("UPDATE product_summary_state SET week = ?", (week,))
+    return True
+
+# Local date `days` days ago as YYYY-MM-DD (computed here rather than in SQL so queries run on any backend)
+def days_ago(days):
+    return (date.today() - timedelta(days=days)).isoformat()
+
+# Average daily consumption per product name over the last `days` days
+def consumption_rates(conn, user_id, days=30):
+    """
+    Reads the `stock_daily` rollup to get how fast each product is used up.
+
+    Args:
+        conn (sqlite3.Connection): SQLite connection object.
+        user_id (int): The user whose history is read.
+        days (int): Size of the look-back window in days (including today).
+
+    Returns:
+        dict: Lower-cased product name -> average units consumed per day.
+    """
+    cur = conn.cursor()
+    cur.execute('''SELECT name, SUM(consumed) FROM stock_daily
+                   WHERE user_id = ? AND day > ?
+                   GROUP BY name''', (user_id, days_ago(days)))
+    return {name: consumed / days for name, consumed in cur.fetchall()}
+
+# Average daily consumption per food group over the last `days` days
+def group_consumption_rates(conn, user_id, days=30):
+    cur = conn.cursor()
+    cur.execute('''SELECT "group", SUM(consumed) FROM stock_daily_group
+                   WHERE user_id = ? AND day > ?
+                   GROUP BY "group"''', (user_id, days_ago(days)))
+    return {group: consumed / days for group, consumed in cur.fetchall()}
+
+# Day-by-day history of one product name
+def consumption_history(conn, user_id, name, days=30):
+    cur = conn.cursor()
+    cur.execute('''SELECT day, added, consumed, discarded, expired FROM stock_daily
+                   WHERE user_id = ? AND name = ? AND day > ?
+                   ORDER BY day''', (user_id, name.strip().lower(), days_ago(days)))
+    return cur.fetchall()
+
+# Consumption forecast for every product of a user, computed with NumPy
+class Forecast:
+    """
+    Vectorised consumption forecast for one user's inventory.
+
+    Product rows are grouped by lower-cased name (restocks of "Milk" with different expiration 
+    dates share one consumption rate). All arrays are aligned with `names`:
+    - `quantity`: units currently in stock
+    - `rate`: expected units consumed per day (recent days weigh more)
+    - `days_until_empty`: quantity / rate (inf when nothing is being consumed)
+    - `projected_waste`: units expected to expire before they are used, assuming the 
+      earliest-expiring items are eaten first
+    """
+    def __init__(self, names, quantity, rate, projected_waste):
+        self.names = names
+        self.quantity = quantity
+        self.rate = rate
+        self.projected_waste = projected_waste
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.days_until_empty = np.where(rate > 0, quantity / rate, np.inf)
+
+    # Products expected to run out within `days` days, soonest first
+    def running_out(self, days=FORECAST_LOW_DAYS):
+        index = np.flatnonzero(self.days_until_empty <= days)
+        index = index[np.argsort(self.days_until_empty[index])]
+        return [(self.names[i], float(self.days_until_empty[i])) for i in index]
+
+    # Products expected to waste at least `minimum` units, most waste first
+    def wasting(self, minimum=1):
+        index = np.flatnonzero(self.projected_waste >= minimum)
+        index = index[np.argsort(-self.projected_waste[index])]
+        return [(self.names[i], float(self.projected_waste[i])) for i in index]
+
+# Forecast consumption, run-out dates and waste for all of a user's products at once
+def forecast_inventory(conn, user_id, days=FORECAST_WINDOW_DAYS, half_life=FORECAST_HALF_LIFE_DAYS):
+    """
+    Builds a `Forecast` from the `stock_daily` rollup and the current inventory.
+
+    Both inputs are read with one query each and processed as NumPy arrays, with no per-product 
+    Python loop:
+    1. The last `days` days of consumption become a (products x days) matrix, averaged with 
+       exponentially decaying weights (`half_life` days) to get a daily rate per product.
+    2. Stock rows are sorted by product and expiration and eaten earliest-expiring first; 
+       whatever cannot be eaten by a row's expiration is waste (see `expiry_waste()`).
+
+    Args:
+        conn (sqlite3.Connection): SQLite connection object.
+        user_id (int): The user whose inventory is forecast.
+        days (int): Days of history to use.
+        half_life (float): Days after which a day's consumption counts half as much.
+
+    Returns:
+        Forecast: The forecast for every product name the user has in stock.
+    """
+    cur = conn.cursor()
+    cur.execute(f'''SELECT lower(trim(name)), quantity, {days_until_sql(conn, "expiration")}
+                    FROM products WHERE user_id = ? AND quantity > 0''', (user_id,))
+    stock = cur.fetchall()
+    if not stock:
+        empty = np.array([], dtype=float)
+        return Forecast([], empty, empty, empty)
+
+    stock_names, stock_qty, days_left = zip(*stock)
+    names, stock_index = np.unique(np.array(stock_names, dtype=object), return_inverse=True)
+    stock_qty = np.array(stock_qty, dtype=float)
+    days_left = np.nan_to_num(np.array(days_left, dtype=float), nan=np.inf)  # Unparseable dates never expire
+
+    # Consumption matrix: one row per product name, one column per day back from today
+    cur.execute('''SELECT name, day, consumed FROM stock_daily
+                   WHERE user_id = ? AND consumed > 0 AND day > ?''', (user_id, days_ago(days)))
+    history = cur.fetchall()
+    rate = np.zeros(len(names))
+    if history:
+        hist_names, hist_days, consumed = zip(*history)
+        offsets = np.datetime64(date.today()) - np.array(hist_days, dtype="datetime64[D]")
+        hist_index = np.searchsorted(names, np.array(hist_names, dtype=object))
+        hist_index = np.minimum(hist_index, len(names) - 1)
+        known = names[hist_index] == np.array(hist_names, dtype=object)  # Ignore products no longer in stock
+        matrix = np.zeros((len(names), days))
+        offsets = np.clip(offsets.astype(int), 0, days - 1)
+        np.add.at(matrix, (hist_index[known], offsets[known]), np.array(consumed, dtype=float)[known])
+        weights = 0.5 ** (np.arange(days) / half_life)
+        rate = matrix @ weights / weights.sum()
+
+    quantity = np.bincount(stock_index, weights=stock_qty, minlength=len(names))
+    return Forecast(list(names), quantity, rate, expiry_waste(stock_index, stock_qty, days_left, rate))
+
+# Units of each product expected to expire before they are eaten
+def expiry_waste(stock_index, stock_qty, days_left, rate):
+    """
+    Projects waste per product, eating the earliest-expiring stock rows of each product first.
+
+    With `E` the units of a product eaten by the time one of its rows expires, 
+    `E_i = min(E_(i-1) + qty_i, rate * days_left_i)`: a row can only use the eating capacity 
+    left over by the rows that expire before it, and whatever it cannot use is waste. Rows are 
+    processed by their position within the product, for all products at once, so the loop 
+    runs once per row of the product with the most stock rows.
+
+    Args:
+        stock_index (numpy.ndarray): Product index of each stock row.
+        stock_qty (numpy.ndarray): Quantity of each stock row.
+        days_left (numpy.ndarray): Days until each row expires (inf if it never does).
+        rate (numpy.ndarray): Units consumed per day, per product.
+
+    Returns:
+        numpy.ndarray: Projected waste per product, aligned with `rate`.
+    """
+    if len(stock_index) == 0:
+        return np.zeros(len(rate))
+    order = np.lexsort((days_left, stock_index))
+    group, qty, left = stock_index[order], stock_qty[order], days_left[order]
+    never = np.isinf(left)
+    capacity = np.where(never, np.inf, rate[group] * np.where(never, 0.0, np.maximum(left, 0.0)))
+
+    first = np.r_[True, group[1:] != group[:-1]]
+    position = np.arange(len(group)) - np.maximum.accumulate(np.where(first, np.arange(len(group)), 0))
+    by_position = np.argsort(position, kind="stable")
+    bounds = np.searchsorted(position[by_position], np.arange(position.max() + 2))
+    eaten_by = np.zeros(len(group))
+    for k in range(position.max() + 1):
+        rows = by_position[bounds[k]:bounds[k + 1]]
+        eaten_before = eaten_by[rows - 1] if k else 0.0
+        eaten_by[rows] = np.minimum(eaten_before + qty[rows], capacity[rows])
+
+    eaten = eaten_by - np.where(first, 0.0, np.r_[0.0, eaten_by[:-1]])
+    waste = np.where(never, 0.0, np.maximum(0.0, qty - eaten))
+    return np.bincount(group, weights=waste, minlength=len(rate))
+
+# Function to create a 'users' table if it doesn't already exist        
+def create_users(conn):
+    if is_postgres(conn):
+        create_postgres_schema(conn)
+        return
+
+    with conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT NOT NULL,
+                username TEXT NOT NULL,
+                password_hash TEXT NOT NULL,
+                first_login BOOLEAN DEFAULT 1,
+                totp_secret TEXT
+            );
+        """)
+
+        # Older databases were created before per-user 2FA secrets existed
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+        if "totp_secret" not in columns:
+            conn.execute("ALTER TABLE users ADD COLUMN totp_secret TEXT")
+
+        conn.execute(SESSIONS_TABLE)
+        conn.execute(SESSIONS_INDEX)
+
+    # Logins look users up by username; older databases may hold duplicates, which keep a plain index
+    try:
+        with conn:
+            conn.execute(USERNAME_INDEX)
+    except sqlite3.IntegrityError:
+        get_metrics_logger().warning("users has duplicate usernames; idx_users_username is not unique")
+        with conn:
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_users_username_dup ON users (username)")
+
+# Class for handling products in the database
+class Product:
+    def __init__(self, name, quantity, group, expiration, add, user, info=None, id=None):
+        self.id = id
+        self.name = name
+        self.quantity = quantity
+        self.group = group
+        self.expiration = expiration
+        self.add = add
+        self.user = user
+        self.info = info if info else {
+            "Vegetarian": 0,
+            "Vegan": 0,
+            "Gluten": 0,
+            "Lactose": 0,
+            "Eggs": 0,
+            "Nuts": 0,
+            "Halal": 0,
+            "Kosher": 0
+        }
+
+    # Add a new product to the database and return its id
+    def add_product(self, conn):
+        with conn:
+            cur = conn.execute('''INSERT INTO products 
+                            (name, quantity, "group", expiration, "add", user_id, vegetarian, vegan, gluten, lactose, eggs, nuts, halal, kosher)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', 
+                         (self.name, self.quantity, self.group, self.expiration, self.add, self.user, 
+                          self.info["Vegetarian"], self.info["Vegan"], self.info["Gluten"], self.info["Lactose"],
+                          self.info["Eggs"], self.info["Nuts"], self.info["Halal"], self.info["Kosher"]))
+        self.id = cur.lastrowid
+        return self.id
+
+    # Load a product from the database by name and expiration
+    @staticmethod
+    def load_product(conn, name, expiration):
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM products WHERE name = ? AND expiration = ?", (name, expiration))
+        row = cur.fetchone()
+        if row:
+            info = {
+                "Vegetarian": row[6],
+                "Vegan": row[7],
+                "Gluten": row[8],
+                "Lactose": row[9],
+                "Eggs": row[10],
+                "Nuts": row[11],
+                "Halal": row[12],
+                "Kosher": row[13]
+            }
+            return Product(row[0], row[1], row[2], row[3], row[4], row[5], info, row[14])
+        else:
+            return None
+
+    # Update a product in the database (by id when known, otherwise by name and expiration)
+    def update_product(self, conn):
+        if self.id is not None:
+            with conn:
+                conn.execute('''UPDATE products SET 
+                                name = ?, quantity = ?, "group" = ?, expiration = ?, "add" = ?, user_id = ?, vegetarian = ?, vegan = ?, gluten = ?, lactose = ?, eggs = ?, nuts = ?, halal = ?, kosher = ?
+                                WHERE id = ?''',
+                             (self.name, self.quantity, self.group, self.expiration, self.add, self.user, 
+                              self.info["Vegetarian"], self.info["Vegan"], self.info["Gluten"], self.info["Lactose"],
+                              self.info["Eggs"], self.info["Nuts"], self.info["Halal"], self.info["Kosher"],
+                              self.id))
+            return
+
+        with conn:
+            conn.execute('''UPDATE products SET 
+                            quantity = ?, "group" = ?, "add" = ?, user_id = ?, vegetarian = ?, vegan = ?, gluten = ?, lactose = ?, eggs = ?, nuts = ?, halal = ?, kosher = ?
+                            WHERE name = ? AND expiration = ?''',
+                         (self.quantity, self.group, self.add, self.user, 
+                          self.info["Vegetarian"], self.info["Vegan"], self.info["Gluten"], self.info["Lactose"],
+                          self.info["Eggs"], self.info["Nuts"], self.info["Halal"], self.info["Kosher"],
+                          self.name, self.expiration))
+
+    # Delete a product from the database
+    @staticmethod
+    def delete_product(conn, name, expiration):
+        with conn:
+            conn.execute("DELETE FROM products WHERE name = ? AND expiration = ?", (name, expiration))
+
+    # Update many products by id with one executemany in a single transaction
+    @staticmethod
+    def update_many(conn, products):
+        with conn:
+            conn.executemany('''UPDATE products SET 
+                                name = ?, quantity = ?, "group" = ?, expiration = ?, "add" = ?, user_id = ?, vegetarian = ?, vegan = ?, gluten = ?, lactose = ?, eggs = ?, nuts = ?, halal = ?, kosher = ?
+                                WHERE id = ?''',
+                             [product_row(product) for product in products])
+
+    # Fetch a single products row by primary key
+    @staticmethod
+    def load_by_id(conn, product_id):
+        return conn.execute("SELECT * FROM products WHERE id = ?", (product_id,)).fetchone()
+
+    # Delete a product from the database by id
+    @staticmethod
+    def delete_by_id(conn, product_id):
+        with conn:
+            conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
+
+    # Delete many products by id in a single transaction
+    @staticmethod
+    def delete_many(conn, product_ids):
+        with conn:
+            conn.executemany("DELETE FROM products WHERE id = ?", [(product_id,) for product_id in product_ids])
+
+    # Search for products in the database by name (partial search), optionally for one user only
+    # With include_archive, archived products are included and every row gets a 16th column: 1 if archived
+    @staticmethod
+    def search_product(conn, search_term, user_id=None, include_archive=False):
+        cur = conn.cursor()
+        user_filter = "" if user_id is None else "user_id = ? AND "
+        params = (() if user_id is None else (user_id,)) + ('%' + search_term + '%',)
+        if include_archive:
+            if not is_postgres(conn):
+                attach_archive(conn)
+            cur.execute(f'''SELECT {PRODUCT_COLUMNS}, id, 0 FROM products WHERE {user_filter}name LIKE ?
+                           UNION ALL
+                           SELECT {PRODUCT_COLUMNS}, id, 1 FROM {archive_table(conn)} WHERE {user_filter}name LIKE ?''',
+                        params * 2)
+        else:
+            cur.execute(f"SELECT * FROM products WHERE {user_filter}name LIKE ?", params)
+        rows = cur.fetchall()
+        return rows
+    
+# Look up the login details for a username
+def find_user(conn, username):
+    cur = conn.cursor()
+    cur.execute("SELECT password_hash, user_id, email, first_login FROM users WHERE username = ?", (username,))
+    return cur.fetchone()
+
+# Dictionary that keeps only the most recently used entries
+class LRUCache:
+    """
+    A small thread-safe cache holding at most `size` entries, dropping the least recently used.
+
+    Used for user records, so a repeated login skips bcrypt.
+    """
+    def __init__(self, size):
+        self.size = size
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    # Return the stored value (marking it as recently used), or default if it is missing
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    # Store a value, evicting the least recently used entry when full
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    # Remove an entry if present
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+# User records by username: (password hash, HMAC of the last password that matched it, time cached)
+user_cache = LRUCache(USER_CACHE_SIZE)
+password_cache_key = secrets.token_bytes(32)  # Per process, so the HMACs are useless outside it
+
+# Check a username and password, returning the user's find_user() row or None
+@timed("authenticate")
+def authenticate(conn, username, password):
+    """
+    Verifies a login, using the user cache so repeat logins skip the lookup and bcrypt.
+
+    The first successful login for a username runs bcrypt as before and remembers an HMAC of 
+    the password under a random per-process key. Logging in again with the same password in 
+    the same process compares that HMAC instead of hashing again; anything else goes through 
+    bcrypt. The user's row is still read on every login, and the HMAC only counts while the 
+    stored password hash is the one it was checked against and for at most SESSION_HOURS, so a 
+    password changed by another process takes effect at once. Callers rate-limit failed 
+    attempts (see `login_attempts`).
+
+    Args:
+        conn (sqlite3.Connection): Database connection.
+        username (str): The username entered.
+        password (str): The password entered.
+
+    Returns:
+        tuple or None: `(password_hash, user_id, email, first_login)`, or None if the username 
+        does not exist or the password is wrong.
+    """
+    row = find_user(conn, username)
+    if row is None:
+        user_cache.pop(username)
+        return None
+
+    digest = hmac.new(password_cache_key, password.encode(), hashlib.sha256).digest()
+    cached = user_cache.get(username)
+    if (cached is not None and cached[0] == row[0] and time.monotonic() - cached[2] < SESSION_HOURS * 3600
+            and hmac.compare_digest(cached[1], digest)):
+        return row
+
+    with span("bcrypt.checkpw"):
+        password_ok = bcrypt.checkpw(password.encode(), row[0])
+    if password_ok:
+        user_cache.set(username, (row[0], digest, time.monotonic()))
+    return row if password_ok else None
+
+# Hash of a session token, as stored in the sessions table
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+# Start a session for a user and return its token (a writer job)
+def create_session(conn, user_id):
+    """
+    Records a new login that lasts SESSION_HOURS.
+
+    The token itself is only returned (and saved by `save_session_token()`); the table keeps its 
+    SHA-256, so reading the database does not reveal a usable token. Expired sessions are 
+    removed at the same time.
+
+    Args:
+        conn (sqlite3.Connection): Database connection.
+        user_id (int): The user who logged in.
+
+    Returns:
+        str: The new session token.
+    """
+    token = secrets.token_urlsafe(32)
+    now = datetime.now()
+    with conn:
+        conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now.isoformat(timespec="seconds"),))
+        conn.execute("INSERT INTO sessions (token_hash, user_id, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                     (hash_token(token), user_id, now.isoformat(timespec="seconds"),
+                      (now + timedelta(hours=SESSION_HOURS)).isoformat(timespec="seconds")))
+    return token
+
+# User ID of a valid session token, or None
+def resume_session(conn, token):
+    row = conn.execute("SELECT user_id FROM sessions WHERE token_hash = ? AND expires_at > ?",
+                       (hash_token(token), datetime.now().isoformat(timespec="seconds"))).fetchone()
+    return row[0] if row else None
+
+# End a session (a writer job)
+def end_session(conn, token):
+    with conn:
+        conn.execute("DELETE FROM sessions WHERE token_hash = ?", (hash_token(token),))
+
+# Save the session token for the next start; written atomically and readable only by the OS user
+def save_session_token(token):
+    os.makedirs(os.path.dirname(SESSION_FILE), mode=0o700, exist_ok=True)
+    partial = SESSION_FILE + ".partial"
+    with open(os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as file:
+        file.write(token)
+    os.replace(partial, SESSION_FILE)
+
+# The saved session token, or None
+def load_session_token():
+    try:
+        with open(SESSION_FILE) as file:
+            return file.read().strip() or None
+    except OSError:
+        return None
+
+# Forget the saved session token
+def clear_session_token():
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(SESSION_FILE)
+
+# The user of the saved session token as (user_id, username), if the session is still valid
+def saved_session_user(conn):
+    token = load_session_token()
+    user_id = resume_session(conn, token) if token else None
+    row = conn.execute("SELECT user_id, username FROM users WHERE user_id = ?", (user_id,)).fetchone() if user_id else None
+    if row is None and token:
+        clear_session_token()
+    return row
+
+# Forget the saved login of this computer and end its session (a stale token is simply dropped).
+# With a widget, the session is ended without waiting for the writer.
+def forget_saved_session(widget=None):
+    token = load_session_token()
+    if token and widget is not None:
+        run_write_async(widget, end_session, token)
+    elif token:
+        run_write(end_session, token)
+    clear_session_token()
+
+# Tools > Log Out: end the saved session and close the app
+def logout(parent):
+    if not messagebox.askyesno("Log Out", "Log out of FoodConnect? The app will close, and the next start asks for your login again."):
+        return
+    forget_saved_session()
+    parent.destroy()
+    sys.exit()
+
+# Dictionary whose entries expire after a fixed number of seconds
+class TTLCache:
+    """
+    A small in-memory cache where every entry expires `ttl` seconds after it was first stored.
+
+    Used to remember issued 2FA codes and to count sends/attempts per user for rate limiting,
+    so none of that state has to touch the database.
+    """
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _expired(self, key, now):
+        entry = self._data.get(key)
+        if entry and entry[1] <= now:
+            del self._data[key]
+            return True
+        return entry is None
+
+    # Return the stored value, or default if it is missing or expired
+    def get(self, key, default=None):
+        with self._lock:
+            if self._expired(key, time.monotonic()):
+                return default
+            return self._data[key][0]
+
+    # Store a value, restarting its lifetime
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+
+    # Remove an entry if present
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None or entry[1] <= time.monotonic():
+                return default
+            return entry[0]
+
+    # Count an event; the window starts with the first event and is not extended by later ones
+    def incr(self, key):
+        with self._lock:
+            now = time.monotonic()
+            if self._expired(key, now):
+                self._data[key] = (1, now + self.ttl)
+            else:
+                value, expires = self._data[key]
+                self._data[key] = (value + 1, expires)
+            return self._data[key][0]
+
+# Issued 2FA codes and rate limit counters, keyed by user_id
+two_fa_codes = TTLCache(TWO_FA_INTERVAL * (TWO_FA_TOLERANCE + 1))
+two_fa_sends = TTLCache(TWO_FA_RATE_WINDOW)
+two_fa_attempts = TTLCache(TWO_FA_RATE_WINDOW)
+
+# Failed logins, keyed by username
+login_attempts = TTLCache(LOGIN_RATE_WINDOW)
+
+# Run a blocking function on a worker thread and report back on the Tk event loop
+def run_in_background(widget, func, *args, on_done=None):
+    """
+    Runs `func(*args)` on a daemon thread so slow work (SMTP, etc.) never blocks the GUI.
+
+    Tkinter is not thread safe, so the worker never touches widgets. Instead the event loop 
+    polls for completion with `widget.after` and calls `on_done(result, error)` on the GUI thread.
+
+    Args:
+        widget (Tkinter Widget): Any live widget belonging to the running event loop.
+        func (callable): The blocking function to run.
+        *args: Positional arguments for `func`.
+        on_done (callable, optional): Called as `on_done(result, error)` once `func` finishes.
+
+    Returns:
+        threading.Thread: The started worker thread.
+    """
+    outcome = {"result": None, "error": None}
+
+    def worker():
+        try:
+            outcome["result"] = func(*args)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+
+    def poll():
+        if thread.is_alive():
+            widget.after(50, poll)
+        elif on_done:
+            on_done(outcome["result"], outcome["error"])
+
+    widget.after(50, poll)
+    return thread
+
+# Get (or create on first use) the user's own TOTP secret
+def get_totp_secret(conn, user_id):
+    row = conn.execute("SELECT totp_secret FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    if row and row[0]:
+        return row[0]
+
+    secret = pyotp.random_base32()
+    with conn:
+        conn.execute("UPDATE users SET totp_secret = ? WHERE user_id = ?", (secret, user_id))
+    return secret
+
+# Issue a 2FA code for the user, reusing the one already sent while it is still valid
+def issue_2fa_code(user_id, secret):
+    code = two_fa_codes.get(user_id)
+    if code is None:
+        code = pyotp.TOTP(secret, interval=TWO_FA_INTERVAL).now()
+        two_fa_codes.set(user_id, code)
+    return code
+
+# Check an entered 2FA code, allowing for clock drift and delivery delay
+def verify_2fa_code(user_id, secret, entered_code):
+    entered_code = entered_code.strip()
+    if not re.fullmatch(r"[0-9]+", entered_code):
+        return False  # Also keeps non-ASCII text away from compare_digest, which raises on it
+    issued = two_fa_codes.get(user_id)
+    if issued is not None and hmac.compare_digest(issued, entered_code):
+        valid = True
+    else:
+        valid = pyotp.TOTP(secret, interval=TWO_FA_INTERVAL).verify(entered_code, valid_window=TWO_FA_TOLERANCE)
+
+    if valid:
+        # A code can only be used once
+        two_fa_codes.pop(user_id)
+        two_fa_attempts.pop(user_id)
+    return valid
+
+# Send 2FA code to the user's email
+@timed("smtp.send_2fa_email")
+def send_2fa_email(email, code):
+    """
+    Emails a 2FA code to the user.
+
+    This call blocks on the SMTP server, so the GUI runs it through `run_in_background()`.
+
+    Args:
+        email (str): The recipient's email address.
+        code (str): The 2FA code to send.
+
+    Returns:
+        bool: True if the email was handed to the SMTP server, False otherwise.
+    """
+    subject = "Your FoodConnect 2FA Code"
+    body = f"Your 2FA code is: {code}. It is valid for about {TWO_FA_INTERVAL * (TWO_FA_TOLERANCE + 1)} seconds."
+
+    msg = MIMEMultipart()
+    msg["From"] = SMTP_SENDER
+    msg["To"] = email
+    msg["Subject"] = subject
+    
+    msg.attach(MIMEText(body, "plain"))
+
+    try:
+        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_S) as server:
+            server.starttls()
+            server.login(SMTP_SENDER, SMTP_PASSWORD)
+            server.sendmail(SMTP_SENDER, email, msg.as_string())
+    except Exception:
+        return False
+    return True
+
+# 2FA verification screen
+def two_factor_window(parent, user_id, user_email, secret, on_success):
+    """
+    Shows the 2FA prompt as a child window of the login screen.
+
+    The window is a small state machine driven entirely by the existing event loop (no nested 
+    `mainloop()`):
+    - "sending": the code is being emailed on a worker thread; the user can already type.
+    - "waiting": the email went out (or failed) and the code can be verified or resent.
+    - "locked": too many sends or wrong codes in the rate limit window.
+    - "verified": the code matched; the window closes and `on_success()` is called.
+
+    Args:
+        parent (Tkinter Tk): The login window that owns the event loop.
+        user_id (int): ID of the user logging in.
+        user_email (str): Address the code is emailed to.
+        secret (str): The user's TOTP secret.
+        on_success (callable): Called with no arguments after successful verification.
+
+    Returns:
+        tk.Toplevel: The 2FA window.
+    """
+    state = {"value": None}
+
+    two_fa_root = tk.Toplevel(parent)
+    two_fa_root.title("2FA Verification")
+    two_fa_root.geometry("300x220")
+    two_fa_root.transient(parent)
+
+    tk.Label(two_fa_root, text="Enter the 2FA code sent to your email:").pack(pady=10)
+    code_entry = tk.Entry(two_fa_root)
+    code_entry.pack(pady=5)
+    code_entry.focus_set()
+
+    status_label = tk.Label(two_fa_root, text="")
+    status_label.pack(pady=5)
+
+    def set_state(new_state, message="", color="black"):
+        state["value"] = new_state
+        status_label.config(text=message, fg=color)
+        locked = new_state in ("locked", "verified")
+        verify_button.config(state=tk.DISABLED if locked else tk.NORMAL)
+        resend_button.config(state=tk.DISABLED if locked or new_state == "sending" else tk.NORMAL)
+
+    def on_sent(sent, error):
+        if not two_fa_root.winfo_exists() or state["value"] != "sending":
+            return
+        if sent:
+            set_state("waiting", "Code sent. Check your email.", "green")
+        else:
+            set_state("waiting", "Could not send the code. Try resending.", "red")
+
+    def send_code():
+        if not EMAIL_CONFIGURED:
+            set_state("locked", "Email is not set up (smtp.sender and\nsmtp.password), so no code can be sent.", "red")
+            return
+        if two_fa_sends.incr(user_id) > TWO_FA_MAX_SENDS:
+            set_state("locked", "Too many codes requested. Try again later.", "red")
+            return
+        set_state("sending", "Sending code...")
+        code = issue_2fa_code(user_id, secret)
+        run_in_background(parent, send_2fa_email, user_email, code, on_done=on_sent)
+
+    def verify_code(event=None):
+        if state["value"] in ("locked", "verified"):
+            return
+        if verify_2fa_code(user_id, secret, code_entry.get()):
+            set_state("verified", "Verified!", "green")
+            two_fa_root.destroy()
+            on_success()
+        elif two_fa_attempts.incr(user_id) >= TWO_FA_MAX_ATTEMPTS:
+            set_state("locked", "Too many wrong codes. Try again later.", "red")
+        else:
+            status_label.config(text="Invalid 2FA code.", fg="red")
+            code_entry.delete(0, tk.END)
+
+    verify_button = tk.Button(two_fa_root, text="Verify", command=verify_code)
+    verify_button.pack(pady=5)
+    resend_button = tk.Button(two_fa_root, text="Resend Code", command=send_code)
+    resend_button.pack(pady=5)
+    code_entry.bind("<Return>", verify_code)
+
+    if two_fa_attempts.get(user_id, 0) >= TWO_FA_MAX_ATTEMPTS:
+        set_state("locked", "Too many wrong codes. Try again later.", "red")
+    else:
+        send_code()
+    return two_fa_root
+
+# Simple login screen
+def login_window():
+    conn = connect_db()  # Connect to the database
+    create_users(conn)   # Ensure users table exists
+
+    # A login saved with "Keep me signed in" by this OS user, if it has not expired
+    remembered = saved_session_user(conn)
+
+    login_root = tk.Tk()
+    login_root.title("FoodConnect")
+    login_root.geometry('700x600')
+
+    # Ensure that closing the window exits the program
+    def on_close():
+        sys.exit()  # Exit the entire application if login window is closed
+
+    def on_register(): 
+        login_root.iconify()
+        sign_up()
+
+    login_root.protocol("WM_DELETE_WINDOW", on_close)  # Handle window close event
+
+    # Show application logo
+    image = Image.open('FC_LOGO.png')
+    image = ImageTk.PhotoImage(image)
+
+    image_label = tk.Label(login_root, image=image)
+    image_label.pack()
+
+    # Labels and entries for both login and sign-up
+    tk.Label(login_root, text="Username:").pack(pady=5)
+    username_entry = tk.Entry(login_root)
+    username_entry.pack(pady=5)
+
+    tk.Label(login_root, text="Password:").pack(pady=5)
+    password_entry = tk.Entry(login_root, show='*')
+    password_entry.pack(pady=5)
+
+    # Saving the login is opt-in: anyone else who starts the app as this OS user gets it too
+    keep_signed_in = tk.BooleanVar(login_root, value=remembered is not None)
+    tk.Checkbutton(login_root, text="Keep me signed in on this computer", variable=keep_signed_in).pack(pady=5)
+
+    # A status label to display login or sign-up messages
+    status_label = tk.Label(login_root, text="")
+    status_label.pack(pady=5)
+    if TWO_FA_ENABLED and not EMAIL_CONFIGURED:
+        status_label.config(text="Email is not set up (smtp.sender and smtp.password), so logins skip 2FA.", fg="gray")
+
+    @timed("smtp.send_feedback_email")
+    def send_feedback_email(user_email):
+        if not EMAIL_CONFIGURED:
+            return
+
+        # Prepare the email
+        subject = "How's your experience with FoodConnect?"
+        body = """
+        Hello,
+        We noticed that you've just signed into FoodConnect for the first time. 
+        We would love to know how your experience has been so far and if there's anything we can improve.
+        Please reply to this email.
+
+        Thanks for using FoodConnect!
+        
+        Best regards,
+        FoodConnect Team """
+
+        msg = MIMEMultipart()
+        msg["From"] = SMTP_SENDER
+        msg["To"] = user_email
+        msg["Subject"] = subject
+
+        msg.attach(MIMEText(body, "plain"))
+
+        try:
+            with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_S) as server:
+                server.starttls()  
+                server.login(SMTP_SENDER, SMTP_PASSWORD)
+                text = msg.as_string()
+                server.sendmail(SMTP_SENDER, user_email, text)
+        except Exception:
+            return
+
+    # Function to handle login
+    def login():
+        username = username_entry.get()
+        password = password_entry.get()
+
+        # Refuse before hashing, so guessing cannot tie up the app either
+        if login_attempts.get(username, 0) >= LOGIN_MAX_ATTEMPTS:
+            status_label.config(text="Too many failed logins. Try again later.", fg="red")
+            return
+
+        row = authenticate(conn, username, password)
+
+        if row is not None:
+            login_attempts.pop(username)
+            user_id, user_email = row[1], row[2]
+            secret = get_totp_secret(conn, user_id)
+
+            if row[3]:  # Check if first_login is True (1)
+                run_in_background(login_root, send_feedback_email, user_email)  # Send feedback email
+                run_write_async(login_root, lambda write_conn: write_conn.execute(
+                    "UPDATE users SET first_login = 0 WHERE user_id = ?", (user_id,)))
+
+            # Only count the user as logged in once 2FA succeeds; closing the login
+            # window returns control to the caller, which launches the main app
+            def on_verified():
+                # Queued behind the first_login update; the window closes once the session is saved
+                try:
+                    forget_saved_session(login_root)
+                except OSError as e:
+                    get_metrics_logger().warning("could not forget the saved session: %s", e)
+                if keep_signed_in.get():
+                    run_write_async(login_root, create_session, user_id, on_done=logged_in)
+                else:
+                    logged_in(None, None)
+
+            def logged_in(token, error):
+                global logged_in_user_id
+                logged_in_user_id = user_id  # Store the logged-in user's ID
+                try:
+                    if error is not None:
+                        raise error
+                    if token:
+                        save_session_token(token)
+                except Exception as e:
+                    get_metrics_logger().warning("could not save the session: %s", e)
+                login_root.destroy()
+
+            if not TWO_FA_REQUIRED:
+                on_verified()
+                return
+
+            status_label.config(text="Password accepted. Waiting for 2FA...", fg="green")
+            # One 2FA window at a time: Login stays disabled until this one closes
+            login_button.config(state=tk.DISABLED)
+            window = two_factor_window(login_root, user_id, user_email, secret, on_verified)
+
+            def on_closed(event):
+                if event.widget is window and login_button.winfo_exists():
+                    login_button.config(state=tk.NORMAL)
+
+            window.bind("<Destroy>", on_closed, add="+")
+        else:
+            login_attempts.incr(username)
+            status_label.config(text="Invalid username or password", fg="red")
+
+
+    # Function to handle sign-up
+    def sign_up():
+
+        def on_close_register():
+            result = messagebox.askquestion('Exit',"Are you sure you wish to cancel?")
+            if result == 'yes':
+                registration.destroy()
+                login_root.deiconify()
+
+        def on_submit():
+            email_pattern = r'^[a-z0-9]+[\._]?[a-z0-9]+[@]\w+[.]\w+$'
+            email = email_entry.get()
+            username = username_entry.get()
+            password = password_entry.get()
             confirm_password = confirm_password_entry.get()
             
             # Validate user input
@@ -376,405 +2865,2528 @@ def login_window():
                 conn = connect_db()
                 cur = conn.cursor()
 
-                # Check if the username already exists
-                cur.execute("SELECT * FROM users WHERE username = ?", (username,))
-                if cur.fetchone():
-                    messagebox.showerror("Username!", "Username already exists!")
-                else:
-                    # Hash the password before storing it
-                    hashed_password = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-
-                    # Insert the new user into the database
-                    cur.execute(
-                        "INSERT INTO users (email, username, password_hash, first_login) VALUES (?, ?, ?, 1)",
-                        (email, username, hashed_password)
-                    )
-                    conn.commit()
-
-                    messagebox.showinfo("Success!", "Account created successfully!")
-                    registration.destroy()
-                    login_root.deiconify()
-                
-        
-        # Create the registration window
-        registration = tk.Tk()
-        registration.title("FoodConnect")
-        registration.geometry("300x400")
-        registration.protocol("WM_DELETE_WINDOW", on_close_register)
+                # Check if the username already exists
+                cur.execute("SELECT * FROM users WHERE username = ?", (username,))
+                if cur.fetchone():
+                    messagebox.showerror("Username!", "Username already exists!")
+                else:
+                    # Hash the password before storing it
+                    with span("bcrypt.hashpw"):
+                        hashed_password = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+
+                    def registered(result, error):
+                        if error is not None:
+                            if isinstance(error, sqlite3.IntegrityError):
+                                messagebox.showerror("Username!", "Username already exists!")
+                            else:
+                                messagebox.showerror("Error", f"Could not create the account: {error}")
+                            submit_button.config(state=tk.NORMAL)
+                            return
+                        user_cache.pop(username)
+
+                        messagebox.showinfo("Success!", "Account created successfully!")
+                        registration.destroy()
+                        login_root.deiconify()
+
+                    # Insert the new user into the database without waiting on the writer (the unique 
+                    # index catches a registration for the same username from another window or process)
+                    submit_button.config(state=tk.DISABLED)
+                    run_write_async(login_root, lambda write_conn: write_conn.execute(
+                        "INSERT INTO users (email, username, password_hash, first_login, totp_secret) VALUES (?, ?, ?, 1, ?)",
+                        (email, username, hashed_password, pyotp.random_base32())
+                    ), on_done=registered)
+                
+        
+        # Create the registration window
+        registration = tk.Tk()
+        registration.title("FoodConnect")
+        registration.geometry("300x400")
+        registration.protocol("WM_DELETE_WINDOW", on_close_register)
+
+        # Label and entry for Email
+        email_label = tk.Label(registration, text="Email:")
+        email_label.pack(pady=5)
+
+        email_entry = tk.Entry(registration)
+        email_entry.pack(pady=5)
+
+        # Label and entry for username
+        username_label = tk.Label(registration, text="Username:")
+        username_label.pack(pady=5)
+
+        username_entry = tk.Entry(registration)
+        username_entry.pack(pady=5)
+
+        # Label and entry for password
+        password_label = tk.Label(registration, text="Password:")
+        password_label.pack(pady=5)
+
+        password_entry = tk.Entry(registration, show='*')
+        password_entry.pack(pady=5)
+
+        confirm_password_label = tk.Label(registration, text="Confirm Password:")
+        confirm_password_label.pack(pady=5)
+
+        confirm_password_entry = tk.Entry(registration, show='*')
+        confirm_password_entry.pack(pady=5)
+
+        # Submit button
+        submit_button = tk.Button(registration, text="Submit", command=on_submit)
+        submit_button.pack(pady=20)
+
+        # Cancel Button
+        cancel_button = tk.Button(registration, text="Cancel", command=on_close_register)
+        cancel_button.pack(pady=5)
+
+    # Continue the saved login, skipping password and 2FA, or drop it to sign in as someone else
+    def continue_saved():
+        global logged_in_user_id
+        if saved_session_user(conn) != remembered:
+            status_label.config(text="The saved login has expired. Please log in.", fg="red")
+            continue_frame.destroy()
+            return
+        logged_in_user_id = remembered[0]
+        login_root.destroy()
+
+    def not_me():
+        forget_saved_session(login_root)
+        keep_signed_in.set(False)
+        username_entry.delete(0, tk.END)
+        continue_frame.destroy()
+
+    # Buttons for login and sign-up
+    login_button = tk.Button(login_root, text="Login", command=login)
+    login_button.pack(side=tk.TOP, padx=20, pady=10)
+    tk.Button(login_root, text="Register", command=on_register).pack(side=tk.TOP, padx=20, pady=10)
+
+    if remembered is not None:
+        username_entry.insert(0, remembered[1])
+        continue_frame = tk.Frame(login_root)
+        continue_frame.pack(side=tk.TOP, pady=10)
+        tk.Button(continue_frame, text=f"Continue as {remembered[1]}", command=continue_saved).pack(side=tk.LEFT, padx=5)
+        tk.Button(continue_frame, text="Not you?", command=not_me).pack(side=tk.LEFT, padx=5)
+
+    login_root.mainloop()
+
+# Main Window
+def main_window(conn):
+    """
+    Initializes and configures the main window for the Tkinter application.
+
+    This function creates the root window with a title "FoodConnect" and 
+    sets the dimensions of the window to 600x800 pixels.
+
+    Returns:
+        Tk: The root Tkinter window object that serves as the main application window.
+    """
+    global root
+    root = tk.Tk()
+    root.title("FoodConnect")
+    root.geometry('900x800')
+    root.config(bg=LIGHT_BG)
+
+    light = Image.open(os.path.join(CURRENT_DIR, "light.png"))
+    dark = Image.open(os.path.join(CURRENT_DIR, "dark.png"))
+    bell = Image.open(os.path.join(CURRENT_DIR, "bell.png"))
+    root.light_image = ImageTk.PhotoImage(light, master=root)
+    root.dark_image = ImageTk.PhotoImage(dark, master=root)
+    root.notify_image = ImageTk.PhotoImage(bell, master=root)
+
+    switch_value = True
+
+    # Frames must be created before the toggle function
+    frame = tk.Frame(root, bg=FRAME_LIGHT_COLOR)
+    frame.pack(side=tk.TOP, pady=20)
+    
+    panel = tk.Frame(root, bg=FRAME_LIGHT_COLOR)
+    panel.pack(side=tk.TOP, pady=20)
+
+    def apply_theme(widget, bg_color, fg_color):
+        widget.config(bg=bg_color)
+        if isinstance(widget, (tk.Label, tk.Button, tk.Entry, tk.Text, tk.Checkbutton, tk.Radiobutton)):
+            widget.config(fg=fg_color)
+            if isinstance(widget, (tk.Checkbutton, tk.Radiobutton)):
+                widget.config(selectcolor=bg_color, activeforeground=fg_color)
+        elif isinstance(widget, tk.Listbox):
+            widget.config(bg=bg_color, fg=fg_color)
+
+        for child in widget.winfo_children():
+            apply_theme(child, bg_color, fg_color)
+
+    def toggle():
+        nonlocal switch_value
+
+        # Dark theme
+        if switch_value:
+            switch.config(image=root.dark_image, bg=DARK_BG, activebackground=DARK_BG)
+            root.config(bg=DARK_BG)
+            apply_theme(panel, FRAME_DARK_COLOR, TEXT_DARK_COLOR)
+            apply_theme(frame, FRAME_DARK_COLOR, TEXT_DARK_COLOR)
+            switch_value = False
+
+        # Light theme
+        else:
+            switch.config(image=root.light_image, bg=LIGHT_BG, activebackground=LIGHT_BG)
+            root.config(bg=LIGHT_BG)
+            apply_theme(panel, FRAME_LIGHT_COLOR, TEXT_LIGHT_COLOR)
+            apply_theme(frame, FRAME_LIGHT_COLOR, TEXT_LIGHT_COLOR)
+            switch_value = True
+
+    # Low Stock Check Button
+    stock_button = tk.Button(
+        root, 
+        image=root.notify_image, 
+        bd=0, 
+        bg=LIGHT_BG, 
+        activebackground=LIGHT_BG, 
+        command=profiled("check_stock", lambda: (check_stock(conn)))
+    )
+    stock_button.place(relx=0.85, rely=0.95, anchor='se')
+    root.stock_button = stock_button  # The notification engine shows unseen alerts on the bell
+
+    # Switch Button (for light/dark mode)
+    switch = tk.Button(
+        root, 
+        image=root.light_image, 
+        bd=0, 
+        bg=LIGHT_BG, 
+        activebackground=LIGHT_BG, 
+        command=toggle 
+    )
+    switch.place(relx=0.92, rely=0.95, anchor='se')
+
+    # Tools menu
+    menubar = tk.Menu(root)
+    tools_menu = tk.Menu(menubar, tearoff=0)
+    tools_menu.add_command(label="Import Recipes...", command=lambda: import_recipes_dialog(root))
+    tools_menu.add_command(label="Import Product Catalog...", command=lambda: import_catalog_dialog(root))
+    tools_menu.add_separator()
+    tools_menu.add_command(label="Back Up Database", command=lambda: backup_dialog(root))
+    tools_menu.add_command(label="Restore Database...", command=lambda: restore_dialog(root))
+    tools_menu.add_command(label="Compact Database...", command=lambda: compact_dialog(root))
+    tools_menu.add_separator()
+    tools_menu.add_command(label="Diagnostics", command=lambda: diagnostics_window(root))
+    tools_menu.add_separator()
+    tools_menu.add_command(label="Log Out", command=lambda: logout(root))
+    menubar.add_cascade(label="Tools", menu=tools_menu)
+    root.config(menu=menubar)
+
+    # Pass switch_value to create_buttons
+    buttons = create_buttons(frame, panel, switch_value)
+
+    # Keep handles on the main widgets so tooling (e.g. benchmarks/bench_gui.py) can drive the UI
+    root.buttons = buttons
+    root.panel = panel
+    root.switch = switch
+    root.stock_button = stock_button
+
+    return root
+
+# Button Clicked
+def on_button_click(clicked_index, buttons, panel):
+    """
+    Handles the event when a button is clicked in the GUI.
+
+    This function iterates over a list of buttons and adjusts the size of the clicked button. 
+    It ensures that the button corresponding to the `clicked_index` is highlighted (or resized) 
+    while maintaining a consistent size for all other buttons. Once the button is clicked, it 
+    calls the `create_panel` function to update the content of the specified panel based on 
+    the index of the clicked button.
+
+    Args:
+        clicked_index (int): The index of the button that was clicked.
+        buttons (list): A list of Tkinter button objects.
+        panel (Tkinter Frame): The frame or panel where the content is displayed after a button click.
+
+    Returns:
+        None
+    """
+    # Iterating over all buttons, find the one that is clicked, adjust size
+    for index, button in enumerate(buttons):
+        if index == clicked_index:
+            button.config(height=HEIGHT, width=WIDTH)
+        else:
+            button.config(height=HEIGHT, width=WIDTH)
+
+    create_panel(clicked_index, panel)  # Call create_panel with the clicked index
+
+# Create the Buttons
+def create_buttons(frame, panel, switch_value): 
+    """
+    Creates a set of buttons within a specified frame and assigns click functionality.
+
+    This function generates a series of buttons based on predefined text labels (from `BUTTON_TEXTS`), 
+    places them in the specified frame, and binds each button to trigger the `on_button_click` 
+    function when clicked. The buttons are arranged in a single row within the frame. By default, 
+    the first button is given a preset size.
+
+    Args:
+        frame (Tkinter Frame): The frame where the buttons will be placed.
+        panel (Tkinter Frame): The panel that will be updated based on button clicks.
+
+    Returns:
+        list: A list of Tkinter button objects created within the frame.
+    """
+    buttons = []
+    for i, text in enumerate(BUTTON_TEXTS):
+        # Set the button color based on the current theme
+        button_color = "lightgreen" if switch_value else "darkgreen" 
+        btn = tk.Button(frame, bg=button_color, text=text, height=HEIGHT, width=WIDTH,
+                        command=profiled(f"button.{text}", lambda i=i: on_button_click(i, buttons, panel)))
+        btn.grid(row=1, column=i, sticky="s")
+        buttons.append(btn)
+
+    # Set the default button
+    buttons[0].config(height=HEIGHT, width=WIDTH)  
+    return buttons
+
+# Button Panel
+def create_panel(index, panel):
+    """
+    Updates the content of the given panel based on the selected button index.
+
+    This function clears the existing content of the panel by destroying all its widgets. 
+    It then dynamically updates the panel's content based on the `index` of the selected button. 
+    Depending on the index, it calls one of the following functions:
+    - `add_prod(panel)`: Adds a new product (index 0).
+    - `update_prod(panel)`: Updates an existing product (index 1).
+    - `delete_prod(panel)`: Deletes an existing product (index 2).
+    - `search_prod(panel)`: Searches for a product (index 3).
+    - `shopping_list(panel)`: Shows the shopping list (index 4).
+    - `recipe_finder(panel)`: Suggests recipes for the current inventory (index 5).
+    - `dashboard(panel)`: Shows the inventory dashboard (for any other index).
+
+    Args:
+        index (int): The index of the clicked button, determining the panel content.
+        panel (Tkinter Frame): The panel where the dynamic content is displayed.
+
+    Returns:
+        None
+    """
+    for widget in panel.winfo_children():
+        widget.destroy()
+    if index == 0:      # Add new product
+        add_prod(panel)
+    elif index == 1:    # Update existing product
+        update_prod(panel)
+    elif index == 2:    # Delete existing product
+        delete_prod(panel)
+    elif index == 3:    # Search for product
+        search_prod(panel)
+    elif index == 4:    # Shopping list
+        shopping_list(panel)
+    elif index == 5:    # Recipes
+        recipe_finder(panel)
+    else:               # Dashboard
+        dashboard(panel)
+
+# Check for Special Characters
+def check_special_chars(entry):
+    """
+    Validates the content of a Tkinter entry widget for special characters.
+
+    This function retrieves the current content of the provided `entry` widget and uses a 
+    regular expression to check for the presence of special characters (anything that is 
+    not alphanumeric or a space). If any special characters are found, the background color 
+    of the entry widget is changed to light coral to indicate invalid input. If no special 
+    characters are found, the background is reset to white.
+
+    Args:
+        entry (Tkinter Entry): The entry widget whose content is being validated.
+
+    Returns:
+        None
+    """
+    content = entry.get()
+    # Check if there are any special characters in the content using regex
+    if re.search(r'[^a-zA-Z0-9 ]', content):  # Matches anything not alphanumeric or space
+        entry.config(bg="lightcoral")
+    else:
+        entry.config(bg="white")
+
+# Formating for date MM/DD/YY
+def format_date(entry_widget, event=None):
+    """
+    Formats the content of a Tkinter entry widget for date.
+
+    This function retrieves the current content of the provided `entry` widget and uses a 
+    regular expression to check for the presence of non digit characters and incorrect formatting 
+    of the date. If any special characters, letters or incorrect format are found, the background 
+    color of the entry widget is changed to light coral to indicate invalid input. If no special 
+    characters are found, the background is reset to white. Once the `entry` has been made the 
+    formatting will be updated to match: MM/DD/YY
+
+    Args:
+        entry (Tkinter Entry): The entry widget whose content is being validated and formatted.
+
+    Returns:
+        None
+    """
+    content = entry_widget.get()
+    clean_content = content.replace("-", "").replace("/", "")
+
+    if len(clean_content) == 6 and clean_content.isdigit():
+        formatted_date = clean_content[:2] + "/" + clean_content[2:4] + "/" + clean_content[4:]
+        entry_widget.delete(0, tk.END)
+        entry_widget.insert(0, formatted_date)
+        entry_widget.config(bg="white")
+    elif content:
+        entry_widget.config(bg="lightcoral")
+
+# Check Quantity is larger than 0 and an integer
+def validate_qty(qty):
+    """
+    Validates a quantity value.
+
+    This function checks whether the provided `qty` is a string representing a digit and 
+    ensures it is greater than 0.
+
+    Args:
+        entry (Tkinter Entry): The quantity value to be validated.
+
+    Returns:
+        bool: True if the quantity is a positive integer, False otherwise.
+    """
+    return qty.isdigit() and int(qty) > 0
+
+# Convert a products row into the dictionary format used by the GUI
+def product_record(row):
+    return {
+        "Id": row[14],
+        "Name": row[0],
+        "Quantity": row[1],
+        "Group": row[2],
+        "Exp": row[3],
+        "Add": row[4],
+        "User": row[5],
+        "Info": {
+            "Vegetarian": row[6],
+            "Vegan": row[7],
+            "Gluten": row[8],
+            "Lactose": row[9],
+            "Eggs": row[10],
+            "Nuts": row[11],
+            "Halal": row[12],
+            "Kosher": row[13]
+        }
+    }
+
+# Load Products
+def load_prod(conn, user_id=None):
+    """
+    Loads the list of products from the database for the logged-in user.
+
+    Args:
+        conn (sqlite3.Connection): SQLite connection object.
+        user_id (int, optional): Load this user's products instead of the logged-in user's.
+
+    Returns:
+        list: A list of products from the database.
+    """
+    user_id = logged_in_user_id if user_id is None else user_id
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM products WHERE user_id = ? ORDER BY id", (user_id,))
+    rows = cur.fetchall()
+
+    # Format the results into a list of dictionaries for easier usage in the GUI
+    return [product_record(row) for row in rows]
+
+# Counter that changes whenever a user's products are written, by any connection
+def data_version(conn, user_id):
+    """
+    Reads a user's products change counter, kept up to date by triggers (see 
+    `create_data_version()` and POSTGRES_SCHEMA).
+
+    SQLite's own `PRAGMA data_version` is not used: it ignores this connection's commits and 
+    moves once per read that notices a change, however many commits happened since, so it 
+    cannot tell our own write from our write plus someone else's. It also moves for every 
+    table and every user. This counter only moves when the user's products are written: once 
+    per row on SQLite, once per transaction on PostgreSQL. A product moved to another user 
+    moves both counters.
+
+    Args:
+        conn (sqlite3.Connection): Database connection object.
+        user_id (int): The user whose counter is read.
+
+    Returns:
+        int: The current value, 0 if the user's products were never written.
+    """
+    row = conn.execute("SELECT version FROM data_versions WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] if row else 0
+
+# Run a write job, reading the user's change counter just before and just after it
+def versioned_write(conn, user_id, func, *args):
+    before = data_version(conn, user_id)
+    result = func(conn, *args)
+    return before, result, data_version(conn, user_id)
+
+# In-memory copy of one user's products
+class InventoryCache:
+    """
+    Keeps one user's products in memory, indexed by product id and by (name, expiration).
+
+    The cache is filled lazily on first use and kept current by routing this user's 
+    add/update/delete through it (write-through on the cache's own connection). Writes made by 
+    other connections or processes move the user's change counter (`data_version()`) and trigger 
+    a reload. When nothing changed, or only other users' products did, reading the inventory 
+    never touches the products table.
+
+    Writes wait for their commit and return the job's result. GUI callers pass a `widget` instead: 
+    the write is only queued, the writer's Future is returned at once, and `on_done(result, error)` 
+    runs on the Tk event loop after the commit, once the cache has been updated (see `when_done()`).
+    """
+    def __init__(self, user_id, conn=None):
+        self.user_id = user_id
+        self.writer = get_writer() if conn is None else None  # Caches on a caller's connection write to it directly
+        self.conn = conn or connect_db()
+        self.by_id = {}
+        self.by_key = {}
+        self.data_version = None
+        self.generation = 0  # Bumped on every change so views built from the cache know when to rebuild
+
+    # Reload if this is the first use or the products were written since the last check
+    def refresh(self):
+        version = data_version(self.conn, self.user_id)
+        if version != self.data_version:
+            self.data_version = version
+            self.by_id.clear()
+            self.by_key.clear()
+            for record in load_prod(self.conn, self.user_id):
+                self._store(record)
+            self.generation += 1
+
+    def _store(self, record):
+        self.by_id[record["Id"]] = record
+        self.by_key[(record["Name"], record["Exp"])] = record["Id"]
+
+    def _forget(self, product_id):
+        record = self.by_id.pop(product_id, None)
+        if record and self.by_key.get((record["Name"], record["Exp"])) == product_id:
+            del self.by_key[(record["Name"], record["Exp"])]
+        return record
+
+    # All of the user's products, in insertion order
+    def products(self):
+        self.refresh()
+        return list(self.by_id.values())
+
+    # Look up a product by id
+    def get(self, product_id):
+        self.refresh()
+        return self.by_id.get(product_id)
+
+    # Look up a product by name and expiration date
+    def find(self, name, expiration):
+        self.refresh()
+        product_id = self.by_key.get((name, expiration))
+        return self.by_id.get(product_id) if product_id is not None else None
+
+    # Run a write job on the writer thread (or directly on our own connection), then `apply` it to the cache
+    def _write(self, func, *args, apply, widget=None, on_done=None):
+        # `before` equal to our counter means nothing was written since the last refresh, so with 
+        # this job applied the cache matches the database at `after` and needs no reload. Writes 
+        # by anyone else, before or after the job, leave the counter elsewhere and the next 
+        # refresh reloads. On the writer both reads happen inside its transaction. On a caller's 
+        # own connection the job commits itself, so a commit by another process between that 
+        # commit and the second read would go unnoticed; the app's caches always use the writer.
+        if self.writer is None:
+            future = concurrent.futures.Future()
+            try:
+                with self.conn:
+                    future.set_result(versioned_write(self.conn, self.user_id, func, *args))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future = self.writer.submit(versioned_write, self.user_id, func, *args)
+
+        def finish(outcome):
+            before, result, after = outcome
+            if before == self.data_version:
+                self.data_version = after
+            apply()
+            self.generation += 1
+            return result
+
+        if widget is None:
+            return finish(future.result())
+
+        # Applied on the GUI thread once committed. A refresh in the meantime may already have 
+        # reloaded the change; applying it again is harmless
+        def done(outcome, error):
+            result = finish(outcome) if error is None else None
+            if on_done:
+                on_done(result, error)
+
+        return when_done(widget, future, done)
+
+    # Insert a product and add it to the cache
+    def add(self, product, widget=None, on_done=None):
+        self.refresh()
+        product.user = self.user_id
+        return self._write(lambda conn: product.add_product(conn),
+                           apply=lambda: self._store(product_record(product_row(product))), widget=widget, on_done=on_done)
+
+    # Save changes to an existing product (product.id must be set)
+    def update(self, product, widget=None, on_done=None):
+        self.refresh()
+        product.user = self.user_id
+
+        def apply():
+            self._forget(product.id)
+            self._store(product_record(product_row(product)))
+
+        return self._write(lambda conn: product.update_product(conn), apply=apply, widget=widget, on_done=on_done)
+
+    # Save changes to many products in one transaction (each product.id must be set)
+    def update_many(self, products, widget=None, on_done=None):
+        self.refresh()
+        for product in products:
+            product.user = self.user_id
+
+        def apply():
+            for product in products:
+                # Replace in place so the products keep their list order
+                old = self.by_id.get(product.id)
+                if old and self.by_key.get((old["Name"], old["Exp"])) == product.id:
+                    del self.by_key[(old["Name"], old["Exp"])]
+                self._store(product_record(product_row(product)))
+
+        return self._write(Product.update_many, products, apply=apply, widget=widget, on_done=on_done)
+
+    # Delete a product by id
+    def delete(self, product_id, widget=None, on_done=None):
+        self.refresh()
+        return self._write(Product.delete_by_id, product_id, apply=lambda: self._forget(product_id),
+                           widget=widget, on_done=on_done)
+
+    # Delete many products by id in one transaction
+    def delete_many(self, product_ids, widget=None, on_done=None):
+        self.refresh()
+
+        def apply():
+            for product_id in product_ids:
+                self._forget(product_id)
+
+        return self._write(Product.delete_many, product_ids, apply=apply, widget=widget, on_done=on_done)
+
+# Build the row tuple a Product would have in the products table
+def product_row(product):
+    info = product.info
+    return (product.name, product.quantity, product.group, product.expiration, product.add, product.user,
+            info["Vegetarian"], info["Vegan"], info["Gluten"], info["Lactose"],
+            info["Eggs"], info["Nuts"], info["Halal"], info["Kosher"], product.id)
+
+# One cache per user for the lifetime of the app
+inventory_caches = {}
+
+# Get the inventory cache for a user (the logged-in user by default)
+def get_inventory(user_id=None):
+    user_id = logged_in_user_id if user_id is None else user_id
+    if user_id not in inventory_caches:
+        inventory_caches[user_id] = InventoryCache(user_id)
+    return inventory_caches[user_id]
+
+# One page of a user's products in grid order
+def product_page(conn, user_id, sort="name", descending=False, after=None, limit=GRID_PAGE_SIZE,
+                 name_filter="", include_archive=False):
+    """
+    Reads the next page of products for the product grid, sorted in SQL.
+
+    Paging is keyset based: `after` is the (sort value, id) of the last row already shown and 
+    the query continues from there, so every page is an index range scan on one of the 
+    GRID_INDEXES no matter how deep the user has scrolled. Ties on the sort value are broken 
+    by id, which keeps the order stable between pages.
+
+    Args:
+        conn (sqlite3.Connection): Database connection object.
+        user_id (int): The user whose products are listed.
+        sort (str): Key of GRID_SORT_KEYS to sort by.
+        descending (bool): Sort from largest to smallest.
+        after (tuple, optional): (sort value, id) of the last row of the previous page.
+        limit (int): Rows per page.
+        name_filter (str): Only products whose name contains this text.
+        include_archive (bool): Also list archived products (not index assisted).
+
+    Returns:
+        list: Rows in `SELECT *` order (id at index 14), followed by an archived flag (1/0) 
+        and the sort value.
+    """
+    key = GRID_SORT_KEYS[sort]
+    source, archived = "products", "0"
+    if include_archive:
+        if not is_postgres(conn):
+            attach_archive(conn)
+        source = f'''(SELECT {PRODUCT_COLUMNS}, id, 0 AS archived FROM products
+                     UNION ALL
+                     SELECT {PRODUCT_COLUMNS}, id, 1 AS archived FROM {archive_table(conn)})'''
+        archived = "archived"
+
+    where, params = ["user_id = ?"], [user_id]
+    if name_filter:
+        where.append("name LIKE ?")
+        params.append(f"%{name_filter}%")
+    if after is not None:
+        last_key, last_id = after
+        op = "<" if descending else ">"
+        if last_key is None:
+            # NULLs sort first: ascending continues with the remaining NULLs and then everything else
+            where.append(f"(({key} IS NULL AND id {op} ?) OR {key} IS NOT NULL)" if not descending
+                         else f"({key} IS NULL AND id {op} ?)")
+            params.append(last_id)
+        else:
+            # Written as a range on the sort key (plus a tie-break) so SQLite can seek in the index
+            where.append(f"{key} {op}= ? AND ({key} {op} ? OR id {op} ?)")
+            params += [last_key, last_key, last_id]
+
+    order = " DESC" if descending else ""
+    cur = conn.cursor()
+    cur.execute(f'''SELECT {PRODUCT_COLUMNS}, id, {archived}, {key} FROM {source}
+                    WHERE {" AND ".join(where)}
+                    ORDER BY {key}{order}, id{order}
+                    LIMIT ?''', (*params, limit))
+    return cur.fetchall()
+
+# Index everything queued, a chunk per writer job so other writes are not held up for long
+def catch_up_product_trigrams():
+    while run_write(sync_product_trigrams, FUZZY_SYNC_CHUNK):
+        pass
+
+# A user's products ranked by how closely their names match a search term
+@timed("fuzzy_search")
+def fuzzy_search(conn, term, user_id=None, threshold=FUZZY_THRESHOLD, limit=FUZZY_RESULTS):
+    """
+    Finds products whose names are similar to `term`, even when misspelled ("Mlk" finds "Milk").
+
+    Similarity is the share of trigrams two names have in common (`trigram_similarity()`). Only 
+    the index entries for the term's own trigrams are read, and products sharing too few of them 
+    to reach `threshold` are dropped in SQL, so the cost depends on how common the term's 
+    trigrams are rather than on the number of products. Only what is already indexed is 
+    searched; queued changes are left to `sync_product_trigrams()` (see `fuzzy_search_job()`).
+
+    PostgreSQL has no trigram index here, so all of the user's product names are read and 
+    ranked the same way in Python.
+
+    Args:
+        conn (sqlite3.Connection): Database connection.
+        term (str): What the user typed.
+        user_id (int, optional): Whose products to search. Defaults to the logged-in user.
+        threshold (float): Least similarity (0-1) for a product to be returned.
+        limit (int): Most products to return.
+
+    Returns:
+        list: Rows in `SELECT *` order (id at index 14), followed by an archived flag (always 0) 
+        and the similarity, most similar first.
+    """
+    user_id = logged_in_user_id if user_id is None else user_id
+    grams = name_trigrams(term)
+    if not grams:
+        return []
+
+    if is_postgres(conn):
+        rows = conn.execute(f"SELECT {PRODUCT_COLUMNS}, id FROM products WHERE user_id = ?", (user_id,)).fetchall()
+        scored = [(*row, 0, trigram_similarity(grams, name_trigrams(row[0]))) for row in rows]
+        return heapq.nlargest(limit, [row for row in scored if row[-1] >= threshold], key=lambda row: row[-1])
+
+    # A product sharing s of the term's n trigrams has similarity at most s / n
+    grams = sorted(grams)
+    shared = conn.execute(f'''SELECT product_id, COUNT(*), MAX(trigram_count) FROM product_trigrams
+                             WHERE user_id = ? AND trigram IN ({", ".join("?" * len(grams))})
+                             GROUP BY product_id HAVING COUNT(*) >= ?''',
+                          (user_id, *grams, max(1, math.ceil(threshold * len(grams))))).fetchall()
+    scored = [(product_id, count / (len(grams) + total - count)) for product_id, count, total in shared]
+    best = heapq.nlargest(limit, [item for item in scored if item[1] >= threshold], key=lambda item: item[1])
+    if not best:
+        return []
+
+    rows = {row[14]: row for row in conn.execute(
+        f"SELECT {PRODUCT_COLUMNS}, id FROM products WHERE id IN ({', '.join('?' * len(best))})", [id_ for id_, _ in best])}
+    return [(*rows[product_id], 0, similarity) for product_id, similarity in best if product_id in rows]
+
+# Fuzzy search for a worker thread: index the latest product changes (one bounded writer job), then search
+def fuzzy_search_job(term, user_id):
+    conn = connect_db()
+    try:
+        if not is_postgres(conn):
+            run_write(sync_product_trigrams, FUZZY_SYNC_CHUNK)
+        return fuzzy_search(conn, term, user_id)
+    finally:
+        conn.close()
+
+# Groups of a user's products whose names are so similar they are probably the same item
+@timed("duplicate_suggestions")
+def duplicate_suggestions(conn, user_id=None, threshold=FUZZY_DUPLICATE_THRESHOLD):
+    """
+    Suggests products that look like duplicates ("Milk", "milk", "Milk 2%").
+
+    Names that are equal once case and punctuation are ignored are grouped outright. The 
+    distinct names are then clustered around leaders: the most common names are visited first, 
+    and each joins the most similar leader within `threshold`, or becomes a leader itself. Every 
+    member is therefore similar to its group's leader, rather than groups chaining through 
+    intermediate names into one large group. Leaders are found with a prefix filter rather 
+    than by comparing all pairs: with trigrams ordered rarest first, two names can only reach 
+    `threshold` if they share one of the first `n - ceil(threshold * n) + 1` trigrams of each.
+
+    Args:
+        conn (sqlite3.Connection): Database connection.
+        user_id (int, optional): Whose products to check. Defaults to the logged-in user.
+        threshold (float): Least similarity (0-1) between a product and its group's leader.
+
+    Returns:
+        list: Groups (largest first), each a list of product rows in `SELECT *` order, 
+        followed by an archived flag (always 0), with the leader's products first.
+    """
+    user_id = logged_in_user_id if user_id is None else user_id
+    rows = {row[14]: row for row in conn.execute(f"SELECT {PRODUCT_COLUMNS}, id FROM products WHERE user_id = ?", (user_id,))}
+
+    # Products with the same normalised name are one entry from here on
+    same_name = collections.defaultdict(list)
+    for product_id in sorted(rows):
+        same_name[" ".join(re.findall(r"[a-z0-9]+", (rows[product_id][0] or "").lower()))].append(product_id)
+    grams = {name: name_trigrams(name) for name in same_name if name}
+    frequency = collections.Counter(gram for name_grams in grams.values() for gram in name_grams)
+
+    groups = {}
+    leader_index = collections.defaultdict(list)
+    for name in sorted(grams, key=lambda name: (-len(same_name[name]), len(name), name)):
+        ordered = sorted(grams[name], key=lambda gram: (frequency[gram], gram))
+        prefix = ordered[:len(ordered) - math.ceil(threshold * len(ordered)) + 1]
+        candidates = {leader for gram in prefix for leader in leader_index[gram]}
+        scored = [(trigram_similarity(grams[name], grams[leader]), leader) for leader in candidates
+                  if threshold * len(grams[leader]) <= len(ordered) and threshold * len(ordered) <= len(grams[leader])]
+        best = max(scored, default=(0, None))
+        if best[0] >= threshold:
+            groups[best[1]].append(name)
+            continue
+
+        # Leaders are indexed by their own prefix
+        groups[name] = [name]
+        for gram in prefix:
+            leader_index[gram].append(name)
+
+    result = [[(*rows[product_id], 0) for member in members for product_id in same_name[member]]
+              for members in groups.values()]
+    return sorted((group for group in result if len(group) > 1), key=len, reverse=True)
+
+# Sortable, lazily loaded product table
+class ProductGrid:
+    """
+    A `ttk.Treeview` listing one user's products in columns, with rows identified by product id.
+
+    Clicking a column header sorts by it (again to reverse) with `product_page()`, so sorting is 
+    an indexed `ORDER BY ... LIMIT` instead of a Python sort. Only the first page is loaded; 
+    further pages are fetched when the view is scrolled near the bottom. Rows handed to `show()` 
+    (fuzzy search results, duplicate groups) are kept instead: headers sort them in Python and 
+    `reload()` refreshes them from the database. Place the grid with `grid.frame.pack()`/`.grid()`.
+    """
+    COLUMNS = [("name", "Name", 160), ("qty", "Qty", 50), ("group", "Group", 90),
+               ("tags", "Dietary", 170), ("exp", "Expiration", 85), ("add", "Added", 85)]
+
+    # Python equivalents of GRID_SORT_KEYS for rows passed to show() (NULLs first, as in SQL)
+    ROW_SORT_KEYS = {
+        "name": lambda row: row[0],
+        "qty": lambda row: row[1],
+        "group": lambda row: row[2],
+        "exp": lambda row: iso_date(row[3]),
+        "add": lambda row: iso_date(row[4]),
+    }
+
+    def __init__(self, parent, conn, user_id, columns=None, height=15, selectmode="extended", page_size=GRID_PAGE_SIZE):
+        self.conn = conn
+        self.user_id = user_id
+        self.page_size = page_size
+        self.sort = "name"
+        self.descending = False
+        self.name_filter = ""
+        self.include_archive = False
+        self.last = None
+        self.exhausted = True
+        self.rows = None           # Rows passed to show(), or None while paging through product_page()
+        self.rows_sorted = False   # Whether those rows were re-sorted with a header
+
+        self.frame = tk.Frame(parent, bg=parent.cget('bg'))
+        self.tree = ttk.Treeview(self.frame, columns=[column for column, _, _ in self.COLUMNS],
+                                 displaycolumns=columns or [column for column, _, _ in self.COLUMNS],
+                                 show="headings", height=height, selectmode=selectmode)
+        for column, heading, width in self.COLUMNS:
+            sortable = column in GRID_SORT_KEYS
+            self.tree.heading(column, text=heading, command=(lambda c=column: self.sort_by(c)) if sortable else "")
+            self.tree.column(column, width=width, minwidth=40, stretch=True)
+
+        scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.tree.yview)
+
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            if float(last) > 0.9:
+                self.load_more()
+
+        self.tree.configure(yscrollcommand=on_scroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    # Start over from the first page (optionally with a new name filter / archive setting)
+    def load(self, name_filter=None, include_archive=None):
+        if name_filter is not None:
+            self.name_filter = name_filter
+        if include_archive is not None:
+            self.include_archive = include_archive
+        self.rows = None
+        self.tree.delete(*self.tree.get_children())
+        self.last = None
+        self.exhausted = False
+        self.load_more()
+        self.update_headings()
+
+    # Append the next page, if there is one
+    def load_more(self):
+        if self.exhausted:
+            return
+        rows = product_page(self.conn, self.user_id, self.sort, self.descending, self.last, self.page_size,
+                            self.name_filter, self.include_archive)
+        self.exhausted = len(rows) < self.page_size
+        if rows:
+            self.last = (rows[-1][-1], rows[-1][14])
+        self.insert_rows(rows)
+
+    # Replace the contents with the given rows (e.g. fuzzy search results) in their own order
+    def show(self, rows):
+        self.rows = list(rows)
+        self.rows_sorted = False
+        self.display_rows()
+
+    # Show self.rows as they are ordered now
+    def display_rows(self):
+        self.tree.delete(*self.tree.get_children())
+        self.exhausted = True
+        self.insert_rows(self.rows)
+        self.update_headings()
+
+    # Add rows (`SELECT *` order followed by the archived flag) to the end of the table
+    def insert_rows(self, rows):
+        for row in rows:
+            product = product_record(row)
+            tags = ", ".join(tag for tag, value in product["Info"].items() if value == 1)
+            group = product["Group"]
+            name = product["Name"] + (" (archived)" if row[15] else "")
+            self.tree.insert("", tk.END, iid=str(product["Id"]), values=(
+                name, product["Quantity"], food_groups[group - 1] if group in range(1, len(food_groups) + 1) else group,
+                tags, product["Exp"], product["Add"]))
+
+    # Sort by a column; clicking the sorted column again reverses the order
+    def sort_by(self, column):
+        unsorted = self.rows is not None and not self.rows_sorted
+        self.descending = not self.descending if column == self.sort and not unsorted else False
+        self.sort = column
+        if self.rows is None:
+            self.load()
+            return
+
+        def sort_key(row):
+            value = self.ROW_SORT_KEYS[column](row)
+            return (value is not None, value if value is not None else 0, row[14])
+
+        self.rows.sort(key=sort_key, reverse=self.descending)
+        self.rows_sorted = True
+        self.display_rows()
+
+    def update_headings(self):
+        for column, heading, _ in self.COLUMNS:
+            sorted_here = column == self.sort and (self.rows is None or self.rows_sorted)
+            arrow = (" \u25bc" if self.descending else " \u25b2") if sorted_here else ""
+            self.tree.heading(column, text=heading + arrow)
+
+    # Reload with the current sort and filter (after products changed); rows passed to show() 
+    # are read again, dropping products that no longer exist
+    def reload(self):
+        if self.rows is None:
+            self.load()
+            return
+        ids = [row[14] for row in self.rows]
+        current = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            for row in self.conn.execute(f"SELECT {PRODUCT_COLUMNS}, id FROM products WHERE id IN ({', '.join('?' * len(chunk))})",
+                                         chunk):
+                current[row[14]] = row
+        self.rows = [(*current[row[14]], *row[15:]) for row in self.rows if row[14] in current]
+        self.display_rows()
+
+    # Number of rows loaded so far
+    def loaded(self):
+        return len(self.tree.get_children())
+
+    # Ids of the selected products, in display order
+    def selected_ids(self):
+        return [int(iid) for iid in self.tree.selection()]
+
+# Return free pages to the filesystem after large deletes
+def incremental_vacuum(conn):
+    """
+    Runs `PRAGMA incremental_vacuum` if the database is set up for it.
+
+    Databases created by this version have auto_vacuum = INCREMENTAL (see `connect_db()`). Older 
+    ones (auto_vacuum = NONE) can only be switched with a full `VACUUM`, which rewrites the whole 
+    file under an exclusive lock, so that is left to the explicit maintenance action 
+    (`compact_database()`); until then, freed pages are reused by SQLite but not returned.
+
+    Args:
+        conn (sqlite3.Connection): SQLite connection object (no transaction may be open).
+
+    Returns:
+        bool: True if free pages were returned, False if the database does not use incremental vacuum.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return False
+    # Each step of the pragma frees one page and execute() only steps once; executescript() runs it to the end
+    conn.executescript("PRAGMA incremental_vacuum")
+    return True
+
+# Switch a database to incremental vacuum; returns False if it already uses it
+def enable_incremental_vacuum(conn):
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+# Tools > Compact Database / --compact: the one-time full VACUUM that enables incremental vacuum
+@timed("compact_database", kind="job")
+def compact_database():
+    """
+    Rebuilds products.db with auto_vacuum = INCREMENTAL, so later purges can shrink the file.
+
+    The rebuild is a full `VACUUM`: it rewrites the whole file and holds the write lock until it 
+    is done, so it runs only when the user asks for it. It runs as a writer thread job, so queued 
+    writes simply wait for it.
+
+    Returns:
+        bool: True if the database was rebuilt, False if it already used incremental vacuum.
+    """
+    if DB_BACKEND != "sqlite":
+        raise RuntimeError("Compacting is only available with the SQLite backend; PostgreSQL reclaims space with VACUUM")
+    return get_writer().submit(enable_incremental_vacuum, transaction=False).result()
+
+# Remove products that expired or were used up a while ago
+@timed("purge_products", kind="job")
+def purge_products(conn=None, expired_days=PURGE_EXPIRED_DAYS, consumed_days=PURGE_CONSUMED_DAYS,
+                   chunk_size=PURGE_CHUNK_SIZE, archive=PURGE_ARCHIVE):
+    """
+    Moves every user's stale products out of the hot `products` table.
+
+    A product is stale when it expired more than `expired_days` days ago, or when it has been 
+    used up (quantity 0) and its stock has not changed for `consumed_days` days. Stale rows go 
+    to the attached archive database (see `attach_archive()`) or, on PostgreSQL, to the 
+    `products_archive` table, and are dropped when `archive` is False.
+
+    Rows are moved `chunk_size` at a time, each chunk as its own write job, so GUI writes queued 
+    behind the purge wait for one chunk at most. Products with a malformed expiration date 
+    are never purged as expired. The freed pages are handed back with `incremental_vacuum()` 
+    afterwards, if the database uses it (see `compact_database()`).
+
+    Args:
+        conn (sqlite3.Connection, optional): SQLite connection object. When omitted, rows are read 
+            on a new connection and written by the writer thread, so the job can run in the background.
+        expired_days (int): Products expired longer than this are purged.
+        consumed_days (int): Used-up products untouched for longer than this are purged.
+        chunk_size (int): Products moved per transaction.
+        archive (bool): Copy the products into the archive before deleting them.
+
+    Returns:
+        int: Number of products purged.
+    """
+    reader = conn or connect_db()
+    postgres = is_postgres(reader)
+    if archive and conn is not None and not postgres:
+        attach_archive(conn)  # The writer thread's connection attaches it on startup
+
+    expired_cutoff = days_ago(expired_days)
+    consumed_cutoff = days_ago(consumed_days)
+    stale = f'''(({valid_date_sql(reader, 'expiration')} AND {iso_date_sql('expiration')} < ?)
+                 OR (quantity <= 0 AND NOT EXISTS (SELECT 1 FROM stock_events
+                                                  WHERE stock_events.product_id = products.id AND day >= ?)))'''
+    cutoffs = (expired_cutoff, consumed_cutoff)
+    archived_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    # Move one chunk (a write job, so it runs on the writer thread unless the caller passed a connection)
+    def move(write_conn, ids):
+        marks = ", ".join("?" * len(ids))
+        with write_conn:
+            if archive:
+                table = archive_table(write_conn)
+                write_conn.execute(f"DELETE FROM {table} WHERE id IN ({marks})", ids)  # Replace earlier copies
+                write_conn.execute(f'''INSERT INTO {table} ({PRODUCT_COLUMNS}, id, archived_at)
+                                       SELECT {PRODUCT_COLUMNS}, id, ? FROM products
+                                       WHERE id IN ({marks}) AND {stale}''', (archived_at, *ids, *cutoffs))
+            return write_conn.execute(f"DELETE FROM products WHERE id IN ({marks}) AND {stale}", (*ids, *cutoffs)).rowcount
+
+    purged = 0
+    last_id = 0
+    while True:
+        ids = [row[0] for row in reader.execute(f"SELECT id FROM products WHERE id > ? AND {stale} ORDER BY id LIMIT ?",
+                                                (last_id, *cutoffs, chunk_size))]
+        if not ids:
+            break
+        last_id = ids[-1]
+        purged += run_write(move, ids, conn=conn)
+
+    if purged:
+        if not postgres:  # PostgreSQL's autovacuum reclaims the space itself
+            if conn is None:
+                get_writer().submit(incremental_vacuum, transaction=False).result()
+            else:
+                incremental_vacuum(conn)
+        get_metrics_logger().info("purge_products purged=%d archive=%s", purged, archive)
+    return purged
+
+# Run the purge job now and then every PURGE_INTERVAL_MS on a background thread
+def schedule_purge(root):
+    def run():
+        run_in_background(root, purge_products, on_done=finished)
+
+    def finished(purged, error):
+        if error:
+            get_metrics_logger().warning("purge_products failed: %s", error)
+        root.after(PURGE_INTERVAL_MS, run)
+
+    run()
+
+# Roll the dashboard's expiry buckets forward now and then every DASHBOARD_ROLLOVER_MS
+def schedule_dashboard_rollover(root):
+    def run():
+        run_write_async(root, roll_dashboard_buckets, on_done=finished)
+
+    def finished(rolled, error):
+        if error:
+            get_metrics_logger().warning("dashboard rollover failed: %s", error)
+        root.after(DASHBOARD_ROLLOVER_MS, run)
+
+    run()
+
+# Low Stock and Expiry Queries
+def get_stock_alerts(conn, user_id=None):
+    """
+    Finds the logged-in user's products that are low in stock, predicted to run out soon or 
+    expiring within the next 10 days.
+
+    Args:
+        conn (sqlite3.Connection): SQLite connection object.
+        user_id (int, optional): Check this user's products instead of the logged-in user's.
+
+    Returns:
+        tuple: `(low_stock, expiring_items, running_out)`, lists of `(name, quantity)`, 
+        `(name, expiration)` and `(name, days_left)` rows. `running_out` comes from 
+        `forecast_inventory()` and leaves out products already in `low_stock`.
+    """
+    user_id = logged_in_user_id if user_id is None else user_id
+    cur = conn.cursor()
+    
+    # Get today's date and calculate the date 10 days from now
+    today = date.today()
+    ten_days_later = today + timedelta(days=EXPIRING_SOON_DAYS)
+    
+    # Check for products with low stock (quantity <= 3)
+    cur.execute("SELECT name, quantity FROM products WHERE user_id = ? AND quantity <= ?", (user_id, LOW_STOCK_QTY))
+    low_stock = cur.fetchall()
+    
+    # Format the date range for comparison (in mm/dd/yy format)
+    today_str = today.strftime('%m/%d/%y')
+    ten_days_later_str = ten_days_later.strftime('%m/%d/%y')
+    
+    # Check for products with expiration dates within the next 10 days
+    cur.execute("""
+        SELECT name, expiration 
+        FROM products 
+        WHERE user_id = ?
+        AND expiration >= ? 
+        AND expiration <= ?
+    """, (user_id, today_str, ten_days_later_str))
+    expiring_items = cur.fetchall()
+
+    # Products that are not low yet but will be soon at the current consumption rate
+    already_low = {name.strip().lower() for name, _ in low_stock}
+    running_out = [(name, days_left) for name, days_left in forecast_inventory(conn, user_id).running_out()
+                   if name not in already_low]
+    return low_stock, expiring_items, running_out
+
+@timed("check_stock")
+def check_stock(conn):
+    low_stock, expiring_items, running_out = get_stock_alerts(conn)
+
+    # Prepare messages
+    message = ""
+    
+    if low_stock:
+        message += "The following items are low in stock:\n"
+        message += "\n".join([f"{item[0]} (Quantity: {item[1]})" for item in low_stock]) + "\n"
+
+    if running_out:
+        message += f"\nThe following items are predicted to run out within {FORECAST_LOW_DAYS} days:\n"
+        message += "\n".join([f"{item[0].title()} (about {item[1]:.1f} days left)" for item in running_out]) + "\n"
+
+    if expiring_items:
+        message += f"\nThe following items are expiring soon (within {EXPIRING_SOON_DAYS} days):\n"
+        message += "\n".join([f"{item[0]} (Expiration: {item[1]})" for item in expiring_items]) + "\n"
+    
+    # Display message(s)
+    if message:
+        messagebox.showwarning("Stock and Expiry Alert", message)
+    else:
+        messagebox.showinfo("Stock Status", "All items have sufficient stock and no items are expiring soon.")
+
+    # The alerts on the bell have now been seen
+    if logged_in_user_id is not None and unseen_notifications(conn):
+        if root is not None and hasattr(root, "stock_button"):
+            run_write_async(root, mark_notifications_seen, logged_in_user_id,
+                            on_done=lambda count, error: update_bell(conn, root.stock_button))
+        else:
+            run_write(mark_notifications_seen, logged_in_user_id)
+
+
+# Stock and expiry alerts for every user, in one pass over products
+def collect_alerts(conn):
+    """
+    Finds every user's low-stock and soon-expiring products with a single query.
 
-        # Label and entry for Email
-        email_label = tk.Label(registration, text="Email:")
-        email_label.pack(pady=5)
+    Args:
+        conn (sqlite3.Connection): Database connection.
 
-        email_entry = tk.Entry(registration)
-        email_entry.pack(pady=5)
+    Returns:
+        dict: `(user_id, kind, product_id, detail) -> name`. `kind` is "low" (detail "") or 
+        "expiring" (detail is the expiration date, so a new date is a new alert).
+    """
+    expires = iso_date_sql("expiration")
+    today = date.today()
+    rows = conn.execute(f'''SELECT user_id, id, name, quantity, expiration, {expires} FROM products
+                           WHERE user_id IS NOT NULL AND (quantity <= ? OR {expires} BETWEEN ? AND ?)''',
+                        (LOW_STOCK_QTY, today.isoformat(), (today + timedelta(days=EXPIRING_SOON_DAYS)).isoformat()))
+    alerts = {}
+    soon = (today + timedelta(days=EXPIRING_SOON_DAYS)).isoformat()
+    for user_id, product_id, name, quantity, expiration, expires_iso in rows:
+        if quantity is not None and quantity <= LOW_STOCK_QTY:
+            alerts[(int(user_id), "low", product_id, "")] = name
+        if expires_iso and today.isoformat() <= expires_iso <= soon:
+            alerts[(int(user_id), "expiring", product_id, expiration)] = name
+    return alerts
+
+# Store new alerts and forget resolved ones (a writer job)
+def record_alerts(conn, alerts, now):
+    existing = set(map(tuple, conn.execute("SELECT user_id, kind, product_id, detail FROM notifications").fetchall()))
+    new = [(*key, alerts[key], now) for key in alerts.keys() - existing]
+    resolved = list(existing - alerts.keys())
+    with conn:
+        conn.executemany('''INSERT INTO notifications (user_id, kind, product_id, detail, name, created_at)
+                            VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT DO NOTHING''', new)
+        # A product that is restocked, used up or re-dated can raise the alert again later
+        conn.executemany("DELETE FROM notifications WHERE user_id = ? AND kind = ? AND product_id = ? AND detail = ?", resolved)
+    return len(new)
+
+# Reserve every undelivered alert for one sender (a writer job), so no other pass or app instance emails it too
+def claim_alerts(conn, claim):
+    with conn:
+        return conn.execute("UPDATE notifications SET emailed_at = ? WHERE emailed_at IS NULL AND email_attempts < ?",
+                            (claim, NOTIFY_MAX_ATTEMPTS)).rowcount
 
-        # Label and entry for username
-        username_label = tk.Label(registration, text="Username:")
-        username_label.pack(pady=5)
+# Record which digests were sent and which failed, and release the rest of the claim (a writer job)
+def record_deliveries(conn, claim, sent, failed, now):
+    with conn:
+        conn.executemany('''UPDATE notifications SET emailed_at = ?, last_error = NULL
+                            WHERE user_id = ? AND kind = ? AND product_id = ? AND detail = ? AND emailed_at = ?''',
+                         [(now, *key, claim) for key in sent])
+        conn.executemany('''UPDATE notifications SET emailed_at = NULL, email_attempts = email_attempts + 1, last_error = ?
+                            WHERE user_id = ? AND kind = ? AND product_id = ? AND detail = ? AND emailed_at = ?''',
+                         [(error, *key, claim) for key, error in failed])
+        # Not attempted (no SMTP connection): pending again, without using up an attempt
+        conn.execute("UPDATE notifications SET emailed_at = NULL WHERE emailed_at = ?", (claim,))
+
+# Digest email text for one user's new alerts
+def format_digest(alerts):
+    low = sorted(name for kind, name, detail in alerts if kind == "low")
+    expiring = sorted((detail, name) for kind, name, detail in alerts if kind == "expiring")
+    body = "Hello,\n\nHere is what changed in your FoodConnect inventory.\n"
+    if low:
+        body += "\nLow in stock:\n" + "\n".join(f"- {name}" for name in low) + "\n"
+    if expiring:
+        body += f"\nExpiring within {EXPIRING_SOON_DAYS} days:\n" + "\n".join(f"- {name} ({detail})" for detail, name in expiring) + "\n"
+    return body + "\nFoodConnect Team\n"
+
+# Email every user with undelivered alerts, over one SMTP connection
+@timed("smtp.send_digests", kind="job")
+def send_digests(conn, write_conn=None, smtp_factory=smtplib.SMTP):
+    """
+    Sends one digest email per user covering all of their alerts not yet emailed.
+
+    The pending alerts of all users are first claimed in one writer job (`claim_alerts()`): 
+    their `emailed_at` is set to a "sending:<token>" marker unique to this call, and only the 
+    claimed rows are sent. Two passes, or two app instances, can therefore never email the same 
+    alert. All digests go out over a single SMTP connection that is opened only when there is 
+    something to send (and reopened once if the server drops it). Delivery state is written 
+    back in one writer job: sent alerts get `emailed_at`, failed ones count an attempt and keep 
+    the error, and are retried on later passes until NOTIFY_MAX_ATTEMPTS. If the app stops 
+    mid-send, the claimed alerts keep their marker and are not emailed again (some of them may 
+    already have been sent); they still show on the bell.
 
-        username_entry = tk.Entry(registration)
-        username_entry.pack(pady=5)
+    Args:
+        conn (sqlite3.Connection): Connection used to read the pending alerts.
+        write_conn (sqlite3.Connection, optional): Write directly on this connection instead of 
+            through the writer thread (see `run_write()`).
+        smtp_factory (callable): Creates the SMTP connection; `smtplib.SMTP` by default.
 
-        # Label and entry for password
-        password_label = tk.Label(registration, text="Password:")
-        password_label.pack(pady=5)
+    Returns:
+        tuple: `(sent, failed)` numbers of digest emails.
+    """
+    claim = f"sending:{secrets.token_hex(8)}"
+    if not run_write(claim_alerts, claim, conn=write_conn):
+        return 0, 0
+    rows = conn.execute('''SELECT n.user_id, u.email, n.kind, n.product_id, n.detail, n.name
+                           FROM notifications n JOIN users u ON u.user_id = n.user_id
+                           WHERE n.emailed_at = ?
+                           ORDER BY n.user_id''', (claim,)).fetchall()
+    server = None
+    sent, failed = [], []
+    sent_users = failed_users = 0
+
+    def connect():
+        server = smtp_factory(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_S)
+        server.starttls()
+        server.login(SMTP_SENDER, SMTP_PASSWORD)
+        return server
 
-        password_entry = tk.Entry(registration, show='*')
-        password_entry.pack(pady=5)
+    try:
+        for user_id, group in itertools.groupby(rows, key=lambda row: row[0]):
+            group = list(group)
+            email = group[0][1]
+            keys = [(user_id, kind, product_id, detail) for _, _, kind, product_id, detail, _ in group]
+
+            msg = MIMEText(format_digest([(kind, name, detail) for _, _, kind, _, detail, name in group]), "plain")
+            msg["From"] = SMTP_SENDER
+            msg["To"] = email
+            msg["Subject"] = "FoodConnect: items running low or expiring soon"
+
+            if server is None:
+                try:
+                    server = connect()
+                except (smtplib.SMTPException, OSError) as e:
+                    # Nothing can be sent this pass; the alerts stay pending without using up attempts
+                    get_metrics_logger().warning("send_digests could not connect: %s", e)
+                    break
+            try:
+                try:
+                    server.sendmail(SMTP_SENDER, email, msg.as_string())
+                except smtplib.SMTPServerDisconnected:
+                    server = connect()
+                    server.sendmail(SMTP_SENDER, email, msg.as_string())
+            except (smtplib.SMTPException, OSError) as e:
+                failed.extend((key, str(e)) for key in keys)
+                failed_users += 1
+                continue
+            sent.extend(keys)
+            sent_users += 1
+    finally:
+        if server is not None:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        run_write(record_deliveries, claim, sent, failed, datetime.now().isoformat(timespec="seconds"), conn=write_conn)
+    return sent_users, failed_users
+
+# One run of the notification engine for all users
+@timed("notification_pass", kind="job")
+def notification_pass(conn=None, email=None, smtp_factory=smtplib.SMTP):
+    """
+    Collects alerts for every user, stores the new ones and emails digests.
 
-        confirm_password_label = tk.Label(registration, text="Confirm Password:")
-        confirm_password_label.pack(pady=5)
+    Alerts are deduplicated through the `notifications` table: an alert is recorded (and later 
+    emailed and shown on the bell) once, and its row is removed when the product no longer 
+    qualifies, so it can be raised again if the product runs low or nears expiry another time.
 
-        confirm_password_entry = tk.Entry(registration, show='*')
-        confirm_password_entry.pack(pady=5)
+    Args:
+        conn (sqlite3.Connection, optional): Use this connection for reads and writes. By default 
+            reads use a new connection and writes go through the writer thread.
+        email (bool, optional): Send digest emails. Defaults to NOTIFY_EMAIL, if email is set up.
+        smtp_factory (callable): Creates the SMTP connection (see `send_digests()`).
 
-        # Submit button
-        submit_button = tk.Button(registration, text="Submit", command=on_submit)
-        submit_button.pack(pady=20)
+    Returns:
+        dict: `{"new": alerts recorded, "sent": digests sent, "failed": digests that failed}`.
+    """
+    reader = conn or connect_db()
+    email = NOTIFY_EMAIL and EMAIL_CONFIGURED if email is None else email
+    try:
+        alerts = collect_alerts(reader)
+        new = run_write(record_alerts, alerts, datetime.now().isoformat(timespec="seconds"), conn=conn)
+        sent = failed = 0
+        if email:
+            sent, failed = send_digests(reader, write_conn=conn, smtp_factory=smtp_factory)
+    finally:
+        if conn is None:
+            reader.close()
+    get_metrics_logger().info("notification_pass alerts=%d new=%d sent=%d failed=%d", len(alerts), new, sent, failed)
+    return {"new": new, "sent": sent, "failed": failed}
+
+# Number of the user's alerts not yet seen in the app
+def unseen_notifications(conn, user_id=None):
+    user_id = logged_in_user_id if user_id is None else user_id
+    return conn.execute("SELECT COUNT(*) FROM notifications WHERE user_id = ? AND seen_at IS NULL", (user_id,)).fetchone()[0]
+
+# Mark the user's alerts as seen (a writer job)
+def mark_notifications_seen(conn, user_id):
+    with conn:
+        conn.execute("UPDATE notifications SET seen_at = ? WHERE user_id = ? AND seen_at IS NULL",
+                     (datetime.now().isoformat(timespec="seconds"), user_id))
+
+# Run the notification engine now and then every NOTIFY_INTERVAL_MS, showing new alerts on the bell
+def schedule_notifications(root, conn, bell):
+    def run():
+        run_in_background(root, notification_pass, on_done=finished)
+
+    def finished(result, error):
+        if error:
+            get_metrics_logger().warning("notification_pass failed: %s", error)
+        update_bell(conn, bell)
+        root.after(NOTIFY_INTERVAL_MS, run)
+
+    run()
+
+# Show the number of unseen alerts next to the bell
+def update_bell(conn, bell):
+    count = unseen_notifications(conn) if logged_in_user_id is not None else 0
+    bell.config(text=f" {count}" if count else "", compound=tk.LEFT, fg="red")
+
+# Apply the same change to several products at once
+def batch_edit_products(inventory, product_ids, qty_delta=0, group=None, flag=None, flag_value=None, exp_shift_days=0,
+                        widget=None, on_done=None):
+    """
+    Applies a bulk edit to the given products and saves them with one `executemany` in one transaction.
 
-        # Cancel Button
-        cancel_button = tk.Button(registration, text="Cancel", command=on_close_register)
-        cancel_button.pack(pady=5)
+    With a `widget`, the write is only queued and `on_done(count, error)` runs on the Tk event 
+    loop once it is committed (see `InventoryCache`).
 
-    # Buttons for login and sign-up
-    tk.Button(login_root, text="Login", command=login).pack(side=tk.TOP, padx=20, pady=10)
-    tk.Button(login_root, text="Register", command=on_register).pack(side=tk.TOP, padx=20, pady=10)
+    Args:
+        inventory (InventoryCache): The user's inventory cache (written through).
+        product_ids (list): Ids of the products to change.
+        qty_delta (int): Amount added to each quantity (negative to consume). Quantities stop at 0.
+        group (int, optional): New food group for all products.
+        flag (str, optional): Dietary flag to change, e.g. "Vegan".
+        flag_value (int, optional): 1 or 0, the value `flag` is set to.
+        exp_shift_days (int): Days added to each expiration date (dates that don't parse are left alone).
+        widget (Tkinter Widget, optional): Widget of the running event loop, to save without waiting.
+        on_done (callable, optional): Called as `on_done(count, error)` after the save.
 
-    login_root.mainloop()
+    Returns:
+        int: Number of products changed.
+    """
+    changed = []
+    for product_id in product_ids:
+        record = inventory.get(product_id)
+        if record is None:
+            continue
+
+        info = dict(record["Info"])
+        if flag is not None and flag_value is not None:
+            info[flag] = flag_value
+
+        expiration = record["Exp"]
+        if exp_shift_days:
+            try:
+                shifted = datetime.strptime(expiration, '%m/%d/%y').date() + timedelta(days=exp_shift_days)
+                expiration = shifted.strftime('%m/%d/%y')
+            except (TypeError, ValueError):
+                pass
+
+        changed.append(Product(record["Name"], max(0, int(record["Quantity"] or 0) + qty_delta),
+                               record["Group"] if group is None else group, expiration, record["Add"],
+                               inventory.user_id, info, product_id))
+
+    if changed:
+        inventory.update_many(changed, widget=widget,
+                              on_done=on_done and (lambda result, error: on_done(len(changed), error)))
+    elif on_done:
+        on_done(0, None)
+    return len(changed)
+
+# Inventory totals for the dashboard
+def dashboard_summary(conn, user_id):
+    """
+    Reads the user's dashboard numbers from `product_summary` (see `create_product_summary()`).
 
-# Main Window
-def main_window(conn):
+    Args:
+        conn (sqlite3.Connection): Database connection object.
+        user_id (int): The user whose inventory is summarised.
+
+    Returns:
+        dict: "Items" and "Quantity" totals, "Groups" (food group -> (items, quantity)) and 
+        "Expiry" ("Expired", "This Week", "Next Week", "Later", "No Date" -> (items, quantity)).
     """
-    Initializes and configures the main window for the Tkinter application.
+    this_week = week_start()
+    next_week = week_start(date.today() + timedelta(days=7))
+
+    # Weeks that passed since the last rollover are still counted as expired below
+    rows = conn.execute('''SELECT "group", bucket, items, quantity FROM product_summary
+                           WHERE user_id = ? AND items != 0''', (str(user_id),)).fetchall()
+
+    summary = {"Items": 0, "Quantity": 0, "Groups": {},
+               "Expiry": {name: (0, 0) for name in ("Expired", "This Week", "Next Week", "Later", "No Date")}}
+    for group, bucket, items, quantity in rows:
+        if bucket == "none":
+            name = "No Date"
+        elif bucket == "expired" or bucket < this_week:
+            name = "Expired"
+        elif bucket == this_week:
+            name = "This Week"
+        elif bucket == next_week:
+            name = "Next Week"
+        else:
+            name = "Later"
+
+        summary["Items"] += items
+        summary["Quantity"] += quantity
+        group_items, group_quantity = summary["Groups"].get(group, (0, 0))
+        summary["Groups"][group] = (group_items + items, group_quantity + quantity)
+        bucket_items, bucket_quantity = summary["Expiry"][name]
+        summary["Expiry"][name] = (bucket_items + items, bucket_quantity + quantity)
+    return summary
+
+# Shopping list entries for a user: low stock, expiring soon or predicted to run out
+def build_shopping_list(conn, user_id):
+    """
+    Aggregates the user's inventory into a deduplicated shopping list.
 
-    This function creates the root window with a title "FoodConnect" and 
-    sets the dimensions of the window to 600x800 pixels.
+    One grouped query collapses all rows of the same product name (case-insensitive) and food 
+    group, then keeps groups whose total quantity is at most LOW_STOCK_QTY or whose earliest 
+    expiration is within EXPIRING_SOON_DAYS. The same name in two food groups gives two entries. 
+    Malformed expiration dates are ignored. Products `forecast_inventory()` predicts will run out 
+    within FORECAST_LOW_DAYS are added as well, unless their name is already listed.
+
+    Args:
+        conn (sqlite3.Connection): SQLite connection object.
+        user_id (int): The user whose inventory is checked.
 
     Returns:
-        Tk: The root Tkinter window object that serves as the main application window.
+        list: Dictionaries with "Name", "Group", "Quantity", "Exp" (YYYY-MM-DD) and "Reason", sorted by name and group.
     """
-    global root
-    root = tk.Tk()
-    root.title("FoodConnect")
-    root.geometry('900x800')
-    root.config(bg=LIGHT_BG)
+    cur = conn.cursor()
+    soonest = f'MIN(CASE WHEN {valid_date_sql(conn, "expiration")} THEN {iso_date_sql("expiration")} END)'
+    cur.execute(f'''SELECT lower(trim(name)), MIN(name), "group", SUM(quantity), {soonest}
+                    FROM products
+                    WHERE user_id = ?
+                    GROUP BY lower(trim(name)), "group"
+                    HAVING SUM(quantity) <= ? OR {soonest} <= ?''',
+                (user_id, LOW_STOCK_QTY, (date.today() + timedelta(days=EXPIRING_SOON_DAYS)).isoformat()))
+
+    items = {}
+    for key, name, group, quantity, soonest in cur.fetchall():
+        reasons = []
+        if quantity <= LOW_STOCK_QTY:
+            reasons.append("Low stock")
+        if soonest and soonest < date.today().isoformat():
+            reasons.append(f"Expired {soonest}")
+        elif soonest and soonest <= (date.today() + timedelta(days=EXPIRING_SOON_DAYS)).isoformat():
+            reasons.append(f"Expiring {soonest}")
+        items[(key, group)] = {"Name": name, "Group": group, "Quantity": quantity, "Exp": soonest, "Reason": ", ".join(reasons)}
+
+    listed = {key for key, _ in items}
+    for key, days_left in forecast_inventory(conn, user_id).running_out():
+        if key not in listed:
+            items[(key, None)] = {"Name": key.title(), "Group": None, "Quantity": None, "Exp": None,
+                                  "Reason": f"Runs out in ~{days_left:.0f} days"}
+
+    return sorted(items.values(), key=lambda item: (item["Name"].lower(), item["Group"] or 0))
+
+# Built shopping lists, keyed by user_id: (the user's change counter, day built, items)
+shopping_lists = {}
+
+# Get the user's shopping list, memoised until their products change or the day rolls over
+def get_shopping_list(user_id=None):
+    """
+    Returns the user's shopping list, rebuilding it with `build_shopping_list()` when needed.
 
-    light = Image.open(os.path.join(CURRENT_DIR, "light.png"))
-    dark = Image.open(os.path.join(CURRENT_DIR, "dark.png"))
-    bell = Image.open(os.path.join(CURRENT_DIR, "bell.png"))
-    root.light_image = ImageTk.PhotoImage(light, master=root)
-    root.dark_image = ImageTk.PhotoImage(dark, master=root)
-    root.notify_image = ImageTk.PhotoImage(bell, master=root)
+    The list is kept per user with the user's change counter (`data_version()`) it was built at. 
+    It is rebuilt in full once that user's products are added, updated or deleted, by this app 
+    or another, or when the date changes. Other users' writes leave it alone. The check reads 
+    one row, so opening the list again without changes does not load the inventory.
 
-    switch_value = True
+    Args:
+        user_id (int, optional): The user whose list is returned. Defaults to the logged in user.
 
-    # Frames must be created before the toggle function
-    frame = tk.Frame(root, bg=FRAME_LIGHT_COLOR)
-    frame.pack(side=tk.TOP, pady=20)
-    
-    panel = tk.Frame(root, bg=FRAME_LIGHT_COLOR)
-    panel.pack(side=tk.TOP, pady=20)
+    Returns:
+        list: The items of `build_shopping_list()`.
+    """
+    inventory = get_inventory(user_id)
+    version = data_version(inventory.conn, inventory.user_id)
+    cached = shopping_lists.get(inventory.user_id)
+    if cached and cached[0] == version and cached[1] == date.today():
+        return cached[2]
+
+    items = build_shopping_list(inventory.conn, inventory.user_id)
+    shopping_lists[inventory.user_id] = (version, date.today(), items)
+    return items
+
+# Plain text version of a shopping list, for export and printing
+def format_shopping_list(items):
+    lines = [f"FoodConnect Shopping List - {date.today().strftime('%m/%d/%y')}", ""]
+    for item in items:
+        group = food_groups[item["Group"] - 1] if item["Group"] else ""
+        have = f"have {item['Quantity']}" if item["Quantity"] is not None else ""
+        details = ", ".join(part for part in (group, have, item["Reason"]) if part)
+        lines.append(f"[ ] {item['Name']} ({details})")
+    if not items:
+        lines.append("Nothing to buy. Everything is stocked and fresh.")
+    return "\n".join(lines) + "\n"
+
+# Function to create the product 'catalog' table if it doesn't already exist
+def create_catalog(conn):
+    with conn:
+        # WITHOUT ROWID stores rows inside the barcode B-tree: no separate index, one lookup per barcode
+        conn.execute('''CREATE TABLE IF NOT EXISTS catalog (
+                            barcode TEXT PRIMARY KEY,
+                            name TEXT NOT NULL,
+                            "group" INTEGER,
+                            vegetarian BOOLEAN,
+                            vegan BOOLEAN,
+                            gluten BOOLEAN,
+                            lactose BOOLEAN,
+                            eggs BOOLEAN,
+                            nuts BOOLEAN,
+                            halal BOOLEAN,
+                            kosher BOOLEAN) WITHOUT ROWID''')
 
-    def apply_theme(widget, bg_color, fg_color):
-        widget.config(bg=bg_color)
-        if isinstance(widget, (tk.Label, tk.Button, tk.Entry, tk.Text, tk.Checkbutton, tk.Radiobutton)):
-            widget.config(fg=fg_color)
-            if isinstance(widget, (tk.Checkbutton, tk.Radiobutton)):
-                widget.config(selectcolor=bg_color, activeforeground=fg_color)
-        elif isinstance(widget, tk.Listbox):
-            widget.config(bg=bg_color, fg=fg_color)
+# Connect to the local product catalog (kept out of products.db so the inventory stays small)
+def connect_catalog(db_name=None):
+    conn = sqlite3.connect(db_name or CATALOG_DB, factory=InstrumentedConnection)
+    create_catalog(conn)
+    return conn
 
-        for child in widget.winfo_children():
-            apply_theme(child, bg_color, fg_color)
+# Open Food Facts tags (without the "en:" prefix) that map to the app's food groups, checked in order.
+# Tags are matched whole: "non-dairy" is not dairy, "donuts" are not nuts and "fruit-juices" are not fruit.
+CATALOG_GROUP_TAGS = [
+    (1, {"dairies", "dairy", "milk-and-dairy-products", "milks", "cheeses", "yogurts", "butters"}),
+    (2, {"fruits", "fresh-fruits", "dried-fruits", "frozen-fruits"}),
+    (3, {"vegetables", "fresh-vegetables", "frozen-vegetables", "vegetables-based-foods", "salads"}),
+    (4, {"cereals", "cereals-and-potatoes", "breads", "pastas", "rices", "grains", "breakfast-cereals"}),
+    (5, {"meats", "meat", "fishes", "fish", "seafood", "fish-and-seafood", "fish-meat-eggs", "eggs", "legumes",
+         "poultry", "tofu", "nuts"}),
+]
+
+# Open Food Facts labels/allergens that map to the dietary flags
+CATALOG_LABELS = {"Vegetarian": "en:vegetarian", "Vegan": "en:vegan", "Halal": "en:halal", "Kosher": "en:kosher"}
+CATALOG_ALLERGENS = {"Gluten": ("en:gluten",), "Lactose": ("en:milk",), "Eggs": ("en:eggs",), "Nuts": ("en:nuts", "en:peanuts")}
+
+# Convert one Open Food Facts CSV row into a catalog row (None if it has no barcode or name)
+def catalog_row(record):
+    barcode = (record.get("code") or "").strip()
+    name = (record.get("product_name") or record.get("generic_name") or "").strip()
+    if not barcode.isdigit() or not name:
+        return None
+
+    tags = {tag.strip().split(":", 1)[-1] for field in ("food_groups_tags", "categories_tags")
+            for tag in (record.get(field) or "").split(",")}
+    group = next((group for group, keys in CATALOG_GROUP_TAGS if tags & keys), 6)
+
+    labels = set((record.get("labels_tags") or "").split(","))
+    allergens = set((record.get("allergens_tags") or "").split(",")) | set((record.get("traces_tags") or "").split(","))
+    info = {flag: int(tag in labels) for flag, tag in CATALOG_LABELS.items()}
+    info.update({flag: int(any(tag in allergens for tag in tags_)) for flag, tags_ in CATALOG_ALLERGENS.items()})
+
+    return (barcode, name[:100], group, info["Vegetarian"], info["Vegan"], info["Gluten"], info["Lactose"],
+            info["Eggs"], info["Nuts"], info["Halal"], info["Kosher"])
+
+# Import an Open Food Facts CSV dump into the catalog
+def import_catalog(path, conn=None, chunk_size=20000):
+    """
+    Loads an Open Food Facts CSV export (`en.openfoodfacts.org.products.csv`, optionally .gz) 
+    into the local catalog.
 
-    def toggle():
-        nonlocal switch_value
+    The file is streamed and written in chunks of `chunk_size` rows per transaction with 
+    `executemany`, so memory use is flat however large the dump is. Existing barcodes are replaced.
 
-        # Dark theme
-        if switch_value:
-            switch.config(image=root.dark_image, bg=DARK_BG, activebackground=DARK_BG)
-            root.config(bg=DARK_BG)
-            apply_theme(panel, FRAME_DARK_COLOR, TEXT_DARK_COLOR)
-            apply_theme(frame, FRAME_DARK_COLOR, TEXT_DARK_COLOR)
-            switch_value = False
+    Args:
+        path (str): Path of the tab-separated dump.
+        conn (sqlite3.Connection, optional): Catalog connection. Defaults to `connect_catalog()`.
+        chunk_size (int): Rows written per transaction.
 
-        # Light theme
-        else:
-            switch.config(image=root.light_image, bg=LIGHT_BG, activebackground=LIGHT_BG)
-            root.config(bg=LIGHT_BG)
-            apply_theme(panel, FRAME_LIGHT_COLOR, TEXT_LIGHT_COLOR)
-            apply_theme(frame, FRAME_LIGHT_COLOR, TEXT_LIGHT_COLOR)
-            switch_value = True
+    Returns:
+        int: Number of catalog entries imported.
+    """
+    conn = conn or connect_catalog()
+    csv.field_size_limit(sys.maxsize)
+    opener = gzip.open if path.endswith(".gz") else open
+    imported = 0
+
+    conn.execute("PRAGMA synchronous = OFF")  # Safe here: a failed import can simply be run again
+    with opener(path, "rt", encoding="utf-8", errors="replace", newline="") as file:
+        reader = csv.DictReader(file, delimiter="\t", quoting=csv.QUOTE_NONE)
+        batch = []
+        for record in reader:
+            row = catalog_row(record)
+            if row:
+                batch.append(row)
+            if len(batch) >= chunk_size:
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO catalog VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO catalog VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            imported += len(batch)
+    conn.execute("PRAGMA synchronous = FULL")
+    return imported
+
+# Barcode spellings to try: as scanned, as EAN-13 (UPC-A gets a leading zero) and without leading zeros
+def barcode_variants(barcode):
+    barcode = "".join(ch for ch in barcode if ch.isdigit())
+    if not barcode:
+        return []
+    return list(dict.fromkeys([barcode, barcode.zfill(13), barcode.lstrip("0")]))
+
+# Read-only, memory-mapped copy of the catalog
+class CatalogSnapshot:
+    """
+    A prebuilt binary snapshot of the product catalog, memory-mapped read-only.
+
+    Layout (little endian):
+    - header: magic, version, record count, key width, name width, record size, metadata length, 
+      keys offset, records offset
+    - metadata: JSON with the food group names and the dietary flag bit order
+    - keys: sorted barcodes, each zero-padded to KEY_WIDTH ASCII digits
+    - records: for each key (same position), the UTF-8 name padded to NAME_WIDTH bytes, 
+      the food group (1 byte) and the dietary flags as a bit mask (1 byte)
+
+    Opening a snapshot only parses the fixed-size header, so start-up time does not depend on the 
+    catalog size, and because the file is mapped rather than read, every FoodConnect process on 
+    the terminal shares the same cached pages. Lookups binary search the key section.
+    """
+    MAGIC = b"FCSNAP\x00\x01"
+    VERSION = 1
+    HEADER = struct.Struct("<8sIQHHHIQQ")
+    KEY_WIDTH = 14
+    NAME_WIDTH = 64
+    RECORD = struct.Struct(f"<{NAME_WIDTH}sBB")
+    FLAGS = ["Vegetarian", "Vegan", "Gluten", "Lactose", "Eggs", "Nuts", "Halal", "Kosher"]
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.count, key_width, name_width, record_size, meta_length,
+         self.keys_offset, self.records_offset) = self.HEADER.unpack_from(self.map, 0)
+        if magic != self.MAGIC or version != self.VERSION or key_width != self.KEY_WIDTH \
+                or name_width != self.NAME_WIDTH or record_size != self.RECORD.size:
+            self.map.close()
+            raise ValueError(f"{path} is not a compatible catalog snapshot")
+        self.metadata = json.loads(self.map[self.HEADER.size:self.HEADER.size + meta_length])
+
+    # Normalise a barcode to its fixed-width key (GTINs that differ only by leading zeros are the same)
+    @classmethod
+    def key(cls, barcode):
+        digits = "".join(ch for ch in barcode if ch.isdigit()).lstrip("0")
+        if not digits or len(digits) > cls.KEY_WIDTH:
+            return None
+        return digits.zfill(cls.KEY_WIDTH).encode("ascii")
 
-    # Low Stock Check Button
-    stock_button = tk.Button(
-        root, 
-        image=root.notify_image, 
-        bd=0, 
-        bg=LIGHT_BG, 
-        activebackground=LIGHT_BG, 
-        command=lambda: (check_stock(conn))  
-    )
-    stock_button.place(relx=0.85, rely=0.95, anchor='se')
+    # Binary search for a barcode; returns the same dictionary as lookup_barcode()
+    def lookup(self, barcode):
+        key = self.key(barcode)
+        if key is None:
+            return None
 
-    # Switch Button (for light/dark mode)
-    switch = tk.Button(
-        root, 
-        image=root.light_image, 
-        bd=0, 
-        bg=LIGHT_BG, 
-        activebackground=LIGHT_BG, 
-        command=toggle 
-    )
-    switch.place(relx=0.92, rely=0.95, anchor='se')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            start = self.keys_offset + middle * self.KEY_WIDTH
+            if self.map[start:start + self.KEY_WIDTH] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        start = self.keys_offset + low * self.KEY_WIDTH
+        if low == self.count or self.map[start:start + self.KEY_WIDTH] != key:
+            return None
 
-    # Pass switch_value to create_buttons
-    create_buttons(frame, panel, switch_value)
+        name, group, flags = self.RECORD.unpack_from(self.map, self.records_offset + low * self.RECORD.size)
+        return {
+            "Barcode": key.decode("ascii").lstrip("0"),
+            "Name": name.rstrip(b"\x00").decode("utf-8", errors="ignore"),
+            "Group": group,
+            "Info": {flag: (flags >> bit) & 1 for bit, flag in enumerate(self.metadata["flags"])}
+        }
 
-    return root
+    def close(self):
+        self.map.close()
 
-# Button Clicked
-def on_button_click(clicked_index, buttons, panel):
+# Write the catalog out as a snapshot file
+def build_catalog_snapshot(conn=None, path=None):
     """
-    Handles the event when a button is clicked in the GUI.
+    Builds a `CatalogSnapshot` file from the SQLite catalog.
 
-    This function iterates over a list of buttons and adjusts the size of the clicked button. 
-    It ensures that the button corresponding to the `clicked_index` is highlighted (or resized) 
-    while maintaining a consistent size for all other buttons. Once the button is clicked, it 
-    calls the `create_panel` function to update the content of the specified panel based on 
-    the index of the clicked button.
+    Rows are streamed in key order straight into the key and record sections (their sizes are 
+    known from the row count), so memory use does not grow with the catalog. Every build is a 
+    new version, `path` plus "." and a build number (see `snapshot_versions()`), so no file a 
+    running app has mapped is ever replaced (Windows does not allow that). Older versions are 
+    deleted; ones still mapped somewhere on Windows are left for a later build to remove.
 
     Args:
-        clicked_index (int): The index of the button that was clicked.
-        buttons (list): A list of Tkinter button objects.
-        panel (Tkinter Frame): The frame or panel where the content is displayed after a button click.
+        conn (sqlite3.Connection, optional): Catalog connection. Defaults to `connect_catalog()`.
+        path (str, optional): Snapshot path the versions are named after. Defaults to CATALOG_SNAPSHOT.
 
     Returns:
-        None
+        int: Number of products written.
     """
-    # Iterating over all buttons, find the one that is clicked, adjust size
-    for index, button in enumerate(buttons):
-        if index == clicked_index:
-            button.config(height=HEIGHT, width=WIDTH)
+    conn = conn or connect_catalog()
+    path = path or CATALOG_SNAPSHOT
+    snapshot = CatalogSnapshot
+    width = snapshot.KEY_WIDTH
+    metadata = json.dumps({"food_groups": food_groups, "flags": snapshot.FLAGS,
+                           "built": time.strftime("%Y-%m-%dT%H:%M:%S")}).encode("utf-8")
+
+    total = conn.execute("SELECT COUNT(*) FROM catalog").fetchone()[0]
+    keys_offset = snapshot.HEADER.size + len(metadata)
+    records_offset = keys_offset + total * width
+
+    temp_path = path + ".tmp"
+    count = 0
+    with open(temp_path, "wb") as keys_file, open(temp_path, "r+b") as records_file:
+        keys_file.seek(keys_offset)
+        records_file.seek(records_offset)
+
+        previous = None
+        # Sorting on the zero-padded barcode makes key order match CatalogSnapshot.key()
+        cur = conn.execute(f'''SELECT substr('{"0" * width}' || ltrim(barcode, '0'), -{width}), name, "group",
+                                      vegetarian, vegan, gluten, lactose, eggs, nuts, halal, kosher
+                               FROM catalog
+                               WHERE length(ltrim(barcode, '0')) BETWEEN 1 AND {width}
+                               ORDER BY 1''')
+        for row in cur:
+            key = row[0].encode("ascii")
+            if key == previous:
+                continue  # Same GTIN spelled with different leading zeros
+            previous = key
+            name = row[1].encode("utf-8")[:snapshot.NAME_WIDTH].decode("utf-8", errors="ignore").encode("utf-8")
+            flags = sum(int(bool(value)) << bit for bit, value in enumerate(row[3:11]))
+            keys_file.write(key)
+            records_file.write(snapshot.RECORD.pack(name, row[2] or 6, flags))
+            count += 1
+
+        # Duplicates were skipped, so the records section starts earlier than reserved
+        keys_file.flush()
+        records_file.flush()
+        if count != total:
+            records_file.seek(records_offset)
+            data = records_file.read(count * snapshot.RECORD.size)
+            records_offset = keys_offset + count * width
+            records_file.seek(records_offset)
+            records_file.write(data)
+            records_file.truncate()
+
+        keys_file.seek(0)
+        keys_file.write(snapshot.HEADER.pack(snapshot.MAGIC, snapshot.VERSION, count, width, snapshot.NAME_WIDTH,
+                                             snapshot.RECORD.size, len(metadata), keys_offset, records_offset))
+        keys_file.write(metadata)
+
+    version = f"{path}.{time.time_ns()}"
+    os.replace(temp_path, version)
+
+    # Unversioned files come from older versions of the app
+    for old in snapshot_versions(path)[1:] + ([path] if os.path.exists(path) else []):
+        try:
+            os.remove(old)
+        except OSError:
+            pass  # Still mapped by a running app on Windows
+    return count
+
+# Built versions of a snapshot, newest first
+def snapshot_versions(path):
+    folder, base = os.path.split(path)
+    versions = [name for name in os.listdir(folder or ".")
+                if name.startswith(base + ".") and name[len(base) + 1:].isdigit()]
+    versions.sort(key=lambda name: int(name[len(base) + 1:]), reverse=True)
+    return [os.path.join(folder, name) for name in versions]
+
+catalog_snapshot = None
+
+# Map the newest catalog snapshot if one has been built (cheap: only the header is read)
+def open_catalog_snapshot(path=None):
+    global catalog_snapshot
+    path = path or CATALOG_SNAPSHOT
+    candidates = snapshot_versions(path) + ([path] if os.path.exists(path) else [])
+    if not candidates:
+        return catalog_snapshot
+    try:
+        snapshot = CatalogSnapshot(candidates[0])
+    except (OSError, ValueError, struct.error) as e:
+        get_metrics_logger().warning("catalog snapshot %s not used: %s", candidates[0], e)
+        snapshot = None
+
+    # Unmap the one being replaced, so its file can be deleted by the next build
+    old, catalog_snapshot = catalog_snapshot, snapshot
+    if old is not None:
+        old.close()
+    return catalog_snapshot
+
+catalog_conn = None
+
+# Look up a barcode in the local catalog
+def lookup_barcode(barcode):
+    """
+    Finds a product in the local catalog by barcode (no network access).
+
+    Uses the memory-mapped snapshot when one was opened at start-up, otherwise queries catalog.db.
+
+    Args:
+        barcode (str): The scanned or typed UPC/EAN code.
+
+    Returns:
+        dict: "Name", "Group" and "Info" (dietary flags) in the format the add form uses, or None.
+    """
+    global catalog_conn
+    if catalog_snapshot is not None:
+        return catalog_snapshot.lookup(barcode)
+
+    variants = barcode_variants(barcode)
+    if not variants or not os.path.exists(CATALOG_DB):
+        return None
+    if catalog_conn is None:
+        catalog_conn = connect_catalog()
+
+    for code in variants:
+        row = catalog_conn.execute("SELECT * FROM catalog WHERE barcode = ?", (code,)).fetchone()
+        if row:
+            return {
+                "Barcode": row[0],
+                "Name": row[1],
+                "Group": row[2],
+                "Info": dict(zip(["Vegetarian", "Vegan", "Gluten", "Lactose", "Eggs", "Nuts", "Halal", "Kosher"], row[3:11]))
+            }
+    return None
+
+# Let the user pick an Open Food Facts dump and import it without freezing the window
+def import_catalog_dialog(parent):
+    path = filedialog.askopenfilename(parent=parent, title="Import Open Food Facts Dump",
+                                      filetypes=[("Open Food Facts CSV", "*.csv *.csv.gz *.tsv"), ("All files", "*.*")])
+    if not path:
+        return
+
+    def on_done(count, error):
+        if error:
+            messagebox.showerror("Import Error", f"Could not import the catalog: {error}")
         else:
-            button.config(height=HEIGHT, width=WIDTH)
+            messagebox.showinfo("Success", f"Imported {count} products into the catalog.")
 
-    create_panel(clicked_index, panel)  # Call create_panel with the clicked index
+    # The worker thread needs its own connection; the snapshot is rebuilt so lookups see the new products
+    def import_and_snapshot():
+        conn = connect_catalog()
+        count = import_catalog(path, conn)
+        build_catalog_snapshot(conn)
+        return count
 
-# Create the Buttons
-def create_buttons(frame, panel, switch_value): 
+    def on_imported(count, error):
+        if not error:
+            open_catalog_snapshot()
+        on_done(count, error)
+
+    run_in_background(parent, import_and_snapshot, on_done=on_imported)
+    messagebox.showinfo("Importing", "The catalog is being imported in the background. You can keep using the app.")
+
+# Function to create the recipe tables if they don't already exist
+def create_recipes(conn):
+    with conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS recipes (
+                            id INTEGER PRIMARY KEY,
+                            name TEXT NOT NULL,
+                            ingredients TEXT NOT NULL,
+                            instructions TEXT,
+                            vegetarian BOOLEAN,
+                            vegan BOOLEAN,
+                            gluten BOOLEAN,
+                            lactose BOOLEAN,
+                            eggs BOOLEAN,
+                            nuts BOOLEAN,
+                            halal BOOLEAN,
+                            kosher BOOLEAN)''')
+        # The inverted index: one row per (ingredient, recipe), clustered by ingredient, so all 
+        # recipes using an ingredient are one range read. The recipe's ingredient count and dietary 
+        # mask are copied in, so matching never has to visit `recipes`.
+        conn.execute('''CREATE TABLE IF NOT EXISTS recipe_ingredients (
+                            ingredient TEXT NOT NULL,
+                            recipe_id INTEGER NOT NULL,
+                            ingredient_count INTEGER NOT NULL,
+                            diet INTEGER NOT NULL,
+                            PRIMARY KEY (ingredient, recipe_id)) WITHOUT ROWID''')
+
+        # Importing the same file twice must not list its recipes twice. Collections imported 
+        # before this index existed are deduplicated once, keeping the first copy.
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_recipes_unique'").fetchone():
+            conn.execute("DELETE FROM recipes WHERE id NOT IN (SELECT MIN(id) FROM recipes GROUP BY name, ingredients)")
+            conn.execute("DELETE FROM recipe_ingredients WHERE recipe_id NOT IN (SELECT id FROM recipes)")
+            conn.execute("CREATE UNIQUE INDEX idx_recipes_unique ON recipes (name, ingredients)")
+
+# Connect to the local recipe collection
+def connect_recipes(db_name=None):
+    conn = sqlite3.connect(db_name or RECIPES_DB, factory=InstrumentedConnection)
+    create_recipes(conn)
+    return conn
+
+# Dietary flags of recipes, in the same bit order as the catalog snapshot
+RECIPE_FLAGS = CatalogSnapshot.FLAGS
+RECIPE_REQUIRED_FLAGS = ("Vegetarian", "Vegan", "Halal", "Kosher")   # Flags a diet needs set
+RECIPE_EXCLUDED_FLAGS = ("Gluten", "Lactose", "Eggs", "Nuts")       # Flags a diet needs clear
+
+# Words dropped when normalising ingredient and product names
+INGREDIENT_STOP_WORDS = {
+    "a", "and", "of", "or", "to", "taste", "fresh", "frozen", "chopped", "diced", "sliced", "minced", "large", 
+    "small", "medium", "whole", "organic", "raw", "cup", "cups", "tbsp", "tsp", "tablespoon", "teaspoon", "oz", 
+    "ounce", "lb", "pound", "g", "kg", "ml", "l", "pkg", "package", "can", "jar", "pack", "low", "fat", "free",
+}
+
+# Ingredient words used to work out dietary flags when a recipe file has none
+RECIPE_MEAT_WORDS = {"beef", "pork", "chicken", "turkey", "lamb", "veal", "duck", "venison", "bacon", "ham", "sausage",
+                     "steak", "meat", "mince", "pepperoni", "salami", "prosciutto", "pancetta", "chorizo", "lard",
+                     "gelatin", "fish", "salmon", "tuna", "cod", "anchovy", "sardine", "trout", "tilapia"}
+RECIPE_PORK_WORDS = {"pork", "bacon", "ham", "prosciutto", "pancetta", "chorizo", "pepperoni", "salami", "lard"}
+RECIPE_SHELLFISH_WORDS = {"shrimp", "prawn", "crab", "lobster", "clam", "mussel", "oyster", "scallop", "squid"}
+RECIPE_ALCOHOL_WORDS = {"wine", "beer", "rum", "vodka", "brandy", "whiskey", "bourbon", "sherry", "liqueur", "gin"}
+RECIPE_DAIRY_WORDS = {"milk", "cheese", "butter", "cream", "yogurt", "yoghurt", "buttermilk", "ghee", "parmesan",
+                      "mozzarella", "cheddar", "ricotta"}
+RECIPE_EGG_WORDS = {"egg", "mayonnaise"}
+RECIPE_GLUTEN_WORDS = {"flour", "wheat", "bread", "breadcrumb", "pasta", "noodle", "spaghetti", "macaroni", "barley",
+                       "rye", "couscous", "cracker", "biscuit", "semolina"}
+RECIPE_NUT_WORDS = {"nut", "almond", "walnut", "pecan", "cashew", "pistachio", "hazelnut", "peanut", "macadamia"}
+
+# Words that make a different food when put in front of another ("peanut butter" is not butter)
+FOOD_MODIFIER_WORDS = RECIPE_MEAT_WORDS | RECIPE_SHELLFISH_WORDS | RECIPE_DAIRY_WORDS | RECIPE_NUT_WORDS | {
+    "coconut", "soy", "oat", "rice", "corn", "potato", "sweet", "sour", "apple", "orange", "lemon", "lime", "tomato",
+    "garlic", "onion", "chocolate", "vanilla", "maple", "egg", "baking", "vegetable", "chili", "pepper", "peach"}
+
+# Cuts that still count as the animal they come from ("chicken breast" covers "chicken")
+PRODUCT_CUT_WORDS = {"breast", "thigh", "drumstick", "wing", "leg", "fillet", "filet", "loin", "tenderloin", "chop",
+                     "rib", "shoulder"}
+
+# Singular form of one lowercase word ("tomatoes" -> "tomato", "berries" -> "berry")
+def singular(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+# Normalised ingredient name used as the index key ("Large Eggs" -> "egg", "Milk 2%" -> "milk")
+def ingredient_key(name):
+    words = [singular(word) for word in re.findall(r"[a-z]+", name.lower())]
+    return " ".join(word for word in words if word not in INGREDIENT_STOP_WORDS)
+
+# Index keys a product can stand in for
+def product_keys(name):
     """
-    Creates a set of buttons within a specified frame and assigns click functionality.
+    Works out which recipe ingredients a product can be used as.
 
-    This function generates a series of buttons based on predefined text labels (from `BUTTON_TEXTS`), 
-    places them in the specified frame, and binds each button to trigger the `on_button_click` 
-    function when clicked. The buttons are arranged in a single row within the frame. By default, 
-    the first button is given a preset size.
+    A product always matches its whole normalised name. It also matches its last word (the head 
+    noun, "greek yogurt" -> "yogurt") unless a word in front of it is a food itself, which makes 
+    it a different food: "peanut butter", "coconut milk" and "cream cheese" only match 
+    themselves. Meat cuts also match the animal ("chicken breast" -> "chicken").
 
     Args:
-        frame (Tkinter Frame): The frame where the buttons will be placed.
-        panel (Tkinter Frame): The panel that will be updated based on button clicks.
+        name (str): Product name.
 
     Returns:
-        list: A list of Tkinter button objects created within the frame.
+        set: Ingredient keys (see `ingredient_key()`).
     """
-    buttons = []
-    for i, text in enumerate(BUTTON_TEXTS):
-        # Set the button color based on the current theme
-        button_color = "lightgreen" if switch_value else "darkgreen" 
-        btn = tk.Button(frame, bg=button_color, text=text, height=HEIGHT, width=WIDTH,
-                        command=lambda i=i: on_button_click(i, buttons, panel))
-        btn.grid(row=1, column=i, sticky="s")
-        buttons.append(btn)
+    key = ingredient_key(name)
+    words = key.split()
+    keys = {key}
+    if len(words) > 1:
+        if not FOOD_MODIFIER_WORDS & set(words[:-1]):
+            keys.add(words[-1])
+        if words[-1] in PRODUCT_CUT_WORDS:
+            keys.add(" ".join(words[:-1]))
+    return keys - {""}
+
+# Dietary flags of a recipe, worked out conservatively from its ingredient keys
+def recipe_flags(keys):
+    words = {word for key in keys for word in key.split()}
+    meat = bool(words & RECIPE_MEAT_WORDS)
+    shellfish = bool(words & RECIPE_SHELLFISH_WORDS)
+    vegetarian = not meat and not shellfish
+    vegan = vegetarian and not words & (RECIPE_DAIRY_WORDS | RECIPE_EGG_WORDS | {"honey"})
+    return {
+        "Vegetarian": int(vegetarian),
+        "Vegan": int(vegan),
+        "Gluten": int(bool(words & RECIPE_GLUTEN_WORDS)),
+        "Lactose": int(bool(words & RECIPE_DAIRY_WORDS)),
+        "Eggs": int(bool(words & RECIPE_EGG_WORDS)),
+        "Nuts": int(bool(words & RECIPE_NUT_WORDS)),
+        # Whether meat was slaughtered accordingly is unknown, so only meat-free recipes qualify
+        "Halal": int(vegetarian and not words & RECIPE_ALCOHOL_WORDS),
+        "Kosher": int(vegetarian),
+    }
 
-    # Set the default button
-    buttons[0].config(height=HEIGHT, width=WIDTH)  
-    return buttons
+# Bit mask of a flags dictionary (bit order RECIPE_FLAGS)
+def diet_mask(flags):
+    return sum(int(bool(flags.get(flag))) << bit for bit, flag in enumerate(RECIPE_FLAGS))
 
-# Button Panel
-def create_panel(index, panel):
+# Read a list-valued recipe field: a JSON array (RecipeNLG) or one item per line
+def recipe_list(value):
+    value = (value or "").strip()
+    if value.startswith("["):
+        try:
+            return [str(item) for item in json.loads(value)]
+        except ValueError:
+            pass
+    return [line.strip() for line in value.splitlines() if line.strip()]
+
+# Import a recipe collection (CSV, optionally .gz) into the recipe database
+def import_recipes(path, conn=None, chunk_size=5000):
     """
-    Updates the content of the given panel based on the selected button index.
+    Loads recipes from a CSV file into the local recipe database and its ingredient index.
 
-    This function clears the existing content of the panel by destroying all its widgets. 
-    It then dynamically updates the panel's content based on the `index` of the selected button. 
-    Depending on the index, it calls one of the following functions:
-    - `add_prod(panel)`: Adds a new product (index 0).
-    - `update_prod(panel)`: Updates an existing product (index 1).
-    - `delete_prod(panel)`: Deletes an existing product (index 2).
-    - `search_prod(panel)`: Searches for a product (for any other index).
+    The columns follow the RecipeNLG dataset: `title` (or `name`), `NER` (or `ingredients`) with 
+    the plain ingredient names as a JSON array or one per line, and `directions` (or 
+    `instructions`). Dietary columns (`vegetarian`, `vegan`, `gluten`, ...) are used when present, 
+    otherwise `recipe_flags()` works them out from the ingredients. Like `import_catalog()`, the 
+    file is streamed and written `chunk_size` recipes per transaction. Recipes already in the 
+    collection (same name and ingredients) are skipped, so importing a file again adds only 
+    what is new.
+
+    Args:
+        path (str): Path of the CSV file.
+        conn (sqlite3.Connection, optional): Recipe connection. Defaults to `connect_recipes()`.
+        chunk_size (int): Recipes written per transaction.
+
+    Returns:
+        int: Number of recipes added.
+    """
+    own_conn = conn is None
+    conn = conn or connect_recipes()
+    csv.field_size_limit(sys.maxsize)
+    opener = gzip.open if path.endswith(".gz") else open
+    next_id = (conn.execute("SELECT MAX(id) FROM recipes").fetchone()[0] or 0) + 1
+    imported = 0
+
+    # Add a chunk; duplicates are ignored by idx_recipes_unique and their postings dropped with them
+    def write(recipes, postings):
+        with conn:
+            added = conn.executemany(f"INSERT OR IGNORE INTO recipes VALUES ({', '.join('?' * 12)})", recipes).rowcount
+            conn.executemany('''INSERT OR IGNORE INTO recipe_ingredients
+                                SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM recipes WHERE id = ?)''',
+                             [(*posting, posting[1]) for posting in postings])
+        return added
+
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    conn.execute("PRAGMA synchronous = OFF")  # Safe here: a failed import can simply be run again
+    try:
+        with opener(path, "rt", encoding="utf-8", errors="replace", newline="") as file:
+            recipes, postings = [], []
+            for record in csv.DictReader(file):
+                record = {key.strip().lower(): value for key, value in record.items() if key}
+                name = (record.get("title") or record.get("name") or "").strip()
+                keys = list(dict.fromkeys(filter(None, map(ingredient_key, recipe_list(record.get("ner") or record.get("ingredients"))))))
+                if not name or not keys:
+                    continue
+
+                flags = recipe_flags(keys)
+                for flag in RECIPE_FLAGS:
+                    if (record.get(flag.lower()) or "").strip() in ("0", "1"):
+                        flags[flag] = int(record[flag.lower()])
+                mask = diet_mask(flags)
+                instructions = "\n".join(recipe_list(record.get("directions") or record.get("instructions")))
+
+                recipes.append((next_id, name[:200], json.dumps(keys), instructions, *(flags[flag] for flag in RECIPE_FLAGS)))
+                postings.extend((key, next_id, len(keys), mask) for key in keys)
+                next_id += 1
+                if len(recipes) >= chunk_size:
+                    imported += write(recipes, postings)
+                    recipes, postings = [], []
+            if recipes:
+                imported += write(recipes, postings)
+    finally:
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+        if own_conn:
+            conn.close()
+    return imported
+
+# How soon a product should be used: 1 when it expires today, falling to 0 at EXPIRING_SOON_DAYS
+def expiry_urgency(expiration, today=None):
+    today = today or date.today()
+    try:
+        days_left = (datetime.strptime(expiration, "%m/%d/%y").date() - today).days
+    except (TypeError, ValueError):
+        return 0.0
+    return max(0.0, 1.0 - days_left / EXPIRING_SOON_DAYS) if EXPIRING_SOON_DAYS else 0.0
+
+# Masks of the flags a diet needs set and needs clear
+def diet_masks(diet):
+    return (diet_mask({flag: 1 for flag in diet if flag in RECIPE_REQUIRED_FLAGS}),
+            diet_mask({flag: 1 for flag in diet if flag in RECIPE_EXCLUDED_FLAGS}))
+
+# Rank recipes by how much of them the user's inventory covers
+@timed("match_recipes")
+def match_recipes(conn, recipes_conn, user_id=None, diet=(), limit=RECIPE_RESULTS):
+    """
+    Finds the recipes the user can (nearly) cook with what they have.
+
+    Only the inventory drives the work: each usable product is turned into ingredient keys 
+    (`product_keys()`), and the inverted index `recipe_ingredients` is read for just those keys, 
+    counting matches per recipe. Recipes the inventory does not touch are never read, so a 
+    100k-recipe collection costs no more than a small one for the same fridge.
+
+    Each recipe is scored by coverage (matched / total ingredients) plus RECIPE_URGENCY_WEIGHT 
+    times the average urgency of the ingredients it would use (products expiring soon score 
+    higher, see `expiry_urgency()`), so recipes that use up food before it goes off come first.
 
     Args:
-        index (int): The index of the clicked button, determining the panel content.
-        panel (Tkinter Frame): The panel where the dynamic content is displayed.
+        conn (sqlite3.Connection): Products database connection.
+        recipes_conn (sqlite3.Connection): Recipe database connection.
+        user_id (int, optional): Whose inventory to use. Defaults to the logged-in user.
+        diet (iterable): Names from RECIPE_FLAGS the user needs: required flags (e.g. "Vegan") 
+            must be set and excluded ones (e.g. "Nuts") clear, on both products and recipes.
+        limit (int): Number of recipes to return.
 
     Returns:
-        None
+        list: Dictionaries with "id", "name", "coverage", "matched", "total", "urgency", 
+        "missing" (ingredient keys not in the inventory) and "instructions", best first.
     """
-    for widget in panel.winfo_children():
-        widget.destroy()
-    if index == 0:      # Add new product
-        add_prod(panel)
-    elif index == 1:    # Update existing product
-        update_prod(panel)
-    elif index == 2:    # Delete existing product
-        delete_prod(panel)
-    else:               # Search for product
-        search_prod(panel)
+    user_id = logged_in_user_id if user_id is None else user_id
+    required, excluded = diet_masks(diet)
+    today = date.today()
 
-# Check for Special Characters
-def check_special_chars(entry):
+    # Ingredient keys the inventory can supply, with the most urgent product behind each
+    urgency = {}
+    for name, expiration, *flags in conn.execute('''SELECT name, expiration, vegetarian, vegan, gluten, lactose,
+                                                          eggs, nuts, halal, kosher
+                                                   FROM products WHERE user_id = ? AND quantity > 0''', (user_id,)):
+        mask = diet_mask(dict(zip(RECIPE_FLAGS, flags)))
+        if mask & required != required or mask & excluded:
+            continue
+        expires = iso_date(expiration)
+        if expires is not None and expires < today.isoformat():
+            continue  # Already expired: not something to cook with
+        score = expiry_urgency(expiration, today)
+        for key in product_keys(name or ""):
+            urgency[key] = max(urgency.get(key, 0.0), score)
+    if not urgency:
+        return []
+
+    # Walk the index for those keys only
+    matched = collections.Counter()
+    urgent = collections.Counter()
+    totals = {}
+    keys = list(urgency)
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        rows = recipes_conn.execute(f'''SELECT ingredient, recipe_id, ingredient_count, diet FROM recipe_ingredients
+                                        WHERE ingredient IN ({", ".join("?" * len(chunk))})''', chunk)
+        for ingredient, recipe_id, total, mask in rows:
+            if mask & required != required or mask & excluded:
+                continue
+            matched[recipe_id] += 1
+            urgent[recipe_id] += urgency[ingredient]
+            totals[recipe_id] = total
+
+    def score(recipe_id):
+        total = totals[recipe_id]
+        return min(matched[recipe_id], total) / total + RECIPE_URGENCY_WEIGHT * urgent[recipe_id] / total
+
+    best = heapq.nlargest(limit, matched, key=score)
+    if not best:
+        return []
+    details = {row[0]: row[1:] for row in recipes_conn.execute(
+        f"SELECT id, name, ingredients, instructions FROM recipes WHERE id IN ({', '.join('?' * len(best))})", best)}
+
+    results = []
+    for recipe_id in best:
+        name, ingredients, instructions = details[recipe_id]
+        total = totals[recipe_id]
+        results.append({
+            "id": recipe_id,
+            "name": name,
+            "coverage": min(matched[recipe_id], total) / total,
+            "matched": min(matched[recipe_id], total),
+            "total": total,
+            "urgency": urgent[recipe_id] / total,
+            "missing": [key for key in json.loads(ingredients) if key not in urgency],
+            "instructions": instructions,
+        })
+    return results
+
+# MM/DD/YY to YYYY-MM-DD in Python (None if malformed), matching iso_date_sql()
+def iso_date(value):
+    try:
+        return datetime.strptime(value, "%m/%d/%y").date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+# Let the user pick a recipe collection and import it without freezing the window
+def import_recipes_dialog(parent):
+    path = filedialog.askopenfilename(parent=parent, title="Import Recipes",
+                                      filetypes=[("Recipe CSV", "*.csv *.csv.gz"), ("All files", "*.*")])
+    if not path:
+        return
+
+    def on_done(count, error):
+        if error:
+            messagebox.showerror("Import Error", f"Could not import the recipes: {error}")
+        else:
+            messagebox.showinfo("Success", f"Imported {count} new recipes.")
+
+    # The worker thread needs its own connection (import_recipes opens and closes one)
+    run_in_background(parent, import_recipes, path, on_done=on_done)
+    messagebox.showinfo("Importing", "The recipes are being imported in the background. You can keep using the app.")
+
+# Snapshot products.db with SQLite's online backup API
+@timed("backup_database", kind="job")
+def backup_database(db_name=DB_NAME, backup_dir=None, compress=None, keep=BACKUP_KEEP, progress=None):
     """
-    Validates the content of a Tkinter entry widget for special characters.
+    Copies the live database to `backup_dir` without stopping the app.
 
-    This function retrieves the current content of the provided `entry` widget and uses a 
-    regular expression to check for the presence of special characters (anything that is 
-    not alphanumeric or a space). If any special characters are found, the background color 
-    of the entry widget is changed to light coral to indicate invalid input. If no special 
-    characters are found, the background is reset to white.
+    The copy is made with `Connection.backup()` in steps of BACKUP_PAGES_PER_STEP pages. The 
+    source connection holds a read transaction for the whole copy, so every step reads the same 
+    snapshot: in WAL mode this never blocks the writer thread, and the backup does not restart 
+    when the app commits in the meantime. The copy is written to a `.partial` file, synced to 
+    disk and then renamed, so an interrupted backup never replaces or looks like a good one.
 
     Args:
-        entry (Tkinter Entry): The entry widget whose content is being validated.
+        db_name (str): Database to back up.
+        backup_dir (str, optional): Where backups are kept. Defaults to BACKUP_DIR.
+        compress (bool, optional): Write `.db.zst` with zstandard. Defaults to True when the 
+            `zstandard` package is installed.
+        keep (int): Newest backups to keep; older ones are deleted.
+        progress (callable, optional): Called as `progress(copied_pages, total_pages)` after each step.
 
     Returns:
-        None
+        str: Path of the new backup file.
     """
-    content = entry.get()
-    # Check if there are any special characters in the content using regex
-    if re.search(r'[^a-zA-Z0-9 ]', content):  # Matches anything not alphanumeric or space
-        entry.config(bg="lightcoral")
+    if DB_BACKEND != "sqlite":
+        raise RuntimeError("Backups are only available with the SQLite backend; use pg_dump for PostgreSQL")
+    backup_dir = backup_dir or BACKUP_DIR
+    compress = zstandard is not None if compress is None else compress
+    if compress and zstandard is None:
+        raise RuntimeError("Compressed backups need the zstandard package (pip install zstandard)")
+    os.makedirs(backup_dir, exist_ok=True)
+
+    stem = os.path.splitext(os.path.basename(db_name))[0]
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(backup_dir, f"{stem}-{stamp}.db")
+    suffix = 1
+    while os.path.exists(path) or os.path.exists(path + ".zst"):
+        path = os.path.join(backup_dir, f"{stem}-{stamp}-{suffix}.db")
+        suffix += 1
+    partial = path + ".partial"
+
+    source = sqlite3.connect(db_name, timeout=DB_BUSY_TIMEOUT_S, isolation_level=None)
+    target = sqlite3.connect(partial)
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchall()  # Start the read snapshot
+
+        def step(status, remaining, total):
+            if progress:
+                progress(total - remaining, total)
+            time.sleep(BACKUP_STEP_PAUSE_S)
+
+        source.backup(target, pages=BACKUP_PAGES_PER_STEP, progress=step)
+        source.execute("COMMIT")
+    finally:
+        source.close()
+        target.close()
+
+    if compress:
+        with open(partial, "rb") as raw, open(path + ".zst.partial", "wb") as out:
+            zstandard.ZstdCompressor(level=3, threads=-1).copy_stream(raw, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.remove(partial)
+        partial, path = path + ".zst.partial", path + ".zst"
     else:
-        entry.config(bg="white")
-
-# Formating for date MM/DD/YY
-def format_date(entry_widget, event=None):
+        with open(partial, "rb+") as out:
+            os.fsync(out.fileno())
+    os.replace(partial, path)
+
+    # Rotate: keep the newest `keep` backups of this database
+    for old in list_backups(backup_dir, stem)[keep:]:
+        os.remove(old)
+
+    get_metrics_logger().info("backup path=%s bytes=%d", path, os.path.getsize(path))
+    return path
+
+# Backups of a database in a directory, newest first
+def list_backups(backup_dir=None, stem="products"):
+    backup_dir = backup_dir or BACKUP_DIR
+    if not os.path.isdir(backup_dir):
+        return []
+    names = [name for name in os.listdir(backup_dir)
+             if name.startswith(stem + "-") and name.endswith((".db", ".db.zst"))]
+    paths = [os.path.join(backup_dir, name) for name in names]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+# Make sure a backup is an intact FoodConnect database before it replaces the live one
+def check_backup(path, label=None):
     """
-    Formats the content of a Tkinter entry widget for date.
+    Rejects files that would leave the app without its data if they were restored.
 
-    This function retrieves the current content of the provided `entry` widget and uses a 
-    regular expression to check for the presence of non digit characters and incorrect formatting 
-    of the date. If any special characters, letters or incorrect format are found, the background 
-    color of the entry widget is changed to light coral to indicate invalid input. If no special 
-    characters are found, the background is reset to white. Once the `entry` has been made the 
-    formatting will be updated to match: MM/DD/YY
+    The file must pass `PRAGMA quick_check` and have the app's `users` table and a `products` 
+    table with every column the app reads.
 
     Args:
-        entry (Tkinter Entry): The entry widget whose content is being validated and formatted.
+        path (str): Uncompressed SQLite file.
+        label (str, optional): Name to use in error messages. Defaults to `path`.
 
     Returns:
         None
-    """
-    content = entry_widget.get()
-    clean_content = content.replace("-", "").replace("/", "")
-
-    if len(clean_content) == 6 and clean_content.isdigit():
-        formatted_date = clean_content[:2] + "/" + clean_content[2:4] + "/" + clean_content[4:]
-        entry_widget.delete(0, tk.END)
-        entry_widget.insert(0, formatted_date)
-        entry_widget.config(bg="white")
-    elif content:
-        entry_widget.config(bg="lightcoral")
 
-# Check Quantity is larger than 0 and an integer
-def validate_qty(qty):
+    Raises:
+        sqlite3.DatabaseError: The file is damaged or is not a FoodConnect database.
     """
-    Validates a quantity value.
+    label = label or path
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"{label} does not exist")
+    source = sqlite3.connect(path)
+    try:
+        if source.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+            raise sqlite3.DatabaseError(f"{label} is damaged; the database was not changed")
+        tables = {row[0] for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = [f"table {table}" for table in ("users", "products") if table not in tables]
+        if "products" in tables:
+            columns = {row[1] for row in source.execute("PRAGMA table_info(products)")}
+            expected = [column.strip().strip('"') for column in PRODUCT_COLUMNS.split(",")] + ["id"]
+            missing += [f"products.{column}" for column in expected if column not in columns]
+        if missing:
+            raise sqlite3.DatabaseError(f"{label} is not a FoodConnect backup (no {', '.join(missing)}); "
+                                        "the database was not changed")
+    finally:
+        source.close()
+
+# Replace the contents of the live database with a backup
+def restore_database(backup_path, db_name=DB_NAME, backup_dir=None, keep_copy=True):
+    """
+    Restores a backup made by `backup_database()` into the live database.
 
-    This function checks whether the provided `qty` is a string representing a digit and 
-    ensures it is greater than 0.
+    Compressed backups are first decompressed to a temporary file, and every backup is checked 
+    with `check_backup()` before anything is changed. Unless `keep_copy` is False, the current 
+    database is then backed up to `before-restore/` inside the backups folder, so the restore 
+    can be undone. That folder has its own rotation, so the file being restored is never 
+    rotated away.
+
+    The pages are copied with the backup API in a single step, so the restore is atomic: other 
+    connections see either the old database or the restored one. When the app's writer thread 
+    is running, the restore runs as one of its jobs, so no write can interleave. The change 
+    counter (`data_version()`) of every user with products before or after the restore is moved 
+    past its old value, so open inventory caches reload.
 
     Args:
-        entry (Tkinter Entry): The quantity value to be validated.
+        backup_path (str): A `.db` or `.db.zst` backup file.
+        db_name (str): Database to overwrite.
+        backup_dir (str, optional): Backups folder for the copy of the current data. Defaults 
+            to BACKUP_DIR.
+        keep_copy (bool): Back up the current database before overwriting it.
 
     Returns:
-        bool: True if the quantity is a positive integer, False otherwise.
+        str: Path of the copy of the replaced data, or None if none was made.
     """
-    return qty.isdigit() and int(qty) > 0
+    if DB_BACKEND != "sqlite":
+        raise RuntimeError("Backups are only available with the SQLite backend; use pg_restore for PostgreSQL")
+    label = backup_path
+    temp_path = None
+    if backup_path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("Restoring a compressed backup needs the zstandard package (pip install zstandard)")
+        handle, temp_path = tempfile.mkstemp(suffix=".db")
+        with open(backup_path, "rb") as packed, os.fdopen(handle, "wb") as out:
+            zstandard.ZstdDecompressor().copy_stream(packed, out)
+        backup_path = temp_path
+
+    def restore(conn):
+        source = sqlite3.connect(backup_path)
+        try:
+            versions = {}
+            for query in ("SELECT DISTINCT user_id, 0 FROM products", "SELECT user_id, version FROM data_versions"):
+                try:
+                    versions.update(conn.execute(query))
+                except sqlite3.OperationalError:
+                    pass  # Not an app database yet, or one from before the counters were per user
+            source.backup(conn, pages=-1)
+        finally:
+            source.close()
+        create_data_version(conn)  # Backups made by older versions have no counters
+        with conn:
+            # Move the counter of every user with products before or after the restore past its old value
+            conn.execute('''INSERT INTO data_versions (user_id, version)
+                            SELECT DISTINCT coalesce(user_id, ''), 0 FROM products WHERE 1
+                            ON CONFLICT (user_id) DO NOTHING''')
+            conn.execute("UPDATE data_versions SET version = version + 1")
+            conn.executemany('''INSERT INTO data_versions (user_id, version) VALUES (coalesce(?, ''), ?)
+                                ON CONFLICT (user_id) DO UPDATE SET version = MAX(version, excluded.version)''',
+                             [(user_id, version + 1) for user_id, version in versions.items()])
 
-# Load Products
-def load_prod(conn):
-    """
-    Loads the list of products from the database for the logged-in user.
+    try:
+        check_backup(backup_path, label)
+        copy = None
+        if keep_copy and os.path.exists(db_name):
+            copy = backup_database(db_name, os.path.join(backup_dir or BACKUP_DIR, "before-restore"))
+
+        writer = get_writer() if db_name == DB_NAME else None
+        if writer is None:
+            target = sqlite3.connect(db_name, timeout=DB_BUSY_TIMEOUT_S)
+            try:
+                restore(target)
+            finally:
+                target.close()
+        else:
+            writer.submit(restore, transaction=False).result()
+        return copy
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+# Tools > Back Up Database
+def backup_dialog(parent):
+    def on_done(path, error):
+        if error:
+            messagebox.showerror("Backup Error", f"Could not back up the database: {error}")
+        else:
+            messagebox.showinfo("Backup Complete", f"Saved a backup to:\n{path}")
 
-    Args:
-        conn (sqlite3.Connection): SQLite connection object.
+    run_in_background(parent, backup_database, on_done=on_done)
+    messagebox.showinfo("Backing Up", "The database is being backed up in the background. You can keep using the app.")
 
-    Returns:
-        list: A list of products from the database.
-    """
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM products")
-    rows = cur.fetchall()
+# Tools > Restore Database
+def restore_dialog(parent):
+    path = filedialog.askopenfilename(parent=parent, title="Restore Backup", initialdir=BACKUP_DIR,
+                                      filetypes=[("FoodConnect backups", "*.db *.db.zst"), ("All files", "*.*")])
+    if not path:
+        return
+    if not messagebox.askyesno("Restore Backup", f"Replace all current data with the backup\n{os.path.basename(path)}?\n\n"
+                               "Changes made since the backup will be lost. A copy of the current data is saved to "
+                               "the before-restore folder first."):
+        return
 
-    # Format the results into a list of dictionaries for easier usage in the GUI
-    products = []
-    for row in rows:
-        product = {
-            "Name": row[0],
-            "Quantity": row[1],
-            "Group": row[2],
-            "Exp": row[3],
-            "Add": row[4],
-            "User": logged_in_user_id,
-            "Info": {
-                "Vegetarian": row[6],
-                "Vegan": row[7],
-                "Gluten": row[8],
-                "Lactose": row[9],
-                "Eggs": row[10],
-                "Nuts": row[11],
-                "Halal": row[12],
-                "Kosher": row[13]
-            }
-        }
-        products.append(product)
-    
-    return products
+    def on_done(copy, error):
+        if error:
+            messagebox.showerror("Restore Error", f"Could not restore the backup: {error}")
+        else:
+            messagebox.showinfo("Restore Complete", "The backup was restored. Reopen a panel to see the restored data."
+                                f"\n\nThe data it replaced was saved to:\n{copy}")
 
-def check_stock(conn):
-    cur = conn.cursor()
-    
-    # Get today's date and calculate the date 10 days from now
-    today = date.today()
-    ten_days_later = today + timedelta(days=10)
-    
-    # Check for products with low stock (quantity <= 3)
-    cur.execute("SELECT name, quantity FROM products WHERE quantity <= 3")
-    low_stock = cur.fetchall()
-    
-    # Format the date range for comparison (in mm/dd/yy format)
-    today_str = today.strftime('%m/%d/%y')
-    ten_days_later_str = ten_days_later.strftime('%m/%d/%y')
-    
-    # Check for products with expiration dates within the next 10 days
-    cur.execute("""
-        SELECT name, expiration 
-        FROM products 
-        WHERE expiration >= ? 
-        AND expiration <= ?
-    """, (today_str, ten_days_later_str))
-    expiring_items = cur.fetchall()
-    
-    # Prepare messages
-    message = ""
-    
-    if low_stock:
-        message += "The following items are low in stock:\n"
-        message += "\n".join([f"{item[0]} (Quantity: {item[1]})" for item in low_stock]) + "\n"
+    run_in_background(parent, restore_database, path, on_done=on_done)
 
-    if expiring_items:
-        message += "\nThe following items are expiring soon (within 10 days):\n"
-        message += "\n".join([f"{item[0]} (Expiration: {item[1]})" for item in expiring_items]) + "\n"
-    
-    # Display message(s)
-    if message:
-        messagebox.showwarning("Stock and Expiry Alert", message)
-    else:
-        messagebox.showinfo("Stock Status", "All items have sufficient stock and no items are expiring soon.")
+# Tools > Compact Database
+def compact_dialog(parent):
+    if not messagebox.askyesno("Compact Database", "Rebuild products.db so that purged products give their space back "
+                               "to the disk from now on?\n\nThis is needed once for databases made by older versions. "
+                               "It can take several minutes on a large database, and saving changes waits until it finishes."):
+        return
+
+    def on_done(rebuilt, error):
+        if error:
+            messagebox.showerror("Compact Error", f"Could not compact the database: {error}")
+        elif rebuilt:
+            messagebox.showinfo("Compact Complete", "The database was rebuilt. Purges now return free space to the disk.")
+        else:
+            messagebox.showinfo("Compact Database", "The database is already set up to return free space; nothing to do.")
 
+    run_in_background(parent, compact_database, on_done=on_done)
 
 # Add New Product
+@timed("panel.add_prod")
 def add_prod(panel):
     """
     Creates a form in the provided panel to add a new product with various details.
@@ -808,6 +5420,14 @@ def add_prod(panel):
     instructions = tk.Label(sub_frame, text="Fill in the information for the NEW product.", bg=sub_frame.cget('bg'))
     instructions.grid(row=0, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
 
+    # Barcode lookup (fills in the form from the local catalog)
+    barcode_frame = tk.Frame(sub_frame, bg=sub_frame.cget('bg'))
+    barcode_frame.grid(row=0, column=2, padx=5, pady=5, sticky=tk.E)
+    barcode_label = tk.Label(barcode_frame, text="Barcode:", bg=sub_frame.cget('bg'))
+    barcode_label.pack(side=tk.LEFT)
+    barcode_input = tk.Entry(barcode_frame, width=15)
+    barcode_input.pack(side=tk.LEFT, padx=5)
+
     # Product Name Input
     prod_name_label = tk.Label(sub_frame, text="Product Name:", bg=sub_frame.cget('bg'))
     prod_name_label.grid(row=1, column=0, padx=5, pady=5, sticky=tk.E)
@@ -901,28 +5521,45 @@ def add_prod(panel):
             messagebox.showerror("Input Error", "Quantity must be a positive number.")
             return
 
-        conn = connect_db()
-        cur = conn.cursor()
-
-        # Insert into the database
-        cur.execute('''INSERT INTO products 
-                       (name, quantity, "group", expiration, "add", user_id, vegetarian, vegan, gluten, lactose, eggs, nuts, halal, kosher)
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                    (name, quantity, group, exp_date, add_date, logged_in_user_id,
-                     nutritional_info["Vegetarian"], nutritional_info["Vegan"], nutritional_info["Gluten"],
-                     nutritional_info["Lactose"], nutritional_info["Eggs"], nutritional_info["Nuts"],
-                     nutritional_info["Halal"], nutritional_info["Kosher"]))
+        # Insert into the database (and the user's inventory cache) without waiting on the writer
+        def added(product_id, error):
+            if error is not None:
+                messagebox.showerror("Error", f"Could not add the product: {error}")
+                if submit_btn.winfo_exists():
+                    submit_btn.config(state=tk.NORMAL)
+                return
+            messagebox.showinfo("Success", "Product added successfully!")
+            if sub_frame.winfo_exists():
+                sub_frame.destroy()
+
+        submit_btn.config(state=tk.DISABLED)  # One submit per product
+        get_inventory().add(Product(name, int(quantity), group, exp_date, add_date, logged_in_user_id, nutritional_info),
+                            widget=root, on_done=added)
+
+    # Fill the form from the catalog entry for the scanned/typed barcode
+    def fill_from_barcode(event=None):
+        product = lookup_barcode(barcode_input.get())
+        if product is None:
+            messagebox.showwarning("Not Found", "That barcode is not in the product catalog.")
+            return
+        prod_name_input.delete(0, tk.END)
+        prod_name_input.insert(0, product["Name"])
+        var1.set(product["Group"])
+        for flag, value in product["Info"].items():
+            nutrition_vars[flag].set(value)
+        qty_input.focus_set()
 
-        conn.commit()
-        messagebox.showinfo("Success", "Product added successfully!")
-        sub_frame.destroy()
+    barcode_input.bind("<Return>", fill_from_barcode)
+    lookup_btn = tk.Button(barcode_frame, text="Lookup", command=profiled("add_prod.lookup", fill_from_barcode))
+    lookup_btn.pack(side=tk.LEFT)
 
-    submit_btn = tk.Button(sub_frame, text="Submit", command=store)
+    submit_btn = tk.Button(sub_frame, text="Submit", command=profiled("add_prod.store", store))
     submit_btn.grid(row=13, column=1, padx=5, pady=5)
 
     return
 
 # Update Existing Product 
+@timed("panel.update_prod")
 def update_prod(panel):
     """
     Provides a GUI form to update an existing product's details.
@@ -946,21 +5583,18 @@ def update_prod(panel):
     Returns:
         None
     """
-    products = load_prod(connect_db())
-
-    # Looks for the product
-    def get_prod_data(name, exp, products):
-        for product in products:
-            if product["Name"] == name and product["Exp"] == exp:
-                return product
-        return None  # Return None if product is not found
+    inventory = get_inventory()
 
+    # Id of the product currently in the form
+    grabbed = {"id": None}
 
-    # Get the selected product name from the listbox
-    def on_select(event):
-        selection = event.widget.curselection()
-        if selection:
-            selected_name = event.widget.get(selection[0])  # Get the selected name
+    # Looks for the product by id: cached record first, then a primary key fetch
+    def get_prod_data(product_id):
+        product = inventory.get(product_id)
+        if product is None:
+            row = Product.load_by_id(inventory.conn, product_id)
+            product = product_record(row) if row else None
+        return product  # None if product is not found
 
     # Prints the selected product's information 
     def grab_data():
@@ -978,7 +5612,9 @@ def update_prod(panel):
         kosher_var.set(0)
         date_entry.delete(0, tk.END)
         add_entry.delete(0, tk.END)
+        user_id_input.config(state='normal')
         user_id_input.delete(0, tk.END)
+        grabbed["id"] = None
         
         # Clear the product name, expiration date, and date added
         prod_name_input.config(state='normal')  # Enable the input field for product name
@@ -988,16 +5624,16 @@ def update_prod(panel):
         add_entry.config(state='normal')  # Enable the add date field
         add_entry.delete(0, tk.END)
         
-        selection = users_listbox.curselection()  # Get current selection
+        selection = product_grid.selected_ids()  # Get current selection
         if not selection:
             messagebox.showwarning("No Selection", "Please select a product to grab.")
             return
         
-        selected = users_listbox.get(selection[0])  # Get the selected name
-        selected = selected.split(" ")
-        product = get_prod_data(selected[0], selected[1], products)
+        product = get_prod_data(selection[0])
         
         if product:
+            grabbed["id"] = product["Id"]
+
             # Populate the text field with the product's name
             prod_name_input.insert(0, product["Name"])
             prod_name_input.config(state='readonly')  # Make the name field readonly
@@ -1062,29 +5698,20 @@ def update_prod(panel):
             messagebox.showerror("Invalid Input", "Please enter a valid quantity (numeric).")
             return
 
-        # Connect to the database
-        try:
-            conn = connect_db()
-            cur = conn.cursor()
-
-            # Update the product in the database
-            cur.execute('''UPDATE products 
-                        SET quantity = ?, "group" = ?, expiration = ?, "add" = ?, user_id = ?, 
-                            vegetarian = ?, vegan = ?, gluten = ?, lactose = ?, eggs = ?, nuts = ?, halal = ?, kosher = ?
-                        WHERE name = ? AND expiration = ?''',
-                        (quantity, group, exp_date, add_date, user_id, 
-                        nutritional_info["Vegetarian"], nutritional_info["Vegan"], nutritional_info["Gluten"], 
-                        nutritional_info["Lactose"], nutritional_info["Eggs"], nutritional_info["Nuts"], 
-                        nutritional_info["Halal"], nutritional_info["Kosher"],
-                        name, exp_date))
-
-            conn.commit()
-            messagebox.showinfo("Success", "Product updated successfully!")
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
-        finally:
-            conn.close() 
+        existing = get_prod_data(grabbed["id"]) if grabbed["id"] is not None else None
+        if existing is None:
+            messagebox.showerror("Error", "Product not found. Grab a product from the list first.")
+            return
+
+        def updated(result, error):
+            if error is not None:
+                messagebox.showerror("Error", f"An error occurred: {str(error)}")
+            else:
+                messagebox.showinfo("Success", "Product updated successfully!")
+
+        # Update the product in the database (and the user's inventory cache) without waiting on the writer
+        inventory.update(Product(name, quantity, group, exp_date, add_date, user_id, nutritional_info, existing["Id"]),
+                         widget=root, on_done=updated)
 
     # Divide screen
     main_pane = tk.PanedWindow(panel, orient=tk.HORIZONTAL, bg=panel.cget('bg'))
@@ -1098,14 +5725,16 @@ def update_prod(panel):
     grab_button = tk.Button(left_frame, text="Click to Grab Information", command=grab_data)
     grab_button.pack(pady=10, padx=10)
 
-    # Screen to display the products
-    users_listbox = tk.Listbox(left_frame)
-    users_listbox.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
-    users_listbox.bind("<<ListboxSelect>>", on_select) 
+    # Screen to display the products (click a header to sort, Shift/Ctrl-click selects several for batch edits)
+    product_grid = ProductGrid(left_frame, inventory.conn, inventory.user_id, columns=("name", "exp"))
+    product_grid.tree.column("name", width=110)
+    product_grid.frame.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
 
     # Existing Product Information
-    for prod in products:
-        users_listbox.insert(tk.END, str(prod["Name"] + " " + prod["Exp"]))
+    def refresh_list():
+        product_grid.reload()
+
+    refresh_list()
 
     # Right side = Product Information
     right_frame = tk.Frame(main_pane, bg=panel.cget('bg'))
@@ -1180,12 +5809,66 @@ def update_prod(panel):
     user_id_input.bind("<FocusOut>", lambda event, entry=user_id_input: check_special_chars(entry))
 
     # Update button
-    update_btn = tk.Button(sub_frame, text="Update", command=store)
+    update_btn = tk.Button(sub_frame, text="Update", command=profiled("update_prod.store", store))
     update_btn.grid(row=13, column=1, padx=5, pady=5)
 
+    # Batch edit for every product selected in the list
+    batch_frame = tk.LabelFrame(right_frame, text="Batch Edit Selected", bg=right_frame.cget('bg'))
+    batch_frame.pack(pady=5, padx=5)
+
+    no_change = "(no change)"
+    tk.Label(batch_frame, text="Qty +/-:", bg=batch_frame.cget('bg')).grid(row=0, column=0, padx=5, pady=5, sticky=tk.E)
+    qty_delta_input = tk.Entry(batch_frame, width=5)
+    qty_delta_input.grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
+
+    tk.Label(batch_frame, text="Group:", bg=batch_frame.cget('bg')).grid(row=0, column=2, padx=5, pady=5, sticky=tk.E)
+    batch_group = tk.StringVar(master=root, value=no_change)
+    tk.OptionMenu(batch_frame, batch_group, no_change, *food_groups).grid(row=0, column=3, padx=5, pady=5, sticky=tk.W)
+
+    tk.Label(batch_frame, text="Exp +/- days:", bg=batch_frame.cget('bg')).grid(row=1, column=0, padx=5, pady=5, sticky=tk.E)
+    exp_shift_input = tk.Entry(batch_frame, width=5)
+    exp_shift_input.grid(row=1, column=1, padx=5, pady=5, sticky=tk.W)
+
+    tk.Label(batch_frame, text="Set:", bg=batch_frame.cget('bg')).grid(row=1, column=2, padx=5, pady=5, sticky=tk.E)
+    batch_flag = tk.StringVar(master=root, value=no_change)
+    tk.OptionMenu(batch_frame, batch_flag, no_change, *check_vars.keys()).grid(row=1, column=3, padx=5, pady=5, sticky=tk.W)
+    batch_flag_value = tk.StringVar(master=root, value="On")
+    tk.OptionMenu(batch_frame, batch_flag_value, "On", "Off").grid(row=1, column=4, padx=5, pady=5, sticky=tk.W)
+
+    def apply_batch():
+        selected_ids = product_grid.selected_ids()
+        if not selected_ids:
+            messagebox.showwarning("No Selection", "Select one or more products in the list first.")
+            return
+
+        try:
+            qty_delta = int(qty_delta_input.get() or 0)
+            exp_shift = int(exp_shift_input.get() or 0)
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Quantity and expiration changes must be whole numbers (e.g. -2).")
+            return
+
+        group = food_groups.index(batch_group.get()) + 1 if batch_group.get() != no_change else None
+        flag = batch_flag.get() if batch_flag.get() != no_change else None
+        def applied(count, error):
+            if error is not None:
+                messagebox.showerror("Error", f"Could not update the products: {error}")
+                return
+            # One refresh for the whole batch
+            if product_grid.frame.winfo_exists():
+                refresh_list()
+            messagebox.showinfo("Success", f"Updated {count} products.")
+
+        batch_edit_products(inventory, selected_ids, qty_delta, group, flag, int(batch_flag_value.get() == "On"),
+                            exp_shift, widget=root, on_done=applied)
+
+    apply_btn = tk.Button(batch_frame, text="Apply to Selected", command=profiled("update_prod.apply_batch", apply_batch))
+    apply_btn.grid(row=0, column=4, padx=5, pady=5)
+
     return
 
 # Delete Existing Product
+@timed("panel.delete_prod")
 def delete_prod(panel):
     """
     Creates a GUI interface in the provided panel to search for and delete products from the SQLite database.
@@ -1196,59 +5879,91 @@ def delete_prod(panel):
     Returns:
         None
     """
-    conn = connect_db()
+    inventory = get_inventory()
 
-    # Function to refresh the listbox with current products
+    # Function to refresh the grid with current products
     def refresh_listbox():
-        users_listbox.delete(0, tk.END)  # Clear the current listbox
-        cur = conn.cursor()
-        cur.execute("SELECT name, expiration FROM products")
-        products = cur.fetchall()
-
-        for product in products:
-            # Use a clear delimiter (e.g., '|') for display
-            display_text = f"{product[0]} | {product[1]}"
-            users_listbox.insert(tk.END, display_text)
+        product_grid.reload()
 
-    # Function to find a product by name
+    # Function to find a product by name (similar names, found on a worker thread, when nothing contains the text)
     def find_by_name():
-        search_query = search_entry.get().lower()
-        users_listbox.delete(0, tk.END)
-        cur = conn.cursor()
-        cur.execute("SELECT name, expiration FROM products WHERE name LIKE ?", ('%' + search_query + '%',))
-        results = cur.fetchall()
-
-        for result in results:
-            # Display product name and expiration date in the listbox
-            display_text = f"{result[0]} | {result[1]}"
-            users_listbox.insert(tk.END, display_text)
-
-    # Function to remove the selected product
+        term = search_entry.get()
+        product_grid.load(term)
+        if product_grid.loaded() or not term.strip():
+            status_label.config(text="")
+            return
+        status_label.config(text="No exact matches. Looking for similar names...")
+
+        def show_similar(rows, error):
+            if not sub_frame.winfo_exists() or search_entry.get() != term:
+                return  # Panel closed, or a newer search replaced this one
+            if error:
+                status_label.config(text=f"Could not search similar names: {error}")
+                return
+            product_grid.show(rows)
+            status_label.config(text="No exact matches. Similar names:" if rows else "No products found.")
+
+        run_in_background(sub_frame, fuzzy_search_job, term, inventory.user_id, on_done=show_similar)
+
+    # Function to list products that look like duplicates of each other, group by group
+    def find_duplicates():
+        status_label.config(text="Looking for duplicates...")
+        duplicates_btn.config(state=tk.DISABLED)
+
+        # The worker thread needs its own connection
+        def work():
+            conn = connect_db()
+            try:
+                return duplicate_suggestions(conn, inventory.user_id)
+            finally:
+                conn.close()
+
+        def show(groups, error):
+            if not sub_frame.winfo_exists():
+                return
+            duplicates_btn.config(state=tk.NORMAL)
+            if error:
+                status_label.config(text=f"Could not look for duplicates: {error}")
+                return
+            product_grid.show([row for group in groups for row in group])
+            status_label.config(text=f"{len(groups)} groups of similar names. Select the extras and press Delete."
+                                if groups else "No likely duplicates found.")
+
+        run_in_background(sub_frame, work, on_done=show)
+
+    # Function to remove the selected products
     def remove_selected():
-        selected_text = users_listbox.get(tk.ACTIVE)
-        if not selected_text:
+        selected_ids = product_grid.selected_ids()
+        if not selected_ids:
             messagebox.showwarning("Selection Error", "No product selected!")
             return
 
-        # Extract the product name and expiration date from the selected text
-        try:
-            selected_product, selected_expiration = selected_text.split(" | ")
-        except ValueError:
-            messagebox.showerror("Parsing Error", "Could not parse the selected product. Please try again.")
-            return
+        # Another window or the purge job may have deleted some of them since the grid was loaded
+        existing = [product_id for product_id in selected_ids if inventory.get(product_id) is not None]
+        if len(existing) < len(selected_ids):
+            refresh_listbox()
+            if not existing:
+                messagebox.showwarning("Product Not Found", "The selected product no longer exists. It may have been deleted elsewhere.")
+                return
+        selected_ids = existing
 
         # Confirm deletion
-        response = messagebox.askyesno(
-            "Delete Confirmation",
-            f"Are you sure you want to delete '{selected_product}' with expiration date '{selected_expiration}'?"
-        )
-        if response:
-            cur = conn.cursor()
-            cur.execute("DELETE FROM products WHERE name = ? AND expiration = ?", (selected_product, selected_expiration))
-            conn.commit()
-
-            messagebox.showinfo("Success", f"Product '{selected_product}' with expiration date '{selected_expiration}' deleted successfully!")
-            refresh_listbox()
+        if len(selected_ids) == 1:
+            product = inventory.get(selected_ids[0])
+            question = f"Are you sure you want to delete '{product['Name']}' with expiration date '{product['Exp']}'?"
+        else:
+            question = f"Are you sure you want to delete the {len(selected_ids)} selected products?"
+
+        def deleted(result, error):
+            if error is not None:
+                messagebox.showerror("Error", f"Could not delete the products: {error}")
+                return
+            messagebox.showinfo("Success", f"Deleted {len(selected_ids)} product(s) successfully!")
+            if product_grid.frame.winfo_exists():
+                refresh_listbox()
+
+        if messagebox.askyesno("Delete Confirmation", question):
+            inventory.delete_many(selected_ids, widget=root, on_done=deleted)
 
     # Layout for delete
     sub_frame = tk.Frame(panel, bg=panel.cget('bg'))
@@ -1260,36 +5975,45 @@ def delete_prod(panel):
     search_entry = tk.Entry(sub_frame)
     search_entry.grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
 
-    search_btn = tk.Button(sub_frame, text="Search", command=find_by_name)
+    search_btn = tk.Button(sub_frame, text="Search", command=profiled("delete_prod.find_by_name", find_by_name))
     search_btn.grid(row=1, column=1, padx=5, pady=5)
 
-    # Listbox to display the search results
-    users_listbox = tk.Listbox(sub_frame, height=10, width=50)
-    users_listbox.grid(row=2, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
+    duplicates_btn = tk.Button(sub_frame, text="Find Duplicates", command=profiled("delete_prod.find_duplicates", find_duplicates))
+    duplicates_btn.grid(row=1, column=2, padx=5, pady=5)
+
+    status_label = tk.Label(sub_frame, text="", bg=sub_frame.cget('bg'))
+    status_label.grid(row=2, column=0, columnspan=3, padx=5, sticky=tk.W)
 
-    # Populate the Listbox with all products initially
+    # Grid to display the search results (click a header to sort, Shift/Ctrl-click selects several)
+    product_grid = ProductGrid(sub_frame, inventory.conn, inventory.user_id, height=12)
+    product_grid.frame.grid(row=3, column=0, columnspan=3, padx=5, pady=5, sticky=tk.W)
+
+    # Populate the grid with all products initially
     refresh_listbox()
 
     # Delete button
-    delete_btn = tk.Button(sub_frame, text="Delete", command=remove_selected)
-    delete_btn.grid(row=3, column=0, columnspan=2, padx=5, pady=5)
+    delete_btn = tk.Button(sub_frame, text="Delete", command=profiled("delete_prod.remove_selected", remove_selected))
+    delete_btn.grid(row=4, column=0, columnspan=3, padx=5, pady=5)
 
     return
 
 # Search for Product
+@timed("panel.search_prod")
 def search_prod(panel):
     """
     Creates a GUI interface in the provided panel to search for and display product information.
 
     This function allows users to search for products by name and displays the results in a 
-    formatted text area. Users can input part or the full name of a product, and the matching 
+    sortable grid. Users can input part or the full name of a product, and the matching 
     products are displayed with details such as product name, quantity, food group, and any relevant 
     nutritional information (e.g., vegetarian, vegan, etc.).
 
     Key Features:
-    - Search by product name.
+    - Search by product name; when no name contains the text, the closest names are shown 
+      instead (`fuzzy_search()`), so typos like "Mlk" still find "Milk".
     - Display of product details including quantity, food group, and nutritional information.
-    - Results are shown in a text widget in the panel.
+    - Results are shown in a `ProductGrid`: click a header to sort, rows load as you scroll.
+    - Optionally includes products moved to the archive database.
 
     Args:
         panel (Tkinter Frame): The frame where the search form and results will be displayed.
@@ -1299,33 +6023,25 @@ def search_prod(panel):
     """
     conn = connect_db()
 
-    # Function to display search results
-    def display_results(filtered_products):
-        result_text.delete('1.0', tk.END)
-        if filtered_products:
-            for prod in filtered_products:
-                group_name = food_groups[prod[2] - 1]  # Assuming group is an index starting from 1
-                nutritional_info_str = ", ".join([key for key, value in {
-                    "Vegetarian": prod[6],
-                    "Vegan": prod[7],
-                    "Gluten": prod[8],
-                    "Lactose": prod[9],
-                    "Eggs": prod[10],
-                    "Nuts": prod[11],
-                    "Halal": prod[12],
-                    "Kosher": prod[13]
-                }.items() if value == 1]) or "None"
-                result_text.insert(tk.END, f"{prod[0]} - {prod[1]} QTY - {group_name} - {nutritional_info_str}\n Expiration: {prod[3]} - Added: {prod[4]} - User ID: {prod[5]}\n")
-        else:
-            result_text.insert(tk.END, "No products found.\n")
-
-    # Function to search by name
+    # Function to search by name, falling back to similar names (found on a worker thread) when nothing contains the text
     def search_by_name():
-        search_query = name_entry.get().lower()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM products WHERE name LIKE ?", ('%' + search_query + '%',))
-        filtered_products = cur.fetchall()
-        display_results(filtered_products)
+        term = name_entry.get()
+        product_grid.load(term, include_archive.get() == 1)
+        if product_grid.loaded() or not term.strip():
+            result_label.config(text="Search Results:" if product_grid.loaded() else "No products found.")
+            return
+        result_label.config(text="No exact matches. Looking for similar names...")
+
+        def show_similar(rows, error):
+            if not top_frame.winfo_exists() or name_entry.get() != term:
+                return  # Panel closed, or a newer search replaced this one
+            if error:
+                result_label.config(text=f"Could not search similar names: {error}")
+                return
+            product_grid.show(rows)
+            result_label.config(text="No exact matches. Similar names:" if rows else "No products found.")
+
+        run_in_background(top_frame, fuzzy_search_job, term, logged_in_user_id, on_done=show_similar)
 
     # Layout for search options
     top_frame = tk.Frame(panel, bg=panel.cget('bg'))
@@ -1338,9 +6054,40 @@ def search_prod(panel):
     name_entry = tk.Entry(top_frame)
     name_entry.grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
 
-    search_name_btn = tk.Button(top_frame, text="Search", command=search_by_name)
+    # Search as the user types, once they pause for SEARCH_DEBOUNCE_MS
+    pending_search = None
+
+    def schedule_search(event=None):
+        nonlocal pending_search
+        if pending_search is not None:
+            name_entry.after_cancel(pending_search)
+        pending_search = name_entry.after(SEARCH_DEBOUNCE_MS, run_search)
+
+    def run_search():
+        nonlocal pending_search
+        pending_search = None
+        search_by_name()
+
+    # A search still pending when the panel closes would run against destroyed widgets
+    def cancel_search(event=None):
+        nonlocal pending_search
+        if pending_search is not None:
+            name_entry.after_cancel(pending_search)
+            pending_search = None
+
+    if SEARCH_DEBOUNCE_MS:
+        name_entry.bind("<KeyRelease>", schedule_search)
+        name_entry.bind("<Destroy>", cancel_search)
+    name_entry.bind("<Return>", lambda event: search_by_name())
+
+    search_name_btn = tk.Button(top_frame, text="Search", command=profiled("search_prod.search_by_name", search_by_name))
     search_name_btn.grid(row=0, column=2, padx=5, pady=5)
 
+    # Also search products moved to the archive
+    include_archive = tk.IntVar(master=root)
+    archive_check = tk.Checkbutton(top_frame, text="Include archived", variable=include_archive, onvalue=1, offvalue=0, bg=top_frame.cget('bg'))
+    archive_check.grid(row=0, column=3, padx=5, pady=5)
+
     # Bottom half = search results
     bottom_frame = tk.Frame(panel, bg=panel.cget('bg'))
     bottom_frame.pack(pady=10)
@@ -1348,11 +6095,215 @@ def search_prod(panel):
     result_label = tk.Label(bottom_frame, text="Search Results:", bg=bottom_frame.cget('bg'))
     result_label.pack(pady=5)
 
-    result_text = tk.Text(bottom_frame, height=15, width=80)
-    result_text.pack(pady=5)
+    product_grid = ProductGrid(bottom_frame, conn, logged_in_user_id, height=15)
+    product_grid.frame.pack(pady=5)
 
     return
 
+# Dashboard
+@timed("panel.dashboard")
+def dashboard(panel):
+    """
+    Creates a GUI interface in the provided panel with an overview of the user's inventory.
+
+    Shows the number of products and total quantity, a breakdown by food group and how much 
+    expires this week, next week and later (see `dashboard_summary()`). Everything is read from 
+    the trigger-maintained summary table, so the panel opens instantly on any inventory size.
+
+    Args:
+        panel (Tkinter Frame): The frame where the dashboard will be displayed.
+
+    Returns:
+        None
+    """
+    conn = get_inventory().conn
+
+    sub_frame = tk.Frame(panel, bg=panel.cget('bg'))
+    sub_frame.pack(pady=20)
+
+    totals_label = tk.Label(sub_frame, font=("Arial", 14), bg=sub_frame.cget('bg'))
+    totals_label.grid(row=0, column=0, columnspan=2, padx=5, pady=10)
+
+    group_frame = tk.LabelFrame(sub_frame, text="By Food Group", bg=sub_frame.cget('bg'))
+    group_frame.grid(row=1, column=0, padx=15, pady=5, sticky=tk.N)
+
+    expiry_frame = tk.LabelFrame(sub_frame, text="By Expiration", bg=sub_frame.cget('bg'))
+    expiry_frame.grid(row=1, column=1, padx=15, pady=5, sticky=tk.N)
+
+    # Fill a frame with a header row and (label, items, quantity) rows
+    def fill_table(frame, rows):
+        for widget in frame.winfo_children():
+            widget.destroy()
+        for c, heading in enumerate(("", "Products", "Quantity")):
+            tk.Label(frame, text=heading, font=("Arial", 10, "bold"), bg=frame.cget('bg')).grid(row=0, column=c, padx=8, pady=3)
+        for r, (label, items, quantity) in enumerate(rows, start=1):
+            tk.Label(frame, text=label, bg=frame.cget('bg')).grid(row=r, column=0, padx=8, pady=3, sticky=tk.W)
+            tk.Label(frame, text=items, bg=frame.cget('bg')).grid(row=r, column=1, padx=8, pady=3, sticky=tk.E)
+            tk.Label(frame, text=quantity, bg=frame.cget('bg')).grid(row=r, column=2, padx=8, pady=3, sticky=tk.E)
+
+    def refresh():
+        summary = dashboard_summary(conn, logged_in_user_id)
+        totals_label.config(text=f"{summary['Items']} products, {summary['Quantity']} items in total")
+
+        fill_table(group_frame, [(food_groups[group - 1] if group in range(1, len(food_groups) + 1) else "Other",
+                                  *summary["Groups"][group]) for group in sorted(summary["Groups"])])
+        labels = {"Expired": "Expired (earlier weeks)", "This Week": "Expiring this week",
+                  "Next Week": "Expiring next week", "Later": "Expiring later", "No Date": "No valid date"}
+        fill_table(expiry_frame, [(labels[bucket], *summary["Expiry"][bucket]) for bucket in labels])
+
+    refresh_btn = tk.Button(sub_frame, text="Refresh", command=profiled("dashboard.refresh", refresh))
+    refresh_btn.grid(row=2, column=0, columnspan=2, padx=5, pady=10)
+
+    refresh()
+
+# Shopping List
+@timed("panel.shopping_list")
+def shopping_list(panel):
+    """
+    Creates a GUI interface in the provided panel showing the user's shopping list.
+
+    The list combines items that are low in stock, expiring soon or predicted to run out 
+    (see `build_shopping_list()`). It is cached per user and only rebuilt when the inventory 
+    changes, so reopening the panel is instant. The list can be exported to a text file or 
+    sent to the printer.
+
+    Args:
+        panel (Tkinter Frame): The frame where the shopping list will be displayed.
+
+    Returns:
+        None
+    """
+    sub_frame = tk.Frame(panel, bg=panel.cget('bg'))
+    sub_frame.pack(pady=20)
+
+    instructions = tk.Label(sub_frame, text="Items to buy soon:", bg=sub_frame.cget('bg'))
+    instructions.grid(row=0, column=0, columnspan=3, padx=5, pady=5, sticky=tk.W)
+
+    list_text = tk.Text(sub_frame, height=20, width=80)
+    list_text.grid(row=1, column=0, columnspan=3, padx=5, pady=5)
+
+    def refresh():
+        list_text.config(state='normal')
+        list_text.delete('1.0', tk.END)
+        list_text.insert(tk.END, format_shopping_list(get_shopping_list()))
+        list_text.config(state='disabled')
+
+    def export():
+        path = filedialog.asksaveasfilename(parent=panel, title="Export Shopping List", defaultextension=".txt",
+                                            initialfile="shopping_list.txt", filetypes=[("Text files", "*.txt")])
+        if path:
+            with open(path, "w") as file:
+                file.write(format_shopping_list(get_shopping_list()))
+            messagebox.showinfo("Success", f"Shopping list saved to {path}")
+
+    def print_list():
+        path = os.path.join(tempfile.gettempdir(), "foodconnect_shopping_list.txt")
+        with open(path, "w") as file:
+            file.write(format_shopping_list(get_shopping_list()))
+        try:
+            if sys.platform.startswith("win"):
+                os.startfile(path, "print")
+            else:
+                subprocess.run(["lpr", path], check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            messagebox.showerror("Print Error", f"Could not print the shopping list: {e}")
+
+    tk.Button(sub_frame, text="Refresh", command=profiled("shopping_list.refresh", refresh)).grid(row=2, column=0, padx=5, pady=5)
+    tk.Button(sub_frame, text="Export", command=profiled("shopping_list.export", export)).grid(row=2, column=1, padx=5, pady=5)
+    tk.Button(sub_frame, text="Print", command=profiled("shopping_list.print", print_list)).grid(row=2, column=2, padx=5, pady=5)
+
+    refresh()
+
+# Recipes
+@timed("panel.recipes")
+def recipe_finder(panel):
+    """
+    Creates a GUI interface in the provided panel suggesting recipes for the current inventory.
+
+    Recipes come from the local recipe collection (Tools > Import Recipes...) and are ranked by 
+    `match_recipes()`: how many of their ingredients the user has, with extra weight for using up 
+    products that expire soon. Dietary checkboxes limit both the products used and the recipes 
+    shown. Matching runs on a background thread; double-click a recipe to see it.
+
+    Args:
+        panel (Tkinter Frame): The frame where the recipe finder will be displayed.
+
+    Returns:
+        None
+    """
+    sub_frame = tk.Frame(panel, bg=panel.cget('bg'))
+    sub_frame.pack(pady=20)
+
+    # Dietary needs
+    diet_vars = {}
+    for column, flag in enumerate(RECIPE_REQUIRED_FLAGS + RECIPE_EXCLUDED_FLAGS):
+        diet_vars[flag] = tk.IntVar(master=root)
+        text = flag if flag in RECIPE_REQUIRED_FLAGS else f"No {flag}"
+        tk.Checkbutton(sub_frame, text=text, variable=diet_vars[flag], onvalue=1, offvalue=0,
+                       bg=sub_frame.cget('bg')).grid(row=0, column=column, padx=2, pady=5, sticky=tk.W)
+
+    status_label = tk.Label(sub_frame, text="", bg=sub_frame.cget('bg'))
+    status_label.grid(row=2, column=0, columnspan=8, padx=5, pady=5, sticky=tk.W)
+
+    tree = ttk.Treeview(sub_frame, columns=["name", "have", "soon", "missing"], show="headings", height=15)
+    for column, heading, width in [("name", "Recipe", 260), ("have", "Have", 60), ("soon", "Uses Expiring", 100),
+                                   ("missing", "Missing", 320)]:
+        tree.heading(column, text=heading)
+        tree.column(column, width=width, minwidth=40, stretch=True)
+    tree.grid(row=3, column=0, columnspan=8, padx=5, pady=5)
+    found = {}
+
+    def find():
+        diet = [flag for flag, var in diet_vars.items() if var.get()]
+        if not os.path.exists(RECIPES_DB):
+            status_label.config(text="No recipes yet. Use Tools > Import Recipes... to add a recipe collection.")
+            return
+        status_label.config(text="Finding recipes...")
+        find_button.config(state=tk.DISABLED)
+
+        # The worker thread needs its own connections
+        def work():
+            conn, recipes_conn = connect_db(), connect_recipes()
+            try:
+                return match_recipes(conn, recipes_conn, logged_in_user_id, diet)
+            finally:
+                conn.close()
+                recipes_conn.close()
+
+        run_in_background(panel, work, on_done=show)
+
+    def show(results, error):
+        if not tree.winfo_exists():
+            return
+        find_button.config(state=tk.NORMAL)
+        tree.delete(*tree.get_children())
+        found.clear()
+        if error:
+            status_label.config(text=f"Could not match recipes: {error}")
+            return
+        for recipe in results:
+            found[str(recipe["id"])] = recipe
+            tree.insert("", tk.END, iid=str(recipe["id"]), values=(
+                recipe["name"], f"{recipe['matched']}/{recipe['total']}",
+                "Yes" if recipe["urgency"] > 0 else "", ", ".join(recipe["missing"])))
+        status_label.config(text=f"{len(results)} recipes, best match first." if results
+                            else "No recipes use anything in your inventory.")
+
+    def show_recipe(event=None):
+        selection = tree.selection()
+        if selection:
+            recipe = found[selection[0]]
+            missing = ", ".join(recipe["missing"]) or "nothing"
+            messagebox.showinfo(recipe["name"], f"You have {recipe['matched']} of {recipe['total']} ingredients "
+                                f"(missing: {missing}).\n\n{(recipe['instructions'] or '')[:1500]}")
+
+    tree.bind("<Double-1>", show_recipe)
+
+    find_button = tk.Button(sub_frame, text="Find Recipes", command=profiled("recipes.find", find))
+    find_button.grid(row=1, column=0, columnspan=8, padx=5, pady=5)
+
+    find()
+
 # Open the HTML file in a web browser
 def open_html(file_path):
     """
@@ -1467,6 +6418,9 @@ def main():
     if not check_agreements():
         return
 
+    # Map the product catalog snapshot (does not read the catalog itself)
+    open_catalog_snapshot()
+
     # Create the database connection
     conn = connect_db()
 
@@ -1478,10 +6432,58 @@ def main():
     root = main_window(conn)
     root.protocol("WM_DELETE_WINDOW", sys.exit)
 
+    # Watch for event-loop stalls while the app runs
+    StallWatchdog(root).start()
+
+    # Move long-expired and used-up products to the archive in the background
+    schedule_purge(root)
+    schedule_dashboard_rollover(root)
+
+    # Bring the fuzzy search index up to date off the GUI thread (slow only the first time)
+    if DB_BACKEND == "sqlite":
+        run_in_background(root, catch_up_product_trigrams)
+
+    # Collect stock and expiry alerts for every user, email digests and badge the bell
+    schedule_notifications(root, conn, root.stock_button)
+
     # Start the Tkinter main loop
     root.mainloop()
 
 # Starting Point
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FoodConnect food inventory manager.")
+    parser.add_argument("--build-snapshot", action="store_true",
+                        help="rebuild catalog.snapshot from catalog.db and exit")
+    parser.add_argument("--example-settings", metavar="FILE",
+                        help="write a settings file listing every setting at its default and exit")
+    parser.add_argument("--backup", action="store_true",
+                        help="back up products.db to the backups folder and exit")
+    parser.add_argument("--restore", metavar="BACKUP",
+                        help="replace products.db with a backup file and exit")
+    parser.add_argument("--compact", action="store_true",
+                        help="rebuild products.db once so purges return free space to the disk, and exit")
+    parser.add_argument("--profile", nargs="?", const=os.path.join(CURRENT_DIR, "profiles"), default=None,
+                        metavar="DIR", help="profile every user action and write the results to DIR (default: ./profiles)")
+    args = parser.parse_args()
+    PROFILE_DIR = args.profile
+
+    if args.build_snapshot:
+        print(f"Wrote {build_catalog_snapshot()} products to {CATALOG_SNAPSHOT}")
+        sys.exit()
+    if args.example_settings:
+        write_example_settings(args.example_settings)
+        print(f"Wrote {args.example_settings}")
+        sys.exit()
+    if args.backup:
+        print(f"Backed up products.db to {backup_database()}")
+        sys.exit()
+    if args.restore:
+        copy = restore_database(args.restore)
+        print(f"Restored products.db from {args.restore}" + (f"; the replaced data was saved to {copy}" if copy else ""))
+        sys.exit()
+    if args.compact:
+        print("Rebuilt products.db" if compact_database() else "products.db already uses incremental vacuum")
+        sys.exit()
+
     login_window()
     main()
@@ -0,0 +1,239 @@
+"""
+Benchmarks for every query the FoodConnect app runs against `products.db`.
+
+Each benchmark calls the same function the GUI uses (`app.load_prod()`, `app.get_stock_alerts()`, 
+`app.Product.search_product()`, etc.) against a synthetic database from `synthetic.py`, so schema 
+or query changes in app.py are measured as soon as they land.
+
+Results are written to `benchmarks/results/latest.json`. Saving a run as the baseline and comparing 
+later runs against it flags regressions:
+
+    python benchmarks/bench_data_layer.py --rows 1000 100000 --save-baseline
+    python benchmarks/bench_data_layer.py --rows 1000 100000 --compare
+
+Pass `--rows 1000000` for the 1M row run (generation takes a while the first time; the database is 
+cached in `benchmarks/.data`).
+
+The `concurrent_*` benchmarks time a burst of single-row updates from `--threads` threads at once: 
+`concurrent_direct` gives every thread its own connection (one transaction per write, threads 
+wait on each other's locks), `concurrent_writer` sends them all through one `app.DatabaseWriter` 
+(group commit). Writes that fail with "database is locked" are counted and printed.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+from synthetic import inventory_db  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+LATEST = os.path.join(RESULTS_DIR, "latest.json")
+BASELINE = os.path.join(RESULTS_DIR, "baseline.json")
+
+# Time one benchmark, running `setup` untimed before each call
+def measure(func, setup=None, repeat=20, budget=5.0):
+    """
+    Runs `func` up to `repeat` times (stopping early once `budget` seconds are spent).
+
+    Returns:
+        dict: min/median/mean in milliseconds and the number of runs.
+    """
+    timings = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+        if time.perf_counter() - started > budget and len(timings) >= 3:
+            break
+    return {
+        "min_ms": round(min(timings), 4),
+        "median_ms": round(statistics.median(timings), 4),
+        "mean_ms": round(statistics.fmean(timings), 4),
+        "runs": len(timings),
+    }
+
+# Build the benchmark table for one database
+def benchmarks(conn, rng):
+    users = conn.execute("SELECT user_id, username FROM users").fetchall()
+    sample = conn.execute("SELECT * FROM products ORDER BY random() LIMIT 1").fetchone()
+    name, exp = sample[0], sample[3]
+
+    def pick_user():
+        app.logged_in_user_id = rng.choice(users)[0]
+        return ()
+
+    def insert_victim():
+        victim = app.Product(f"Bench Victim {rng.random()}", 1, 1, exp, exp, users[0][0])
+        victim.add_product(conn)
+        return (conn, victim.name, victim.expiration)
+
+    updated = app.Product.load_product(conn, name, exp)
+
+    def bump_quantity():
+        updated.quantity = rng.randint(1, 12)
+        return (conn,)
+
+    return {
+        "load_prod": (lambda: app.load_prod(conn), pick_user),
+        "check_stock": (lambda: app.get_stock_alerts(conn), pick_user),
+        "name_search": (lambda: app.Product.search_product(conn, "milk"), pick_user),
+        "grid_sort_exp": (lambda: app.product_page(conn, app.logged_in_user_id, "exp", True), pick_user),
+        "delete": (app.Product.delete_product, insert_victim),
+        "update": (updated.update_product, bump_quantity),
+        "login_lookup": (lambda username: app.find_user(conn, username), lambda: (rng.choice(users)[1],)),
+    }
+
+# Build the concurrent write benchmarks for one database file
+def concurrent_benchmarks(db_path, rng, threads, writes=25):
+    conn = sqlite3.connect(db_path)
+    ids = [row[0] for row in conn.execute("SELECT id FROM products ORDER BY random() LIMIT ?", (threads * writes,))]
+    conn.close()
+    sql = "UPDATE products SET quantity = ? WHERE id = ?"
+    locked = []
+
+    # Call `write(product_id, quantity)` from `threads` threads at once, each on its own share of ids
+    def burst(write, connect=None):
+        def worker(share):
+            conn = connect() if connect else None
+            try:
+                for product_id in share:
+                    try:
+                        write(conn, product_id, rng.randint(1, 12))
+                    except sqlite3.OperationalError:
+                        locked.append(product_id)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+        workers = [threading.Thread(target=worker, args=(ids[i::threads],)) for i in range(threads)]
+        for worker_thread in workers:
+            worker_thread.start()
+        for worker_thread in workers:
+            worker_thread.join()
+
+    def direct(conn, product_id, quantity):
+        with conn:
+            conn.execute(sql, (quantity, product_id))
+
+    writer = app.DatabaseWriter(db_path)
+
+    def through_writer(conn, product_id, quantity):
+        writer.execute(sql, (quantity, product_id)).result()
+
+    return {
+        "concurrent_direct": (lambda: burst(direct, lambda: app.connect_db(db_path)), None),
+        "concurrent_writer": (lambda: burst(through_writer), None),
+    }, writer, locked
+
+# Run every benchmark against a database of the given size
+def run_size(rows, refresh=False, threads=8):
+    source = inventory_db(rows, refresh=refresh)
+
+    # Work on a copy so write benchmarks never drift the cached dataset
+    scratch = source + ".bench"
+    shutil.copyfile(source, scratch)
+    conn = sqlite3.connect(scratch)
+    app.create_products(conn)  # Cached databases may predate the current indexes
+    rng = random.Random(rows)
+
+    results = {}
+    try:
+        for name, (func, setup) in benchmarks(conn, rng).items():
+            results[name] = measure(func, setup)
+            print(f"  {rows:>9} rows  {name:<17} median {results[name]['median_ms']:>10.3f} ms")
+    finally:
+        conn.close()
+        os.remove(scratch)
+
+    # The concurrent benchmarks use WAL mode and the archive database, so they get a folder of their own
+    scratch_dir = tempfile.mkdtemp(prefix="bench-concurrent-")
+    scratch = os.path.join(scratch_dir, os.path.basename(source))
+    shutil.copyfile(source, scratch)
+    table, writer, locked = concurrent_benchmarks(scratch, rng, threads)
+    try:
+        for name, (func, setup) in table.items():
+            locked.clear()
+            results[name] = measure(func, setup, repeat=5)
+            results[name]["locked_errors"] = len(locked)
+            print(f"  {rows:>9} rows  {name:<17} median {results[name]['median_ms']:>10.3f} ms"
+                  f"  ({threads} threads, {len(locked)} 'database is locked' errors)")
+    finally:
+        writer.close()
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    return results
+
+# Describe the environment so results from different machines are not compared blindly
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.node(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+# Report benchmarks that got slower than the baseline by more than `threshold`
+def compare(results, baseline, threshold):
+    regressions = []
+    for rows, benches in results.items():
+        for name, stats in benches.items():
+            old = baseline.get("results", {}).get(rows, {}).get(name)
+            if not old:
+                continue
+            change = (stats["median_ms"] - old["median_ms"]) / max(old["median_ms"], 1e-6)
+            flag = "REGRESSION" if change > threshold else ""
+            print(f"  {rows:>9} rows  {name:<17} {old['median_ms']:>10.3f} -> {stats['median_ms']:>10.3f} ms  ({change:+.0%}) {flag}")
+            if flag:
+                regressions.append((rows, name, change))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the FoodConnect data layer.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000],
+                        help="inventory sizes to benchmark (e.g. 1000 100000 1000000)")
+    parser.add_argument("--refresh", action="store_true", help="regenerate the synthetic databases")
+    parser.add_argument("--threads", type=int, default=8, help="writer threads for the concurrent benchmarks")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare against the stored baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative slowdown that counts as a regression (default 0.25)")
+    args = parser.parse_args()
+
+    results = {}
+    for rows in args.rows:
+        results[str(rows)] = run_size(rows, args.refresh, args.threads)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    report = {"environment": environment(), "results": results}
+    with open(LATEST, "w") as file:
+        json.dump(report, file, indent=2)
+    if args.save_baseline:
+        shutil.copyfile(LATEST, BASELINE)
+        print(f"Baseline saved to {BASELINE}")
+
+    if args.compare:
+        if not os.path.exists(BASELINE):
+            sys.exit(f"No baseline at {BASELINE}; run with --save-baseline first.")
+        with open(BASELINE) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            sys.exit(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}.")
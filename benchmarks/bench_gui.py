@@ -0,0 +1,191 @@
+"""
+GUI responsiveness benchmarks for FoodConnect.
+
+Starts the real main window (headless under Xvfb when no display is available) against synthetic 
+inventories from `synthetic.py` and scripts the same interactions a user performs:
+
+- opening each panel through `app.on_button_click()`
+- toggling the light/dark theme
+- running a name search from the SEARCH panel
+- clicking the low stock bell (`check_stock()`)
+
+For every interaction it records how long the handler took to build/render (until 
+`update_idletasks()` returns) and how late a 5 ms `after` probe fired, i.e. how long the event loop 
+was stalled. Results are written to `benchmarks/results/gui_latest.json`.
+
+Usage:
+    python benchmarks/bench_gui.py --rows 1000 10000 100000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+from synthetic import inventory_db  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+LATEST = os.path.join(RESULTS_DIR, "gui_latest.json")
+
+PROBE_INTERVAL_MS = 5
+SETTLE_MS = 150
+
+# Start a virtual X server for the duration of the run
+def start_xvfb():
+    if shutil.which("Xvfb") is None:
+        sys.exit("Xvfb is not installed. Install it or run with an existing DISPLAY.")
+    for display in range(99, 120):
+        if os.path.exists(f"/tmp/.X11-unix/X{display}"):
+            continue
+        proc = subprocess.Popen(["Xvfb", f":{display}", "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(50):
+            if os.path.exists(f"/tmp/.X11-unix/X{display}"):
+                os.environ["DISPLAY"] = f":{display}"
+                return proc
+            time.sleep(0.1)
+        proc.kill()
+    sys.exit("Could not start Xvfb. Install it or run with an existing DISPLAY.")
+
+# Measures how late periodic `after` callbacks fire, i.e. event loop stalls
+class StallProbe:
+    def __init__(self, root, interval_ms=PROBE_INTERVAL_MS):
+        self.root = root
+        self.interval = interval_ms / 1000
+        self.samples = []
+        self.expected = None
+
+    def start(self):
+        self.expected = time.perf_counter() + self.interval
+        self.root.after(int(self.interval * 1000), self.tick)
+
+    def tick(self):
+        now = time.perf_counter()
+        self.samples.append(max(0.0, now - self.expected) * 1000)
+        self.expected = now + self.interval
+        self.root.after(int(self.interval * 1000), self.tick)
+
+    # Return and clear the lateness samples recorded so far
+    def take(self):
+        samples, self.samples = self.samples, []
+        return samples
+
+# Find the first descendant widget matching a predicate
+def find_widget(widget, match):
+    for child in widget.winfo_children():
+        if match(child):
+            return child
+        found = find_widget(child, match)
+        if found is not None:
+            return found
+    return None
+
+# The scripted interactions, each a function returning after the UI has been rebuilt
+def scenarios(root):
+    def open_panel(index):
+        def action():
+            app.on_button_click(index, root.buttons, root.panel)
+        return action
+
+    def run_search():
+        app.on_button_click(3, root.buttons, root.panel)
+        root.update_idletasks()
+        entry = find_widget(root.panel, lambda w: isinstance(w, app.tk.Entry))
+        button = find_widget(root.panel, lambda w: isinstance(w, app.tk.Button) and w.cget("text") == "Search")
+        entry.delete(0, app.tk.END)
+        entry.insert(0, "milk")
+        button.invoke()
+
+    actions = {f"open_{text.lower()}": open_panel(i) for i, text in enumerate(app.BUTTON_TEXTS)}
+    actions["toggle_theme"] = root.switch.invoke
+    actions["search"] = run_search
+    actions["check_stock"] = root.stock_button.invoke
+    return actions
+
+# Run every scenario `repeat` times on the live event loop
+def run_size(rows, repeat):
+    source = inventory_db(rows)
+
+    # connect_db() opens products.db relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="fc_gui_bench_")
+    shutil.copyfile(source, os.path.join(workdir, "products.db"))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+
+    # The bell pops up modal message boxes; replace them so the run is unattended
+    app.messagebox.showwarning = lambda *args, **kwargs: None
+    app.messagebox.showinfo = lambda *args, **kwargs: None
+    app.logged_in_user_id = 1
+
+    conn = app.connect_db()
+    root = app.main_window(conn)
+    probe = StallProbe(root)
+    actions = list(scenarios(root).items())
+    plan = [(name, action) for _ in range(repeat) for name, action in actions]
+    timings = {name: {"render_ms": [], "stall_ms": []} for name, _ in actions}
+
+    def step(index=0):
+        # Attribute the stalls seen since the previous action to it
+        if index > 0:
+            timings[plan[index - 1][0]]["stall_ms"].append(max(probe.take(), default=0.0))
+        if index == len(plan):
+            root.quit()
+            return
+        name, action = plan[index]
+        probe.take()
+        start = time.perf_counter()
+        action()
+        root.update_idletasks()
+        timings[name]["render_ms"].append((time.perf_counter() - start) * 1000)
+        root.after(SETTLE_MS, step, index + 1)
+
+    root.update()
+    probe.start()
+    root.after(SETTLE_MS, step)
+    root.mainloop()
+    root.destroy()
+    conn.close()
+    os.chdir(cwd)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {}
+    for name, values in timings.items():
+        results[name] = {
+            "render_median_ms": round(statistics.median(values["render_ms"]), 3),
+            "render_max_ms": round(max(values["render_ms"]), 3),
+            "stall_median_ms": round(statistics.median(values["stall_ms"]), 3),
+            "stall_max_ms": round(max(values["stall_ms"]), 3),
+        }
+        print(f"  {rows:>9} rows  {name:<13} render {results[name]['render_median_ms']:>9.2f} ms"
+              f"  stall max {results[name]['stall_max_ms']:>9.2f} ms")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark FoodConnect GUI responsiveness.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="inventory sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="times each interaction is repeated")
+    parser.add_argument("--no-xvfb", action="store_true", help="use the current DISPLAY instead of Xvfb")
+    args = parser.parse_args()
+
+    xvfb = None
+    if not args.no_xvfb and not os.environ.get("DISPLAY"):
+        xvfb = start_xvfb()
+
+    try:
+        results = {str(rows): run_size(rows, args.repeat) for rows in args.rows}
+    finally:
+        if xvfb:
+            xvfb.terminate()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(LATEST, "w") as file:
+        json.dump({"results": results, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}, file, indent=2)
+    print(f"Results written to {LATEST}")
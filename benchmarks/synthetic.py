@@ -0,0 +1,111 @@
+"""
+Synthetic inventory generator for the FoodConnect benchmarks.
+
+Builds a scratch SQLite database with the same schema as `products.db` (created through 
+`app.create_users()` / `app.create_products()` so schema changes are picked up automatically) and 
+fills it with randomly generated users and products spread across many `user_id`s.
+
+Usage:
+    python benchmarks/synthetic.py --rows 100000 --users 500 --out benchmarks/.data/products_100000.db
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+
+FOODS = [
+    "Milk", "Cheese", "Butter", "Yogurt", "Cream", "Eggs", "Apples", "Bananas", "Oranges", "Grapes",
+    "Strawberries", "Blueberries", "Lemons", "Lettuce", "Spinach", "Carrots", "Broccoli", "Tomatoes",
+    "Onions", "Potatoes", "Peppers", "Cucumbers", "Bread", "Rice", "Pasta", "Oats", "Tortillas",
+    "Bagels", "Chicken", "Beef", "Pork", "Salmon", "Tuna", "Tofu", "Beans", "Lentils", "Peanut Butter",
+    "Almonds", "Hummus", "Ketchup", "Mustard", "Jam", "Juice", "Soda", "Salsa", "Pickles",
+]
+VARIANTS = ["", "", "", " Organic", " Large", " Small", " 2%", " Fresh", " Frozen"]
+
+# Group index for each food, matching app.food_groups (1-based)
+FOOD_GROUP = {name: (i % len(app.food_groups)) + 1 for i, name in enumerate(FOODS)}
+
+# Fill a fresh database with synthetic users and products
+def generate_inventory(db_path, rows, users=None, seed=4110, chunk_size=50000):
+    """
+    Creates (or replaces) a database at `db_path` with `rows` products spread over `users` users.
+
+    Expiration dates fall between 30 days ago and 60 days from today and quantities between 
+    1 and 12, so low-stock and expiring-soon queries have realistic hit rates.
+
+    Args:
+        db_path (str): Path of the database file to create.
+        rows (int): Number of products to generate.
+        users (int, optional): Number of users. Defaults to one user per 200 products (10 minimum).
+        seed (int): Random seed so runs are reproducible.
+        chunk_size (int): Number of rows inserted per transaction.
+
+    Returns:
+        list: The generated usernames, in `user_id` order.
+    """
+    users = users or max(10, rows // 200)
+    rng = random.Random(seed)
+    today = date.today()
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    app.create_users(conn)
+    app.create_products(conn)
+
+    # Benchmarks never check the password, so a fixed placeholder hash keeps generation fast
+    usernames = [f"user{i:06d}" for i in range(1, users + 1)]
+    with conn:
+        conn.executemany(
+            "INSERT INTO users (email, username, password_hash, first_login) VALUES (?, ?, ?, 0)",
+            [(f"{name}@example.com", name, "x") for name in usernames]
+        )
+
+    def product_rows(count):
+        for _ in range(count):
+            food = rng.choice(FOODS)
+            exp = today + timedelta(days=rng.randint(-30, 60))
+            add = exp - timedelta(days=rng.randint(5, 60))
+            flags = [int(rng.random() < 0.2) for _ in range(8)]
+            yield (food + rng.choice(VARIANTS), rng.randint(1, 12), FOOD_GROUP[food],
+                   exp.strftime('%m/%d/%y'), add.strftime('%m/%d/%y'), rng.randint(1, users), *flags)
+
+    remaining = rows
+    while remaining > 0:
+        count = min(chunk_size, remaining)
+        with conn:
+            conn.executemany('''INSERT INTO products
+                                (name, quantity, "group", expiration, "add", user_id, vegetarian, vegan, gluten, lactose, eggs, nuts, halal, kosher)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', product_rows(count))
+        remaining -= count
+
+    conn.close()
+    return usernames
+
+# Reuse a previously generated database of the same size when possible
+def inventory_db(rows, users=None, refresh=False):
+    path = os.path.join(DATA_DIR, f"products_{rows}.db")
+    if refresh or not os.path.exists(path):
+        generate_inventory(path, rows, users)
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic FoodConnect inventory database.")
+    parser.add_argument("--rows", type=int, default=1000, help="number of products to generate")
+    parser.add_argument("--users", type=int, default=None, help="number of users (default: rows / 200)")
+    parser.add_argument("--out", default=None, help="output database path")
+    args = parser.parse_args()
+
+    out = args.out or os.path.join(DATA_DIR, f"products_{args.rows}.db")
+    generate_inventory(out, args.rows, args.users)
+    print(f"Wrote {args.rows} products to {out}")
@@ -0,0 +1,89 @@
+"""
+Shared test setup.
+
+Every file the app reads or writes is pointed at a temporary folder before `app` is imported, 
+so the tests never touch products.db, settings.toml or the saved login of the person running them.
+"""
+import os
+import secrets
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STATE_DIR = tempfile.mkdtemp(prefix="foodconnect-tests-")
+os.environ["FOODCONNECT_SETTINGS"] = os.path.join(STATE_DIR, "settings.toml")
+os.environ["FOODCONNECT_DB_PATH"] = os.path.join(STATE_DIR, "products.db")
+for setting, name in (("PATHS_CATALOG", "catalog.db"), ("PATHS_CATALOG_SNAPSHOT", "catalog.snapshot"),
+                      ("PATHS_RECIPES", "recipes.db"), ("PATHS_BACKUPS", "backups"),
+                      ("PATHS_METRICS_LOG", os.path.join("logs", "metrics.log")), ("PATHS_SESSION_FILE", "session")):
+    os.environ["FOODCONNECT_" + setting] = os.path.join(STATE_DIR, name)
+
+import app  # noqa: E402  (must come after the environment is set up)
+
+
+# Connection factory for a fresh, empty database on each backend
+# SQLite always runs. PostgreSQL runs when a server is available: set FOODCONNECT_TEST_DATABASE_URL 
+# to a libpq DSN/URL, or run the suite with FOODCONNECT_DB_BACKEND=postgres (and 
+# FOODCONNECT_DATABASE_URL or the PG* variables). Each test gets its own schema, dropped afterwards.
+@pytest.fixture(params=["sqlite", "postgres"])
+def connect(request, tmp_path):
+    if request.param == "sqlite":
+        def connect_sqlite():
+            conn = app.sqlite3.connect(str(tmp_path / "products.db"), factory=app.InstrumentedConnection)
+            conn.execute("PRAGMA synchronous = OFF")  # Throwaway database: skip the fsyncs
+            return conn
+
+        yield connect_sqlite
+        return
+
+    if app.psycopg2 is None:
+        pytest.skip("psycopg2 is not installed")
+    dsn = app.DATABASE_URL if app.DB_BACKEND == "postgres" else os.environ.get("FOODCONNECT_TEST_DATABASE_URL")
+    if dsn is None:
+        pytest.skip("no PostgreSQL server configured (set FOODCONNECT_TEST_DATABASE_URL)")
+    schema = f"foodconnect_test_{secrets.token_hex(4)}"
+    admin = app.psycopg2.connect(dsn)
+    admin.autocommit = True
+    admin.cursor().execute(f"CREATE SCHEMA {schema}")
+    pool = app.psycopg2.pool.ThreadedConnectionPool(1, 4, dsn, options=f"-c search_path={schema}")
+    try:
+        yield lambda: app.PostgresConnection(pool)
+    finally:
+        pool.closeall()
+        admin.cursor().execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
+
+
+# A fresh database with the app's schema, once per backend
+@pytest.fixture
+def db_conn(connect):
+    conn = connect()
+    app.create_users(conn)
+    app.create_products(conn)
+    yield conn
+    conn.close()
+
+
+# The id of a user added to `db_conn`
+@pytest.fixture
+def user_id(db_conn):
+    with db_conn:
+        db_conn.execute("INSERT INTO users (email, username, password_hash, first_login, totp_secret) VALUES (?, ?, ?, 0, ?)",
+                        ("user@example.com", "user", b"not a real hash", "SECRET"))
+    return db_conn.execute("SELECT user_id FROM users WHERE username = ?", ("user",)).fetchone()[0]
+
+
+# A fresh SQLite database with the app's schema, for tests of SQLite-only features (backups, the 
+# writer thread, the attached recipe database)
+@pytest.fixture
+def sqlite_conn(tmp_path):
+    conn = app.sqlite3.connect(str(tmp_path / "products.db"), factory=app.InstrumentedConnection)
+    conn.execute("PRAGMA synchronous = OFF")  # Throwaway database: skip the fsyncs
+    app.create_users(conn)
+    app.create_products(conn)
+    yield conn
+    conn.close()
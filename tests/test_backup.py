@@ -0,0 +1,66 @@
+"""
+Tests for backing up and restoring the SQLite database.
+"""
+import os
+import sqlite3
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def db_path(sqlite_conn, tmp_path):
+    with sqlite_conn:
+        sqlite_conn.execute("INSERT INTO users (email, username, password_hash, first_login, totp_secret) VALUES (?, ?, ?, 0, ?)",
+                            ("user@example.com", "user", b"not a real hash", "SECRET"))
+    return str(tmp_path / "products.db")
+
+
+def usernames(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [row[0] for row in conn.execute("SELECT username FROM users ORDER BY user_id")]
+    finally:
+        conn.close()
+
+
+def test_restore_keeps_a_copy_of_the_replaced_data(db_path, tmp_path):
+    backups = str(tmp_path / "backups")
+    backup = app.backup_database(db_path, backups, compress=False)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO users (email, username, password_hash) VALUES ('new@example.com', 'new', 'x')")
+
+    copy = app.restore_database(backup, db_path, backups)
+    assert usernames(db_path) == ["user"]
+    assert os.path.dirname(copy) == os.path.join(backups, "before-restore")
+    assert os.path.exists(backup)
+
+    # The copy undoes the restore
+    app.restore_database(copy, db_path, backups, keep_copy=False)
+    assert usernames(db_path) == ["user", "new"]
+
+
+def test_restore_rejects_other_databases(db_path, tmp_path):
+    other = str(tmp_path / "other.db")
+    with sqlite3.connect(other) as conn:
+        conn.execute("CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT)")
+        conn.execute("CREATE TABLE products (name TEXT, quantity INTEGER)")
+
+    with pytest.raises(sqlite3.DatabaseError, match="not a FoodConnect backup"):
+        app.restore_database(other, db_path, str(tmp_path / "backups"))
+    assert usernames(db_path) == ["user"]
+    assert not os.path.exists(tmp_path / "backups")
+
+
+def test_restore_reloads_open_inventory_caches(sqlite_conn, db_path, tmp_path):
+    user_id = sqlite_conn.execute("SELECT user_id FROM users").fetchone()[0]
+    backup = app.backup_database(db_path, str(tmp_path / "backups"), compress=False)
+
+    cache = app.InventoryCache(user_id, conn=sqlite_conn)
+    cache.add(app.Product("Milk", 1, 1, "2030-01-01", "2024-01-01", user_id))
+    assert len(cache.products()) == 1
+
+    # The backup's counter is older than the one the cache holds; the restore moves it past both
+    app.restore_database(backup, db_path, str(tmp_path / "backups"), keep_copy=False)
+    assert cache.products() == []
@@ -0,0 +1,64 @@
+"""
+Tests for the product catalog and its memory-mapped snapshot.
+"""
+import os
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    conn = app.connect_catalog(str(tmp_path / "catalog.db"))
+    with conn:
+        conn.execute("INSERT INTO catalog VALUES ('0012345678905', 'Oat Milk', 1, 1, 1, 0, 0, 0, 0, 1, 1)")
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def no_open_snapshot(monkeypatch):
+    monkeypatch.setattr(app, "catalog_snapshot", None)
+
+
+def test_rebuild_while_mapped_makes_a_new_version(catalog, tmp_path, no_open_snapshot):
+    path = str(tmp_path / "catalog.snapshot")
+    app.build_catalog_snapshot(catalog, path)
+    first = app.open_catalog_snapshot(path)
+    assert first.lookup("12345678905")["Name"] == "Oat Milk"
+
+    with catalog:
+        catalog.execute("UPDATE catalog SET name = 'Oat Drink'")
+    app.build_catalog_snapshot(catalog, path)
+    second = app.open_catalog_snapshot(path)
+
+    assert second.path != first.path
+    assert second.lookup("12345678905")["Name"] == "Oat Drink"
+    assert first.map.closed
+    assert app.snapshot_versions(path) == [second.path]
+    second.close()
+
+
+def test_snapshot_from_older_versions_is_still_opened(catalog, tmp_path, no_open_snapshot):
+    path = str(tmp_path / "catalog.snapshot")
+    app.build_catalog_snapshot(catalog, path)
+    os.replace(app.snapshot_versions(path)[0], path)
+
+    snapshot = app.open_catalog_snapshot(path)
+    assert snapshot.path == path
+    snapshot.close()
+
+
+@pytest.mark.parametrize("tags, group", [
+    ("en:dairies,en:cheeses", 1),
+    ("en:plant-based-foods,en:non-dairy-milks", 6),
+    ("en:sweet-snacks,en:donuts", 6),
+    ("en:beverages,en:fruit-juices", 6),
+    ("en:fruits,en:fresh-fruits", 2),
+    ("en:fish-meat-eggs,en:meat", 5),
+    ("fr:fromages, en:cheeses", 1),
+])
+def test_catalog_row_matches_whole_tags(tags, group):
+    row = app.catalog_row({"code": "123", "product_name": "Test", "categories_tags": tags})
+    assert row[2] == group
@@ -0,0 +1,104 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import app
+
+
+def test_expiry_waste_counts_each_unit_once():
+    # Eaten at 1/day: 9 of the 10 units expiring after 1 day are wasted, and the 5 units 
+    # expiring after 10 days still have 9 days of capacity, so none of them are
+    waste = app.expiry_waste(np.array([0, 0]), np.array([10.0, 5.0]), np.array([1.0, 10.0]), np.array([1.0]))
+    assert waste.tolist() == [9.0]
+
+
+def test_expiry_waste_per_product():
+    waste = app.expiry_waste(
+        np.array([1, 0, 1, 0]),
+        np.array([5.0, 10.0, 3.0, 4.0]),
+        np.array([10.0, 1.0, np.inf, -2.0]),
+        np.array([1.0, 0.0]),
+    )
+    # Product 0: the 4 already expired units and 9 of the 10 expiring tomorrow. Product 1 is not 
+    # being eaten: the 5 that expire are wasted, the 3 that never expire are not
+    assert waste.tolist() == [13.0, 5.0]
+
+
+def test_expiry_waste_without_stock():
+    assert app.expiry_waste(np.array([], dtype=int), np.array([]), np.array([]), np.array([])).tolist() == []
+
+
+def test_forecast_inventory_waste(db_conn, user_id):
+    today = date.today()
+    with db_conn:
+        for back in range(app.FORECAST_WINDOW_DAYS):
+            db_conn.execute("INSERT INTO stock_daily (user_id, name, day, consumed) VALUES (?, 'milk', ?, 1)",
+                            (user_id, (today - timedelta(days=back)).isoformat()))
+        for quantity, days in ((10, 3), (5, 12)):
+            db_conn.execute('''INSERT INTO products (name, quantity, "group", expiration, "add", user_id)
+                               VALUES ('Milk', ?, 4, ?, ?, ?)''',
+                            (quantity, (today + timedelta(days=days)).strftime("%m/%d/%y"), today.strftime("%m/%d/%y"), user_id))
+
+    forecast = app.forecast_inventory(db_conn, user_id)
+    assert forecast.names == ["milk"]
+    assert forecast.rate[0] == pytest.approx(1.0)
+    # Between 2 and 3 days of eating are left before the first row expires (it is already part 
+    # way through today), so 7 to 8 of its units are wasted; the second row is eaten in time
+    assert 7 <= forecast.projected_waste[0] < 8
+
+
+def test_shopping_list_is_rebuilt_only_after_a_change(connect, db_conn, user_id, monkeypatch):
+    cache = app.InventoryCache(user_id, conn=db_conn)
+    monkeypatch.setitem(app.inventory_caches, user_id, cache)
+    monkeypatch.setattr(app, "shopping_lists", {})
+    assert app.get_shopping_list(user_id) == []
+
+    builds = []
+    build = app.build_shopping_list
+    monkeypatch.setattr(app, "build_shopping_list", lambda conn, user_id: builds.append(user_id) or build(conn, user_id))
+    assert app.get_shopping_list(user_id) == []
+    assert builds == []
+
+    # A write by another connection is picked up without going through the cache
+    other = connect()
+    app.Product("Bread", 1, 4, "2030-01-01", "2024-01-01", user_id).add_product(other)
+    other.close()
+    assert [item["Name"] for item in app.get_shopping_list(user_id)] == ["Bread"]
+    assert builds == [user_id]
+
+
+def test_shopping_list_keeps_the_same_name_in_two_groups_apart(db_conn, user_id):
+    soon = (date.today() + timedelta(days=2)).strftime("%m/%d/%y")
+    app.Product("Milk", 1, 1, soon, "01/01/24", user_id).add_product(db_conn)
+    app.Product("milk", 2, 6, "12/31/99", "01/01/24", user_id).add_product(db_conn)
+
+    items = app.build_shopping_list(db_conn, user_id)
+    assert [(item["Group"], item["Quantity"], item["Exp"]) for item in items] == \
+        [(1, 1, (date.today() + timedelta(days=2)).isoformat()), (6, 2, "2099-12-31")]
+
+
+def test_shopping_list_ignores_malformed_dates(db_conn, user_id):
+    app.Product("Bread", 1, 4, "1/2/24", "01/01/24", user_id).add_product(db_conn)
+    app.Product("Bread", 1, 4, "12/31/99", "01/01/24", user_id).add_product(db_conn)
+
+    [item] = app.build_shopping_list(db_conn, user_id)
+    assert item["Exp"] == "2099-12-31"
+    assert item["Reason"] == "Low stock"
+
+
+def test_shopping_list_is_kept_per_user(db_conn, user_id, monkeypatch):
+    with db_conn:
+        db_conn.execute("INSERT INTO users (email, username, password_hash, first_login, totp_secret) VALUES (?, ?, ?, 0, ?)",
+                        ("other@example.com", "other", b"not a real hash", "SECRET"))
+    other_id = db_conn.execute("SELECT user_id FROM users WHERE username = ?", ("other",)).fetchone()[0]
+    monkeypatch.setitem(app.inventory_caches, user_id, app.InventoryCache(user_id, conn=db_conn))
+    monkeypatch.setattr(app, "shopping_lists", {})
+    app.get_shopping_list(user_id)
+
+    builds = []
+    build = app.build_shopping_list
+    monkeypatch.setattr(app, "build_shopping_list", lambda conn, user_id: builds.append(user_id) or build(conn, user_id))
+    app.Product("Bread", 1, 4, "2030-01-01", "2024-01-01", other_id).add_product(db_conn)
+    assert app.get_shopping_list(user_id) == []
+    assert builds == []
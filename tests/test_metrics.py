@@ -0,0 +1,42 @@
+"""
+Tests for the SQL spans recorded by the instrumented cursors.
+"""
+import pytest
+
+import app
+
+
+@pytest.fixture
+def conn():
+    conn = app.sqlite3.connect(":memory:", factory=app.InstrumentedConnection)
+    conn.execute("CREATE TABLE numbers (n INTEGER)")
+    conn.executemany("INSERT INTO numbers VALUES (?)", [(n,) for n in range(1000)])
+    app.recent_spans.clear()
+    yield conn
+    conn.close()
+
+
+def sql_spans():
+    return [span[2] for span in app.recent_spans if span[1] == "sql"]
+
+
+def test_iterated_select_is_recorded_once_its_rows_run_out(conn):
+    rows = conn.execute("SELECT n FROM numbers")
+    assert sum(1 for _ in rows) == 1000
+    assert sql_spans() == ["SELECT n FROM numbers"]
+
+
+def test_fetchone_keeps_timing_until_the_last_row(conn):
+    cursor = conn.execute("SELECT n FROM numbers WHERE n < 2")
+    cursor.fetchone()
+    cursor.fetchone()
+    assert sql_spans() == []
+    assert cursor.fetchone() is None
+    assert sql_spans() == ["SELECT n FROM numbers WHERE n < 2"]
+
+
+def test_abandoned_cursor_is_recorded_when_closed(conn):
+    cursor = conn.execute("SELECT n FROM numbers")
+    cursor.fetchmany(10)
+    cursor.close()
+    assert sql_spans() == ["SELECT n FROM numbers"]
@@ -0,0 +1,89 @@
+"""
+Tests for the digest emails of the notification engine.
+"""
+import smtplib
+
+import pytest
+
+import app
+
+
+class FakeSMTP:
+    sent = []
+
+    def __init__(self, host, port, timeout=None):
+        pass
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def sendmail(self, sender, recipient, message):
+        self.sent.append(recipient)
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def conn(db_conn):
+    with db_conn:
+        for name in ("ann", "bob"):
+            db_conn.execute("INSERT INTO users (email, username, password_hash, first_login, totp_secret) VALUES (?, ?, ?, 0, ?)",
+                            (f"{name}@example.com", name, b"not a real hash", "SECRET"))
+        ann, bob = (row[0] for row in db_conn.execute("SELECT user_id FROM users ORDER BY username"))
+        db_conn.executemany("INSERT INTO notifications (user_id, kind, product_id, detail, name, created_at) VALUES (?, 'low', ?, '', ?, '2024-01-01')",
+                            [(ann, 1, "Milk"), (ann, 2, "Eggs"), (bob, 3, "Bread")])
+    FakeSMTP.sent = []
+    return db_conn
+
+
+def pending(conn):
+    return conn.execute("SELECT COUNT(*) FROM notifications WHERE emailed_at IS NULL").fetchone()[0]
+
+
+def test_each_digest_is_sent_once(conn):
+    assert app.send_digests(conn, write_conn=conn, smtp_factory=FakeSMTP) == (2, 0)
+    assert sorted(FakeSMTP.sent) == ["ann@example.com", "bob@example.com"]
+    assert pending(conn) == 0
+    assert app.send_digests(conn, write_conn=conn, smtp_factory=FakeSMTP) == (0, 0)
+    assert len(FakeSMTP.sent) == 2
+
+
+def test_concurrent_sender_skips_claimed_alerts(conn):
+    nested = []
+
+    # A second instance runs while the first is sending: everything is already claimed
+    class Racing(FakeSMTP):
+        def sendmail(self, sender, recipient, message):
+            if not nested:
+                nested.append(app.send_digests(conn, write_conn=conn, smtp_factory=FakeSMTP))
+            super().sendmail(sender, recipient, message)
+
+    assert app.send_digests(conn, write_conn=conn, smtp_factory=Racing) == (2, 0)
+    assert nested == [(0, 0)]
+    assert sorted(FakeSMTP.sent) == ["ann@example.com", "bob@example.com"]
+
+
+def test_failures_are_retried_and_unsent_alerts_released(conn):
+    class Refusing(FakeSMTP):
+        def sendmail(self, sender, recipient, message):
+            raise smtplib.SMTPRecipientsRefused({recipient: (550, b"no such user")})
+
+    assert app.send_digests(conn, write_conn=conn, smtp_factory=Refusing) == (0, 2)
+    assert pending(conn) == 3
+    assert conn.execute("SELECT MIN(email_attempts) FROM notifications").fetchone()[0] == 1
+
+    class Unreachable(FakeSMTP):
+        def __init__(self, host, port, timeout=None):
+            raise OSError("connection refused")
+
+    assert app.send_digests(conn, write_conn=conn, smtp_factory=Unreachable) == (0, 0)
+    assert pending(conn) == 3
+    assert conn.execute("SELECT MAX(email_attempts) FROM notifications").fetchone()[0] == 1
+
+
+def test_email_is_off_by_default():
+    assert next(setting for setting in app.SETTINGS if setting.key == "notify.email").default is False
@@ -0,0 +1,61 @@
+"""
+Tests for recipe import and matching products to recipe ingredients.
+"""
+import csv
+from datetime import date, timedelta
+
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize("name, keys", [
+    ("Peanut Butter", {"peanut butter"}),
+    ("Coconut Milk", {"coconut milk"}),
+    ("Cream Cheese", {"cream cheese"}),
+    ("Greek Yogurt", {"greek yogurt", "yogurt"}),
+    ("Chicken Breasts", {"chicken breast", "chicken"}),
+    ("Milk 2%", {"milk"}),
+    ("Large Eggs", {"egg"}),
+])
+def test_product_keys(name, keys):
+    assert app.product_keys(name) == keys
+
+
+@pytest.fixture
+def recipes_csv(tmp_path):
+    path = tmp_path / "recipes.csv"
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["title", "NER", "directions"])
+        writer.writerow(["Buttered Toast", '["bread", "butter"]', '["Toast the bread.", "Butter it."]'])
+        writer.writerow(["Satay", '["peanut butter", "chicken"]', '["Mix."]'])
+        writer.writerow(["Buttered Toast", '["bread", "butter"]', '["Toast the bread.", "Butter it."]'])
+    return str(path)
+
+
+def test_import_skips_recipes_already_there(recipes_csv, tmp_path):
+    conn = app.connect_recipes(str(tmp_path / "recipes.db"))
+    assert app.import_recipes(recipes_csv, conn) == 2
+    assert app.import_recipes(recipes_csv, conn) == 0
+    assert conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM recipe_ingredients").fetchone()[0] == 4
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 2  # Restored to FULL
+    conn.close()
+
+
+def test_peanut_butter_does_not_count_as_butter(sqlite_conn, recipes_csv, tmp_path):
+    recipes = app.connect_recipes(str(tmp_path / "recipes.db"))
+    app.import_recipes(recipes_csv, recipes)
+    with sqlite_conn:
+        sqlite_conn.execute("INSERT INTO users (email, username, password_hash, first_login, totp_secret) VALUES (?, ?, ?, 0, ?)",
+                            ("user@example.com", "user", b"not a real hash", "SECRET"))
+    user_id = sqlite_conn.execute("SELECT user_id FROM users").fetchone()[0]
+    expiration = (date.today() + timedelta(days=30)).strftime("%m/%d/%y")
+    for name in ("Peanut Butter", "Chicken Breast"):
+        app.Product(name, 1, 5, expiration, "01/01/24", user_id).add_product(sqlite_conn)
+
+    results = {result["name"]: result for result in app.match_recipes(sqlite_conn, recipes, user_id)}
+    assert set(results) == {"Satay"}
+    assert results["Satay"]["coverage"] == 1
+    recipes.close()
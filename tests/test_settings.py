@@ -0,0 +1,26 @@
+"""
+Tests for settings loading and the example settings file.
+"""
+import app
+
+
+def test_example_settings_never_contain_secrets(tmp_path, monkeypatch):
+    password = next(setting for setting in app.SETTINGS if setting.key == "smtp.password")
+    assert password.default == ""
+    monkeypatch.setattr(password, "default", "hunter2")
+
+    path = tmp_path / "settings.example.toml"
+    app.write_example_settings(str(path))
+    text = path.read_text()
+    assert "hunter2" not in text
+    assert '# password = ""' in text
+
+
+def test_environment_overrides_the_file(tmp_path, monkeypatch):
+    path = tmp_path / "settings.toml"
+    path.write_text('[smtp]\nsender = "file@example.com"\npassword = "from file"\n')
+    monkeypatch.setenv("FOODCONNECT_SMTP_PASSWORD", "from environment")
+
+    values = app.load_settings(str(path))
+    assert values["smtp.sender"] == "file@example.com"
+    assert values["smtp.password"] == "from environment"
@@ -0,0 +1,144 @@
+"""
+Data layer tests, run against every storage backend (see the `connect` fixture in conftest.py).
+"""
+import pytest
+
+import app
+
+
+# The tests below share one database with one user
+@pytest.fixture
+def conn(db_conn, user_id):
+    return db_conn
+
+
+def make_product(user_id, name="Milk", quantity=2, expiration="12/01/26"):
+    return app.Product(name, quantity, 4, expiration, "10/01/26", user_id)
+
+
+def test_product_round_trip(conn, user_id):
+    product = make_product(user_id)
+    product_id = product.add_product(conn)
+    assert product_id is not None
+
+    assert [(record["Id"], record["Name"], record["Quantity"]) for record in app.load_prod(conn, user_id)] == \
+        [(product_id, "Milk", 2)]
+
+    product.quantity = 5
+    product.update_product(conn)
+    assert app.Product.load_by_id(conn, product_id)[1] == 5
+
+    # LIKE ignores case on both backends (ILIKE on PostgreSQL)
+    assert [row[14] for row in app.Product.search_product(conn, "mil", user_id)] == [product_id]
+
+    app.Product.delete_many(conn, [product_id])
+    assert app.load_prod(conn, user_id) == []
+
+
+def test_product_page_pages_in_order(conn, user_id):
+    names = ["Eggs", "Apples", "Milk", "Bread", "Cheese"]
+    for name in names:
+        make_product(user_id, name).add_product(conn)
+
+    seen, after = [], None
+    while True:
+        rows = app.product_page(conn, user_id, "name", after=after, limit=2)
+        seen += [row[0] for row in rows]
+        if len(rows) < 2:
+            break
+        after = (rows[-1][-1], rows[-1][14])
+    assert seen == sorted(names)
+
+
+def test_data_version_changes_when_another_connection_writes(connect, conn, user_id):
+    other = connect()
+    before = app.data_version(conn, user_id)
+    make_product(user_id).add_product(other)
+    assert app.data_version(conn, user_id) != before
+
+
+def test_data_version_is_kept_per_user(conn, user_id):
+    with conn:
+        conn.execute("INSERT INTO users (email, username, password_hash, first_login, totp_secret) VALUES (?, ?, ?, 0, ?)",
+                     ("other@example.com", "other", b"not a real hash", "SECRET"))
+    other_id = conn.execute("SELECT user_id FROM users WHERE username = ?", ("other",)).fetchone()[0]
+    cache = app.InventoryCache(user_id, conn=conn)
+    cache.products()
+
+    # Another user's writes leave this user's counter, and cache, alone
+    before = app.data_version(conn, user_id)
+    product_id = make_product(other_id).add_product(conn)
+    assert app.data_version(conn, user_id) == before
+    generation = cache.generation
+    cache.products()
+    assert cache.generation == generation
+
+    # Handing a product over moves both counters
+    other_before = app.data_version(conn, other_id)
+    with conn:
+        conn.execute("UPDATE products SET user_id = ? WHERE id = ?", (user_id, product_id))
+    assert app.data_version(conn, user_id) != before
+    assert app.data_version(conn, other_id) != other_before
+    assert [record["Id"] for record in cache.products()] == [product_id]
+
+
+def test_inventory_cache_sees_other_connections_but_not_its_own_writes(connect, conn, user_id):
+    cache = app.InventoryCache(user_id, conn=conn)
+    assert cache.products() == []
+
+    # Another client's write is picked up on the next read
+    make_product(user_id, "Bread").add_product(connect())
+    assert [record["Name"] for record in cache.products()] == ["Bread"]
+
+    # The cache's own write does not force a reload
+    generation = cache.generation
+    cache.add(make_product(user_id, "Milk"))
+    assert sorted(record["Name"] for record in cache.products()) == ["Bread", "Milk"]
+    assert cache.generation == generation + 1
+
+
+def test_stock_history_dashboard_and_purge(conn, user_id):
+    milk_id = make_product(user_id, "Milk", 5, "12/01/99").add_product(conn)
+    make_product(user_id, "Yogurt", 2, "01/01/20").add_product(conn)
+    with conn:
+        conn.execute("UPDATE products SET quantity = 3 WHERE id = ?", (milk_id,))
+
+    # Triggers log the events and keep the daily rollup
+    assert conn.execute("SELECT consumed FROM stock_daily WHERE name = 'milk'").fetchone()[0] == 2
+    forecast = app.forecast_inventory(conn, user_id)
+    assert forecast.names == ["milk", "yogurt"]
+    assert forecast.rate[0] > 0
+
+    summary = app.dashboard_summary(conn, user_id)
+    assert (summary["Items"], summary["Quantity"]) == (2, 5)
+    assert summary["Expiry"]["Expired"] == (1, 2)
+    assert summary["Expiry"]["Later"] == (1, 3)
+
+    # The expired product moves to the archive, is logged as expired and leaves the dashboard
+    assert app.purge_products(conn, expired_days=30) == 1
+    assert [(row[0], row[-1]) for row in app.Product.search_product(conn, "yog", user_id, include_archive=True)] == \
+        [("Yogurt", 1)]
+    assert conn.execute("SELECT expired FROM stock_daily WHERE name = 'yogurt'").fetchone()[0] == 2
+    assert app.dashboard_summary(conn, user_id)["Items"] == 1
+
+
+def test_sessions(conn, user_id):
+    token = app.create_session(conn, user_id)
+    assert app.resume_session(conn, token) == user_id
+    app.end_session(conn, token)
+    assert app.resume_session(conn, token) is None
+
+
+@pytest.mark.parametrize("sqlite_sql, postgres_sql", [
+    ("SELECT * FROM products WHERE id = ? AND user_id = ?", "SELECT * FROM products WHERE id = %s AND user_id = %s"),
+    ("SELECT name FROM products WHERE name LIKE ?", "SELECT name FROM products WHERE name ILIKE %s"),
+    ("SELECT name FROM products WHERE name like ?", "SELECT name FROM products WHERE name ILIKE %s"),
+    ("SELECT unlikely FROM t", "SELECT unlikely FROM t"),
+    ("SELECT name FROM products WHERE name LIKE '%milk%'", "SELECT name FROM products WHERE name ILIKE '%%milk%%'"),
+    ("SELECT 'LIKE ?' AS label, ?", "SELECT 'LIKE ?' AS label, %s"),
+    ("SELECT 'it''s ?', ?", "SELECT 'it''s ?', %s"),
+    ('SELECT "group" FROM products WHERE "group" = ?', 'SELECT "group" FROM products WHERE "group" = %s'),
+    ("SELECT quantity % 2 FROM products", "SELECT quantity %% 2 FROM products"),
+])
+def test_translate_sql(sqlite_sql, postgres_sql):
+    assert app.translate_sql(sqlite_sql) == postgres_sql
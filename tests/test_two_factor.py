@@ -0,0 +1,48 @@
+"""
+Tests for checking 2FA codes.
+"""
+import pyotp
+import pytest
+
+import app
+
+
+@pytest.fixture
+def secret():
+    return pyotp.random_base32()
+
+
+def test_issued_code_is_accepted(secret):
+    code = app.issue_2fa_code(101, secret)
+    wrong = str((int(code) + 1) % 1_000_000).zfill(len(code))
+    assert not app.verify_2fa_code(101, secret, wrong)
+    assert app.verify_2fa_code(101, secret, f" {code} ")
+
+
+@pytest.mark.parametrize("entered", ["", "abc123", "１２３４５６", "12 34", "é"])
+def test_non_digit_input_is_rejected(secret, entered):
+    app.issue_2fa_code(102, secret)
+    assert app.verify_2fa_code(102, secret, entered) is False
+
+
+def test_login_with_default_settings_skips_2fa(db_conn, tmp_path):
+    defaults = app.load_settings(str(tmp_path / "settings.toml"))
+    assert defaults["two_fa.enabled"] and defaults["smtp.sender"] == ""
+    assert not app.two_fa_required(defaults)
+    assert not app.TWO_FA_REQUIRED  # The tests run on the default settings as well
+
+    # With 2FA out of the way, the password is all a login needs
+    with db_conn:
+        db_conn.execute("INSERT INTO users (email, username, password_hash, first_login, totp_secret) VALUES (?, ?, ?, 0, ?)",
+                        ("user@example.com", "user", app.bcrypt.hashpw(b"password", app.bcrypt.gensalt(4)), "SECRET"))
+    assert app.authenticate(db_conn, "user", "password") is not None
+
+
+def test_2fa_is_required_once_email_is_set_up(tmp_path):
+    path = tmp_path / "settings.toml"
+    path.write_text('[smtp]\nsender = "app@example.com"\npassword = "secret"\n')
+    assert app.two_fa_required(app.load_settings(str(path)))
+
+    path.write_text(path.read_text() + '\n[two_fa]\nenabled = false\n')
+    app.load_settings.cache_clear()
+    assert not app.two_fa_required(app.load_settings(str(path)))
@@ -0,0 +1,188 @@
+"""
+Tests for the writer thread (`app.DatabaseWriter`) and the inventory cache on top of it.
+"""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def db_path(sqlite_conn, tmp_path):
+    sqlite_conn.execute("CREATE TABLE items (name TEXT UNIQUE)")
+    sqlite_conn.commit()
+    return str(tmp_path / "products.db")
+
+
+@pytest.fixture
+def writer(db_path):
+    writer = app.DatabaseWriter(db_path)
+    yield writer
+    writer.close()
+
+
+# Hold the writer thread until the returned event is set, so the next jobs queue up behind it
+def block(writer):
+    release = threading.Event()
+    started = threading.Event()
+
+    def wait(conn):
+        started.set()
+        release.wait(5)
+
+    writer.submit(wait)
+    started.wait(5)
+    return release
+
+
+def names(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return sorted(row[0] for row in conn.execute("SELECT name FROM items"))
+    finally:
+        conn.close()
+
+
+def test_queued_jobs_share_one_commit(writer, db_path):
+    release = block(writer)
+    futures = [writer.execute("INSERT INTO items VALUES (?)", (f"item {i}",)) for i in range(5)]
+    release.set()
+
+    assert [future.result(5) for future in futures] == [1] * 5
+    assert {future.commit_no for future in futures} == {futures[0].commit_no}
+    assert {future.group_size for future in futures} == {5}
+    assert names(db_path) == [f"item {i}" for i in range(5)]
+
+
+def test_failing_job_is_rolled_back_alone(writer, db_path):
+    def insert_then_fail(conn):
+        conn.execute("INSERT INTO items VALUES ('half done')")
+        raise ValueError("job failed")
+
+    release = block(writer)
+    first = writer.execute("INSERT INTO items VALUES ('first')")
+    failing = writer.submit(insert_then_fail)
+    duplicate = writer.execute("INSERT INTO items VALUES ('first')")
+    last = writer.execute("INSERT INTO items VALUES ('last')")
+    release.set()
+
+    assert first.result(5) == 1
+    with pytest.raises(ValueError):
+        failing.result(5)
+    with pytest.raises(sqlite3.IntegrityError):
+        duplicate.result(5)
+    assert last.result(5) == 1
+    assert names(db_path) == ["first", "last"]
+
+
+def test_connection_failure_fails_the_futures(tmp_path):
+    missing = tmp_path / "missing"
+    writer = app.DatabaseWriter(str(missing / "products.db"))
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            writer.execute("SELECT 1").result(5)
+
+        # The writer is still alive and connects once the database can be opened
+        missing.mkdir()
+        assert writer.submit(lambda conn: conn.execute("SELECT 1").fetchone()[0]).result(5) == 1
+    finally:
+        writer.close()
+
+
+def test_writer_survives_a_broken_connection(writer, db_path):
+    def break_connection(conn):
+        conn.close()
+        raise ValueError("connection lost")
+
+    # The rollback after the failure fails as well; the job still reports an error instead of hanging
+    with pytest.raises(sqlite3.ProgrammingError):
+        writer.submit(break_connection).result(5)
+    assert writer.execute("INSERT INTO items VALUES ('after')").result(5) == 1
+    assert names(db_path) == ["after"]
+
+
+def make_product(user_id, name):
+    return app.Product(name, 1, 1, "2030-01-01", "2024-01-01", user_id)
+
+
+# The writer thread on SQLite; PostgreSQL has none, so caches write on their own connection there
+@pytest.fixture
+def cache_writer(db_conn, tmp_path):
+    if app.is_postgres(db_conn):
+        yield None
+        return
+    writer = app.DatabaseWriter(str(tmp_path / "products.db"))
+    yield writer
+    writer.close()
+
+
+def test_inventory_cache_reloads_after_a_concurrent_write(connect, db_conn, user_id, cache_writer):
+    cache = app.InventoryCache(user_id, conn=db_conn)
+    cache.writer = cache_writer
+    assert cache.products() == []
+
+    # Another process commits after the cache's last read, then the cache writes through the writer
+    other = connect()
+    make_product(user_id, "Bread").add_product(other)
+    other.close()
+    cache.add(make_product(user_id, "Milk"))
+    assert sorted(record["Name"] for record in cache.products()) == ["Bread", "Milk"]
+
+    # With nothing else written, the cache's own write does not force a reload
+    generation = cache.generation
+    cache.add(make_product(user_id, "Eggs"))
+    assert len(cache.products()) == 3
+    assert cache.generation == generation + 1
+
+
+# Stands in for a Tk widget: `after` callbacks run when the loop is pumped
+class EventLoop:
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, func):
+        self.pending.append(func)
+
+    def run(self, timeout=5):
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            self.pending.pop(0)()
+            time.sleep(0.005)
+
+
+def test_gui_writes_do_not_wait_for_the_writer(sqlite_conn, db_path, writer):
+    with sqlite_conn:
+        sqlite_conn.execute("INSERT INTO users (email, username, password_hash, first_login, totp_secret) VALUES (?, ?, ?, 0, ?)",
+                            ("user@example.com", "user", b"not a real hash", "SECRET"))
+    user_id = sqlite_conn.execute("SELECT user_id FROM users").fetchone()[0]
+    cache = app.InventoryCache(user_id, conn=sqlite_conn)
+    cache.writer = writer
+    loop = EventLoop()
+    done = []
+
+    # A long job (a purge chunk, a VACUUM) holds the writer; the add returns at once anyway
+    release = block(writer)
+    future = cache.add(make_product(user_id, "Milk"), widget=loop, on_done=lambda *outcome: done.append(outcome))
+    assert not future.done() and done == []
+    loop.run(0.1)
+    assert done == []
+
+    release.set()
+    loop.run()
+    [(product_id, error)] = done
+    assert error is None
+    assert [record["Id"] for record in cache.products()] == [product_id]
+
+
+def test_gui_write_errors_reach_on_done(db_path, writer, monkeypatch):
+    monkeypatch.setattr(app, "get_writer", lambda: writer)
+    loop = EventLoop()
+    done = []
+    app.run_write_async(loop, lambda conn: conn.execute("INSERT INTO missing VALUES (1)"),
+                        on_done=lambda *outcome: done.append(outcome))
+    loop.run()
+    [(result, error)] = done
+    assert result is None and isinstance(error, sqlite3.OperationalError)